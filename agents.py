@@ -2,20 +2,28 @@
 AI Agents configuration for Meeting Preparation System
 """
 from crewai import Agent
-from crewai_tools import SerperDevTool
 
-def create_agents(llm):
+from llm import bind_llm
+from search_tools import bind_tool, create_search_tool
+
+def create_agents(llm, fresh_search=False, search_tool=None):
     """
     Tạo và cấu hình tất cả AI agents cho hệ thống chuẩn bị cuộc họp
     
     Args:
-        llm: Language model instance
+        llm: Language model instance, hoặc dict agent_key -> LLM để mỗi agent dùng
+            model riêng (xem pipeline.create_llms)
+        fresh_search (bool): Bỏ qua cache tìm kiếm để lấy kết quả mới nhất
+        search_tool: Search tool thay thế (ví dụ tool giả lập khi benchmark)
     
     Returns:
         dict: Dictionary chứa tất cả agents
     """
     
-    search_tool = SerperDevTool()
+    # Hai research agents dùng chung một cache tìm kiếm trên đĩa; mỗi agent một bản sao
+    # của LLM/tool để số liệu đo lường được gom theo agent
+    if search_tool is None:
+        search_tool = create_search_tool(fresh=fresh_search)
     
     # Agent 1: Chuyên gia phân tích bối cảnh
     context_analyzer = Agent(
@@ -24,8 +32,8 @@ def create_agents(llm):
         backstory='Bạn là một chuyên gia hiểu nhanh các bối cảnh kinh doanh phức tạp và xác định thông tin quan trọng.',
         verbose=True,
         allow_delegation=False,
-        llm=llm,
-        tools=[search_tool]
+        llm=bind_llm(llm, 'context_analyzer'),
+        tools=[bind_tool(search_tool, 'context_analyzer')]
     )
     
     # Agent 2: Chuyên gia ngành
@@ -35,8 +43,8 @@ def create_agents(llm):
         backstory='Bạn là một nhà phân tích ngành kỳ cựu với khả năng phát hiện các xu hướng và cơ hội mới nổi.',
         verbose=True,
         allow_delegation=False,
-        llm=llm,
-        tools=[search_tool]
+        llm=bind_llm(llm, 'industry_insights_generator'),
+        tools=[bind_tool(search_tool, 'industry_insights_generator')]
     )
     
     # Agent 3: Chuyên gia chiến lược cuộc họp
@@ -46,7 +54,7 @@ def create_agents(llm):
         backstory='Bạn là một bậc thầy lập kế hoạch cuộc họp, nổi tiếng với việc tạo ra các chiến lược và chương trình hiệu quả cao.',
         verbose=True,
         allow_delegation=False,
-        llm=llm,
+        llm=bind_llm(llm, 'strategy_formulator'),
     )
     
     # Agent 4: Chuyên gia truyền thông
@@ -56,7 +64,7 @@ def create_agents(llm):
         backstory='Bạn là một chuyên gia truyền thông, có kỹ năng chắt lọc thông tin phức tạp thành các hiểu biết rõ ràng, dễ hành động.',
         verbose=True,
         allow_delegation=False,
-        llm=llm,
+        llm=bind_llm(llm, 'executive_briefing_creator'),
     )
     
     return {
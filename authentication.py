@@ -1,88 +1,45 @@
 import os.path
 import json
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 
-SCOPES = ['https://www.googleapis.com/auth/contacts.readonly']
+from contacts_cache import get_contact_groups, get_contacts_cache, person_to_contact, sync_contacts
 
-def get_contacts():
-    """Lấy danh sách liên hệ từ Google Contacts"""
-    try:
-        # Xác thực
-        creds = None
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+SCOPES = ['https://www.googleapis.com/auth/contacts.readonly']
 
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-                creds = flow.run_local_server(port=8080)
+def get_contacts(service=None, cache=None):
+    """
+    Lấy danh sách liên hệ từ Google Contacts
 
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
+    Danh bạ được đồng bộ vào cache cục bộ: lần đầu tải toàn bộ (phân trang), các lần
+    sau chỉ tải phần thay đổi qua sync token.
 
+    Args:
+        service: People API service (mặc định: xác thực OAuth và tạo mới)
+        cache: ContactsCache (mặc định: cache dùng chung của process)
+    """
+    try:
         # Kết nối API
-        service = build('people', 'v1', credentials=creds)
+        if service is None:
+            service = _build_service()
+        if cache is None:
+            cache = get_contacts_cache()
         
         # Lấy nhóm liên hệ
         groups_dict = _get_contact_groups(service)
         
-        # Lấy danh bạ
-        results = service.people().connections().list(
-            resourceName='people/me',
-            pageSize=100,
-            personFields='names,emailAddresses,organizations,memberships'
-        ).execute()
-
-        connections = results.get('connections', [])
-        contacts_data = []
+        # Đồng bộ danh bạ vào cache rồi đọc từ cache
+        sync_contacts(service, cache)
         
-        for person in connections:
-            names = person.get('names', [])
-            emails_data = person.get('emailAddresses', [])
-            
-            if names and emails_data:
-                name = names[0].get('displayName')
-                email = emails_data[0].get('value')
-                
-                # Chức danh và công ty
-                title = ''
-                organizations = person.get('organizations', [])
-                if organizations:
-                    org = organizations[0]
-                    title = org.get('title', '')
-                
-                # Nhãn/nhóm
-                labels = []
-                memberships = person.get('memberships', [])
-                for membership in memberships:
-                    contact_group = membership.get('contactGroupMembership', {})
-                    if contact_group:
-                        group_id = contact_group.get('contactGroupResourceName', '').replace('contactGroups/', '')
-                        if group_id:
-                            # Mapping system labels
-                            system_labels = {
-                                'myContacts': 'Liên hệ của tôi',
-                                'starred': 'Quan trọng',
-                                'blocked': 'Bị chặn',
-                                'family': 'Gia đình',
-                                'friends': 'Bạn bè',
-                                'coworkers': 'Đồng nghiệp'
-                            }
-                            
-                            label_name = system_labels.get(group_id, groups_dict.get(group_id, 'Nhóm tùy chỉnh'))
-                            labels.append(label_name)
-                
-                contacts_data.append({
-                    'name': name,
-                    'email': email,
-                    'title': title,
-                    'labels': labels
-                })
+        if groups_dict is None:
+            # Không lấy được nhóm: giữ tên nhóm đã lưu, không ghi đè bằng mapping rỗng
+            groups_dict = cache.get_groups()
+        else:
+            cache.save_groups(groups_dict)
+        
+        contacts_data = []
+        for person in cache.list_people():
+            contact = person_to_contact(person, groups_dict)
+            if contact:
+                contacts_data.append(contact)
 
         return contacts_data
 
@@ -93,38 +50,37 @@ def get_contacts():
         print(f"❌ Lỗi: {e}")
         return []
 
+def _build_service():
+    """Xác thực OAuth (token.json / credentials.json) và tạo People API service"""
+    # Thư viện Google chỉ cần khi đồng bộ danh bạ, không nạp lúc khởi động ứng dụng
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
+    creds = None
+    if os.path.exists('token.json'):
+        creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+            creds = flow.run_local_server(port=8080)
+
+        with open('token.json', 'w') as token:
+            token.write(creds.to_json())
+
+    return build('people', 'v1', credentials=creds)
+
 def _get_contact_groups(service):
-    """Lấy danh sách tên nhóm/nhãn từ ID"""
+    """Lấy danh sách tên nhóm/nhãn từ ID (batch, có cache), None nếu gọi API lỗi"""
     try:
-        groups_result = service.contactGroups().list().execute()
-        contact_groups = groups_result.get('contactGroups', [])
-        
-        groups_dict = {}
-        for group in contact_groups:
-            group_resource_name = group.get('resourceName', '')
-            group_id = group_resource_name.replace('contactGroups/', '')
-            
-            try:
-                group_detail = service.contactGroups().get(
-                    resourceName=group_resource_name,
-                    maxMembers=0
-                ).execute()
-                
-                group_name = group_detail.get('name', '')
-                formatted_name = group_detail.get('formattedName', '')
-                final_name = formatted_name or group_name or group_id
-                
-                if final_name:
-                    groups_dict[group_id] = final_name
-                    
-            except:
-                group_name = group.get('name', group_id)
-                groups_dict[group_id] = group_name
-        
-        return groups_dict
-        
-    except Exception:
-        return {}
+        return get_contact_groups(service)
+    except Exception as e:
+        print(f"⚠️ Không lấy được nhóm liên hệ, dùng tên nhóm đã lưu: {e}")
+        return None
 
 def test_contacts():
     """Test function để kiểm tra"""
@@ -0,0 +1,208 @@
+"""
+Chuẩn bị hàng loạt meeting brief không cần giao diện (headless)
+
+Cách dùng:
+    python batch.py meetings.csv --concurrency 4
+    python batch.py meetings.jsonl --state meetings.progress.jsonl
+
+File đầu vào (CSV có header hoặc JSONL) gồm các cột: company_name, meeting_objective,
+attendees, meeting_duration, focus_areas. Tiến trình được ghi vào file state để chạy
+lại lệnh sẽ bỏ qua các job đã hoàn thành.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import Config
+from agents import create_agents
+from checkpoints import get_checkpoint_store
+from instrumentation import RunMetrics, activate, summarize
+from pipeline import MEETING_FIELDS, create_crew, create_llms, meeting_data_key, validate_inputs
+from report_store import get_report_store
+
+
+def load_meetings(path):
+    """Đọc danh sách meeting_data từ file CSV hoặc JSONL"""
+    with open(path, 'r', encoding=Config.FILE_ENCODING) as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+    
+    meetings = []
+    for record_number, record in enumerate(records, start=1):
+        meeting_data = {}
+        for field in MEETING_FIELDS:
+            value = record.get(field) or ''
+            if field == 'meeting_duration':
+                # JSONL có thể ghi thời lượng dạng số, chỉ strip giá trị dạng chuỗi
+                meeting_data[field] = value.strip() if isinstance(value, str) else value
+            elif isinstance(value, list):
+                # JSONL có thể ghi người tham gia/lĩnh vực trọng tâm dạng danh sách, mỗi phần tử một dòng
+                meeting_data[field] = "\n".join(str(item).strip() for item in value if str(item).strip())
+            else:
+                meeting_data[field] = str(value).strip()
+        # CSV không xuống dòng được dễ dàng, cho phép ngăn cách người tham gia bằng ";"
+        meeting_data['attendees'] = meeting_data['attendees'].replace(';', '\n')
+        try:
+            meeting_data['meeting_duration'] = int(meeting_data['meeting_duration'] or Config.DEFAULT_MEETING_DURATION)
+        except (TypeError, ValueError):
+            # Một bản ghi lỗi không làm hỏng cả batch: bỏ qua và chạy tiếp các dòng khác
+            print(f"⚠️ Thời lượng không hợp lệ ({meeting_data['meeting_duration']!r}), bỏ qua bản ghi {record_number}: "
+                  f"{meeting_data['company_name'] or '(không tên)'}")
+            continue
+        meetings.append(meeting_data)
+    return meetings
+
+
+class BatchState:
+    """
+    File JSONL ghi kết quả từng job, dùng để tiếp tục khi chạy lại
+
+    Dòng đầu lưu batch_id; checkpoint của meeting dở dang gắn với batch_id này nên chỉ
+    được dùng lại khi chạy tiếp đúng file state đó (resuming), không lẫn sang batch khác.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = {}
+        self.batch_id = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding=Config.FILE_ENCODING) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if record.get('status') == 'batch':
+                            self.batch_id = record['batch_id']
+                        elif record.get('status') == 'done':
+                            self.completed[record['key']] = record
+        self.resuming = self.batch_id is not None
+        if not self.resuming:
+            self.batch_id = uuid.uuid4().hex
+            self.append({'status': 'batch', 'batch_id': self.batch_id, 'created_at': time.time()})
+
+    def run_id(self, key):
+        """Run ID (checkpoint) của một meeting trong batch này"""
+        return f"batch:{self.batch_id}:{key}"
+
+    def append(self, record):
+        with self._lock:
+            with open(self.path, 'a', encoding=Config.FILE_ENCODING) as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+            if record['status'] == 'done':
+                self.completed[record['key']] = record
+
+
+def run_job(meeting_data, fresh_search=False, run_id=None, resume=False):
+    """
+    Chạy một meeting brief với bộ agents riêng, trả về đường dẫn báo cáo
+
+    Đầu ra từng task được checkpoint theo run_id; resume=True (chạy tiếp file state
+    sau khi bị ngắt) tiếp tục từ task chưa xong của meeting dở dang.
+    """
+    # Mỗi job một bộ agents: agent CrewAI giữ trạng thái nên không dùng chung giữa các crew song song
+    agents = create_agents(create_llms(), fresh_search=fresh_search)
+    crew = create_crew(agents, meeting_data, verbose=False, reuse=not fresh_search, run_id=run_id, resume=resume)
+    metrics = RunMetrics(model=Config.MODEL_NAME, company_name=meeting_data['company_name'])
+    with activate(metrics, agents=agents):
+        result = crew.kickoff()
+    # Lưu thẳng qua kho báo cáo: lỗi được ném ra và ghi vào file state (không qua streamlit)
+    filename = get_report_store().save(result, meeting_data['company_name'], metrics=metrics.to_records())
+    if run_id and Config.CHECKPOINT_ENABLED:
+        get_checkpoint_store().delete(run_id)
+    return filename
+
+
+def run_batch(meetings, state, concurrency, fresh_search=False):
+    """
+    Chạy các meeting chưa hoàn thành với số luồng tối đa concurrency
+
+    Returns:
+        list: Kết quả từng job trong lần chạy này
+    """
+    pending = []
+    for meeting_data in meetings:
+        key = meeting_data_key(meeting_data)
+        if key in state.completed:
+            print(f"⏭️ Bỏ qua (đã xong): {meeting_data['company_name']}")
+        elif not validate_inputs(meeting_data['company_name'], meeting_data['meeting_objective'],
+                                 meeting_data['attendees'], meeting_data['focus_areas']):
+            print(f"⚠️ Thiếu thông tin, bỏ qua: {meeting_data['company_name'] or '(không tên)'}")
+        else:
+            pending.append((key, meeting_data))
+    
+    results = []
+    
+    def _run(key, meeting_data):
+        started = time.perf_counter()
+        record = {'key': key, 'company_name': meeting_data['company_name']}
+        try:
+            # --fresh-search lấy kết quả mới hoàn toàn, không dùng checkpoint của lần chạy trước
+            record['filename'] = run_job(meeting_data, fresh_search=fresh_search, run_id=state.run_id(key),
+                                         resume=state.resuming and not fresh_search)
+            record['status'] = 'done'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+        record['latency_s'] = round(time.perf_counter() - started, 2)
+        state.append(record)
+        return record
+    
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(_run, key, meeting_data) for key, meeting_data in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            results.append(record)
+            icon = '✅' if record['status'] == 'done' else '❌'
+            detail = record.get('filename') or record.get('error')
+            print(f"{icon} [{len(results)}/{len(pending)}] {record['company_name']} ({record['latency_s']}s): {detail}")
+    return results
+
+
+def print_summary(results):
+    """In bảng latency từng job và thống kê tổng hợp"""
+    if not results:
+        print("📝 Không có job nào cần chạy")
+        return
+    
+    print("\n📊 Tổng kết")
+    for record in sorted(results, key=lambda r: r['latency_s'], reverse=True):
+        print(f"  {record['status']:<7} {record['latency_s']:>8.1f}s  {record['company_name']}")
+    
+    summary = summarize([r['latency_s'] * 1000 for r in results])
+    done = sum(1 for r in results if r['status'] == 'done')
+    print(
+        f"✅ {done}/{len(results)} thành công · "
+        f"p50={summary['p50_ms'] / 1000:.1f}s p95={summary['p95_ms'] / 1000:.1f}s max={summary['max_ms'] / 1000:.1f}s"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chuẩn bị hàng loạt meeting brief")
+    parser.add_argument('input', help="File CSV hoặc JSONL chứa meeting_data")
+    parser.add_argument('--concurrency', type=int, default=Config.BATCH_CONCURRENCY)
+    parser.add_argument('--state', help="File JSONL lưu tiến trình (mặc định: <input>.progress.jsonl)")
+    parser.add_argument('--fresh-search', action='store_true', help="Bỏ qua cache tìm kiếm và kết quả ghi nhớ")
+    args = parser.parse_args(argv)
+    
+    if not Config.validate_api_keys():
+        print("❌ Thiếu API keys!")
+        return 1
+    Config.set_environment_variables()
+    
+    state = BatchState(args.state or f"{os.path.splitext(args.input)[0]}.progress.jsonl")
+    results = run_batch(load_meetings(args.input), state, args.concurrency, fresh_search=args.fresh_search)
+    print_summary(results)
+    return 0 if all(r['status'] == 'done' for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,744 @@
+"""
+Benchmark các thành phần của hệ thống chuẩn bị cuộc họp (chạy offline, không gọi API)
+
+Cách dùng:
+    python benchmark.py report-search --reports 10000
+    python benchmark.py pipeline --runs 5 --llm-latency 0.05 --search-latency 0.02
+    python benchmark.py rerun --runs 20
+    python benchmark.py contact-groups --groups 50 --latency 0.05
+    python benchmark.py contacts-search --contacts 50000
+    python benchmark.py startup --module main --budget-ms 1500
+    python benchmark.py routing --profiles single tiered quality --llm-latency 0.05
+    python benchmark.py tail-latency --runs 20 --llm-latency 0.05 --slow-rate 0.05
+"""
+import argparse
+import datetime
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from config import Config
+from instrumentation import percentile, summarize
+from report_store import ReportStore
+
+_WORDS = (
+    "chiến lược thị trường doanh thu khách hàng đối thủ cạnh tranh sản phẩm dịch vụ "
+    "tăng trưởng rủi ro cơ hội đầu tư công nghệ chuyển đổi số logistics bán lẻ ngân hàng "
+    "fintech năng lượng tái tạo xuất khẩu chuỗi cung ứng marketing nhân sự pháp lý "
+    "agenda talking points executive summary roadmap partnership pricing AI cloud data"
+).split()
+_COMPANIES = [f"Company {name}" for name in (
+    "Alpha", "Beta", "Gamma", "Delta", "Viet_Star", "Saigon Tech", "Hanoi Foods", "Mekong Energy"
+)]
+
+
+def _print_summary(title, summary):
+    print(
+        f"{title}: n={summary['count']} "
+        f"p50={summary['p50_ms']:.2f} ms p95={summary['p95_ms']:.2f} ms max={summary['max_ms']:.2f} ms"
+    )
+
+
+def bench_report_search(reports=10000, queries=200, budget_ms=50.0, seed=42):
+    """
+    Đo thời gian tìm kiếm toàn văn trên kho báo cáo tổng hợp
+
+    Returns:
+        bool: True nếu p95 nằm trong ngân sách budget_ms
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        store = ReportStore(os.path.join(workdir, "index.sqlite3"), os.path.join(workdir, "reports"))
+        base_time = time.time() - 365 * 24 * 3600
+
+        started = time.perf_counter()
+        for i in range(reports):
+            body = " ".join(rng.choice(_WORDS) for _ in range(400))
+            store.save(body, rng.choice(_COMPANIES), created_at=base_time + i * 3000)
+        print(f"📝 Đã tạo {reports} báo cáo trong {time.perf_counter() - started:.1f}s")
+
+        samples = []
+        for i in range(queries):
+            query = " ".join(rng.sample(_WORDS, rng.randint(1, 3)))
+            filters = {}
+            if i % 3 == 1:
+                filters['company_name'] = rng.choice(_COMPANIES)
+            if i % 3 == 2:
+                filters['date_from'] = base_time + rng.randint(0, reports // 2) * 3000
+                filters['date_to'] = filters['date_from'] + 30 * 24 * 3600
+
+            query_started = time.perf_counter()
+            store.search(query, **filters)
+            samples.append((time.perf_counter() - query_started) * 1000)
+
+    summary = summarize(samples)
+    _print_summary(f"🔎 Tìm kiếm toàn văn ({reports} báo cáo)", summary)
+    passed = summary['p95_ms'] < budget_ms
+    print(f"{'✅' if passed else '❌'} Ngân sách p95 < {budget_ms:.0f} ms")
+    return passed
+
+
+SAMPLE_MEETING = {
+    'company_name': 'Saigon Tech',
+    'meeting_objective': 'Thảo luận hợp tác triển khai nền tảng dữ liệu',
+    'attendees': 'Nguyễn Văn A - CEO\nTrần Thị B - CTO',
+    'meeting_duration': 60,
+    'focus_areas': 'Chi phí, lộ trình triển khai, bảo mật dữ liệu',
+}
+
+
+def _measure(samples, stage, func, *args, **kwargs):
+    """Chạy func, ghi lại thời gian (ms) và bộ nhớ đỉnh (KB) cho stage"""
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+    stage_samples = samples.setdefault(stage, {'ms': [], 'peak_kb': []})
+    stage_samples['ms'].append(elapsed_ms)
+    stage_samples['peak_kb'].append(peak_kb)
+    return result
+
+
+def _load_history():
+    """Các truy vấn mà sidebar thực hiện mỗi lần rerun"""
+    from report_store import get_report_store
+
+    store = get_report_store()
+    week_ago = datetime.datetime.now() - datetime.timedelta(days=7)
+    return store.list_recent(Config.MAX_HISTORY_FILES), store.count(), store.count_since(week_ago.timestamp())
+
+
+def bench_pipeline(runs=5, llm_latency=0.0, search_latency=0.0, completion_chars=1500, payload_chars=2000):
+    """
+    Đo đường chạy thật create_agents → create_tasks → kickoff → lưu báo cáo → lịch sử
+    với LLM và search tool giả lập (không cần mạng)
+
+    Returns:
+        bool: True nếu mọi lần chạy hoàn tất
+    """
+    # Không gửi telemetry, không cần API key thật
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("SERPER_API_KEY", "offline")
+
+    import report_store
+    from agents import create_agents
+    from instrumentation import RunMetrics, activate
+    from pipeline import MeetingCrew
+    from stubs import StubLLM, StubSerperDevTool
+    from tasks import create_tasks
+    from utils import save_meeting_result
+
+    samples = {}
+    totals = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Báo cáo benchmark ghi vào thư mục tạm, không lẫn với reports/ thật
+        report_store._shared_store = ReportStore(os.path.join(workdir, "index.sqlite3"), os.path.join(workdir, "reports"))
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            for _ in range(runs):
+                llm = StubLLM(latency=llm_latency, completion_chars=completion_chars)
+                search_tool = StubSerperDevTool(latency=search_latency, payload_chars=payload_chars)
+
+                agents = _measure(samples, 'create_agents', create_agents, llm, search_tool=search_tool)
+                tasks = _measure(samples, 'create_tasks', create_tasks, agents, SAMPLE_MEETING,
+                                 parallel=Config.is_parallel_execution())
+                crew = _measure(samples, 'build_crew', MeetingCrew, agents, tasks)
+                with activate(RunMetrics(model=llm.model, company_name=SAMPLE_MEETING['company_name']),
+                              agents=agents) as metrics:
+                    result = _measure(samples, 'kickoff', crew.kickoff)
+                _measure(samples, 'save_report', save_meeting_result, result, SAMPLE_MEETING['company_name'],
+                         metrics=metrics.to_records())
+                _measure(samples, 'history', _load_history)
+                for key, value in metrics.totals().items():
+                    totals[key] = totals.get(key, 0) + value
+        finally:
+            total = time.perf_counter() - started
+            tracemalloc.stop()
+            report_store._shared_store = None
+
+    print(f"⚙️ Chế độ: {Config.EXECUTION_MODE} · LLM latency={llm_latency}s · search latency={search_latency}s")
+    print(f"{'stage':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'peak KB':>10}")
+    for stage, stage_samples in samples.items():
+        summary = summarize(stage_samples['ms'])
+        print(
+            f"{stage:<14}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+            f"{summary['max_ms']:>10.2f}{max(stage_samples['peak_kb']):>10.0f}"
+        )
+    print(
+        f"🚀 Throughput: {runs / total:.2f} brief/s · "
+        f"{totals.get('llm_calls', 0) / max(runs, 1):.1f} LLM calls/brief · "
+        f"{totals.get('tool_calls', 0) / max(runs, 1):.1f} tool calls/brief · "
+        f"{(totals.get('prompt_tokens', 0) + totals.get('completion_tokens', 0)) / max(runs, 1):.0f} tokens/brief · "
+        f"{totals.get('search_tokens_saved', 0) / max(runs, 1):.0f} token tìm kiếm tiết kiệm/brief"
+    )
+    return len(samples.get('history', {}).get('ms', [])) == runs
+
+
+# Chạy main.py bằng streamlit AppTest (không cần trình duyệt), in thời gian từng lần rerun (ms)
+_RERUN_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+timings = []
+for _ in range(int(sys.argv[2]) + 1):
+    started = time.perf_counter()
+    app.run()
+    timings.append((time.perf_counter() - started) * 1000)
+print(json.dumps({'timings': timings[1:], 'exception': [str(e.value) for e in app.exception]}))
+"""
+
+
+def _rerun_script_times(runs):
+    """Thời gian (ms) mỗi lần rerun main.py, bỏ lần chạy đầu (import); None nếu không chạy được"""
+    import json
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [repo_dir, os.environ.get('PYTHONPATH')])),
+            CACHE_DIR=os.path.join(workdir, "cache"),
+            WARMUP_IMPORTS="false",
+            OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "offline"),
+            SERPER_API_KEY=os.environ.get("SERPER_API_KEY", "offline"),
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', _RERUN_SCRIPT, os.path.join(repo_dir, 'main.py'), str(runs)],
+            cwd=workdir, env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        print(f"⚠️ Không chạy được main.py bằng AppTest:\n{completed.stderr[-1000:]}")
+        return None
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result['exception']:
+        print(f"⚠️ main.py lỗi khi rerun: {result['exception'][0][:500]}")
+        return None
+    return result['timings']
+
+
+def _crew_build_times(runs, llm_latency=0.0):
+    """
+    Thời gian (ms) dựng LLM/agents/crew với LLM và search tool giả lập (stubs):
+    'mỗi rerun (cũ)' dựng tất cả, 'mỗi job' chỉ dựng crew trên agents của worker
+    """
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+    from agents import create_agents
+    from instrumentation import AGENT_TASKS
+    from pipeline import create_crew
+    from stubs import StubLLM, StubSerperDevTool
+
+    def _agents():
+        llms = {agent_key: StubLLM(latency=llm_latency) for agent_key in AGENT_TASKS}
+        return create_agents(llms, search_tool=StubSerperDevTool())
+
+    samples = {'rebuild': [], 'job': []}
+    # Không đọc/ghi kho ghi nhớ: chỉ đo phần dựng đối tượng
+    memo_enabled, Config.TASK_MEMO_ENABLED = Config.TASK_MEMO_ENABLED, False
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            create_crew(_agents(), SAMPLE_MEETING, reuse=False)
+            samples['rebuild'].append((time.perf_counter() - started) * 1000)
+        worker_agents = _agents()
+        for _ in range(runs):
+            started = time.perf_counter()
+            create_crew(worker_agents, SAMPLE_MEETING, reuse=False)
+            samples['job'].append((time.perf_counter() - started) * 1000)
+    finally:
+        Config.TASK_MEMO_ENABLED = memo_enabled
+    return samples
+
+
+def bench_rerun(runs=20):
+    """
+    Thời gian mỗi lần rerun Streamlit (mỗi phím gõ) trước và sau khi bỏ việc dựng
+    LLM/agents/crew khỏi script trang
+
+    - sau: rerun main.py thật (streamlit AppTest, process riêng, cache tạm)
+    - trước: script cũ dựng thêm LLM → agents → tasks → Crew ở mỗi lần rerun; phần này
+      đo với LLM và search tool giả lập (stubs, không gọi mạng)
+
+    Returns:
+        bool: True nếu đo được cả hai phần
+    """
+    script_ms = _rerun_script_times(runs)
+    if script_ms is not None:
+        _print_summary("🔁 sau: rerun main.py", summarize(script_ms))
+
+    try:
+        build = _crew_build_times(runs)
+    except ImportError as e:
+        print(f"⚠️ Không đo được phần dựng crew (cần crewai): {e}")
+        return False
+    _print_summary("🏗️ dựng LLM/agents/crew (cũ: mỗi rerun)", summarize(build['rebuild']))
+    _print_summary("🏗️ dựng crew (mới: mỗi job, agents của worker)", summarize(build['job']))
+    if script_ms is None:
+        return False
+
+    after = summarize(script_ms)['p50_ms']
+    before = after + summarize(build['rebuild'])['p50_ms']
+    print(f"⌨️ Mỗi rerun (p50): trước ≈ {before:.1f} ms → sau {after:.1f} ms")
+    return True
+
+
+def _sequential_contact_groups(service):
+    """Cách cũ: list rồi get từng nhóm (N+1 round-trip tuần tự), dùng làm mốc so sánh"""
+    groups_dict = {}
+    for group in service.contactGroups().list().execute().get('contactGroups', []):
+        resource_name = group['resourceName']
+        detail = service.contactGroups().get(resourceName=resource_name, maxMembers=0).execute()
+        groups_dict[resource_name.replace('contactGroups/', '')] = (
+            detail.get('formattedName') or detail.get('name') or resource_name
+        )
+    return groups_dict
+
+
+def bench_contact_groups(groups=50, latency=0.05):
+    """
+    So sánh số round-trip và thời gian lấy tên nhóm liên hệ: tuần tự N+1 lời gọi,
+    batchGet và thread pool dự phòng (People API giả lập có độ trễ mỗi lời gọi)
+
+    Returns:
+        bool: True nếu mọi cách cho cùng kết quả và batchGet ít round-trip hơn cách cũ
+    """
+    from contacts_cache import resolve_contact_groups
+    from fakes import FakePeopleService
+
+    strategies = [
+        ('sequential', _sequential_contact_groups, {}),
+        ('batchGet', resolve_contact_groups, {}),
+        ('thread pool', resolve_contact_groups, {'supports_batch': False}),
+    ]
+    print(f"👥 {groups} nhóm · độ trễ {latency * 1000:.0f} ms/round-trip")
+    print(f"{'strategy':<14}{'round-trips':>12}{'wall ms':>10}")
+    results = {}
+    for name, func, options in strategies:
+        service = FakePeopleService.generate(0, group_count=groups, latency=latency, **options)
+        started = time.perf_counter()
+        resolved = func(service)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        results[name] = (service.round_trips, resolved)
+        print(f"{name:<14}{service.round_trips:>12}{elapsed_ms:>10.1f}")
+
+    baseline = results['sequential'][1]
+    return (
+        all(resolved == baseline for _, resolved in results.values())
+        and results['batchGet'][0] < results['sequential'][0]
+    )
+
+
+_FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+_MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Thanh", "Ngọc", "Quốc", "Gia", "Bảo"]
+_GIVEN_NAMES = ["An", "Anh", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hòa", "Hùng", "Khánh", "Lan",
+                "Linh", "Long", "Mai", "Nam", "Ngân", "Phong", "Phúc", "Quân", "Sơn", "Tâm", "Thảo", "Trang",
+                "Trung", "Tuấn", "Uyên", "Việt", "Xuân", "Yến"]
+_TITLES = ["CEO", "CTO", "CFO", "Giám đốc kinh doanh", "Trưởng phòng marketing", "Kỹ sư phần mềm",
+           "Chuyên viên tài chính", "Quản lý dự án", "Trưởng nhóm dữ liệu", "Luật sư"]
+_LABELS = ["Liên hệ của tôi", "Đồng nghiệp", "Khách hàng", "Đối tác", "Nhà đầu tư"]
+
+
+def _synthetic_contacts(count, rng):
+    contacts = {}
+    for i in range(count):
+        family, middle, given = rng.choice(_FAMILY_NAMES), rng.choice(_MIDDLE_NAMES), rng.choice(_GIVEN_NAMES)
+        contacts[f"people/c{i:06d}"] = {
+            'name': f"{family} {middle} {given}",
+            'email': f"{given.lower()}.{i}@{rng.choice(_COMPANIES).split()[-1].lower()}.vn",
+            'title': rng.choice(_TITLES),
+            'labels': rng.sample(_LABELS, rng.randint(1, 2)),
+        }
+    return contacts
+
+
+def _typo(word, rng):
+    position = rng.randrange(len(word))
+    return word[:position] + word[position + 1:] if len(word) > 4 else word
+
+
+def bench_contacts_search(contacts=50000, queries=500, budget_ms=5.0, seed=42):
+    """
+    Đo thời gian tìm liên hệ (tiền tố, nhiều từ, gõ sai, lọc nhãn) và cập nhật tăng dần
+
+    Returns:
+        bool: True nếu p95 của từng loại truy vấn đều nằm trong ngân sách budget_ms
+    """
+    from contacts_index import ContactsIndex
+
+    rng = random.Random(seed)
+    data = _synthetic_contacts(contacts, rng)
+    index = ContactsIndex()
+    started = time.perf_counter()
+    index.rebuild(data)
+    print(f"📇 Xây index {contacts} liên hệ trong {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    names = [contact['name'] for contact in data.values()]
+    samples = {'prefix': [], 'multi-word': [], 'typo': [], 'label': []}
+    for i in range(queries):
+        words = rng.choice(names).split()
+        kind = list(samples)[i % len(samples)]
+        if kind == 'prefix':
+            query, labels = rng.choice(words)[:rng.randint(1, 4)], None
+        elif kind == 'multi-word':
+            query, labels = f"{words[0]} {words[-1][:3]}", None
+        elif kind == 'typo':
+            query, labels = " ".join(_typo(word, rng) for word in words), None
+        else:
+            query, labels = words[-1][:2], [rng.choice(_LABELS)]
+
+        query_started = time.perf_counter()
+        index.search(query, labels=labels)
+        samples[kind].append((time.perf_counter() - query_started) * 1000)
+
+    update_samples = []
+    for i in range(200):
+        doc_id = f"people/c{rng.randrange(contacts):06d}"
+        update_started = time.perf_counter()
+        index.upsert(doc_id, dict(data[doc_id], title=rng.choice(_TITLES)))
+        update_samples.append((time.perf_counter() - update_started) * 1000)
+
+    summaries = {kind: summarize(kind_samples) for kind, kind_samples in samples.items()}
+    for kind, summary in summaries.items():
+        _print_summary(f"🔎 {kind}", summary)
+    _print_summary("✏️ cập nhật 1 liên hệ", summarize(update_samples))
+
+    # p95 gộp che mất loại truy vấn chậm (gõ sai), nên ngân sách áp dụng cho từng loại
+    over_budget = [kind for kind, summary in summaries.items() if summary['p95_ms'] >= budget_ms]
+    worst = max(summaries, key=lambda kind: summaries[kind]['p95_ms'])
+    passed = not over_budget
+    print(
+        f"{'✅' if passed else '❌'} Ngân sách p95 < {budget_ms:.0f} ms cho từng loại truy vấn "
+        f"(chậm nhất: {worst} p95 = {summaries[worst]['p95_ms']:.2f} ms)"
+        + (f" · vượt: {', '.join(over_budget)}" if over_budget else "")
+    )
+    return passed
+
+
+# Độ trễ tương đối của từng model so với --llm-latency (LLM giả lập trong chế độ routing)
+_STUB_LATENCY_FACTORS = {
+    "gpt-4o-mini": 1.0,
+    "gpt-4.1-mini": 1.3,
+    "gpt-4o": 2.5,
+    "gpt-4.1": 2.5,
+}
+
+
+def bench_routing(profiles=None, runs=3, llm_latency=0.05, search_latency=0.0, completion_chars=1500,
+                  payload_chars=2000, meeting_data=None):
+    """
+    So sánh độ trễ và chi phí của cùng một meeting_data qua các routing profile
+    (Config.ROUTING_PROFILES) với LLM giả lập: độ trễ theo _STUB_LATENCY_FACTORS,
+    chi phí theo Config.MODEL_PRICING của model mà profile chọn
+
+    Returns:
+        bool: True nếu mọi lần chạy hoàn tất
+    """
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("SERPER_API_KEY", "offline")
+
+    from agents import create_agents
+    from instrumentation import AGENT_TASKS, RunMetrics, activate
+    from pipeline import MeetingCrew
+    from stubs import StubLLM, StubSerperDevTool
+    from tasks import create_tasks
+
+    profiles = profiles or list(Config.ROUTING_PROFILES)
+    meeting_data = meeting_data or SAMPLE_MEETING
+    print(f"⚙️ Chế độ: {Config.EXECUTION_MODE} · LLM latency={llm_latency}s (gpt-4o-mini) · {runs} lần/profile")
+    print(f"{'profile':<10}{'p50 s':>9}{'p95 s':>9}{'$/brief':>11}{'tokens':>9}  models")
+
+    completed = 0
+    for profile in profiles:
+        settings = {agent_key: Config.agent_llm_settings(agent_key, profile) for agent_key in AGENT_TASKS}
+        wall_ms = []
+        totals = {}
+        for _ in range(runs):
+            llms = {
+                agent_key: StubLLM(
+                    latency=llm_latency * _STUB_LATENCY_FACTORS.get(agent_settings['model'], 1.0),
+                    completion_chars=completion_chars,
+                    model=f"stub/{agent_settings['model']}",
+                    temperature=agent_settings['temperature'],
+                    max_tokens=agent_settings['max_tokens'],
+                )
+                for agent_key, agent_settings in settings.items()
+            }
+            search_tool = StubSerperDevTool(latency=search_latency, payload_chars=payload_chars)
+            agents = create_agents(llms, search_tool=search_tool)
+            crew = MeetingCrew(agents, create_tasks(agents, meeting_data, parallel=Config.is_parallel_execution()))
+            started = time.perf_counter()
+            with activate(RunMetrics(company_name=meeting_data['company_name']), agents=agents) as metrics:
+                crew.kickoff()
+            wall_ms.append((time.perf_counter() - started) * 1000)
+            for key, value in metrics.totals().items():
+                totals[key] = totals.get(key, 0) + value
+            completed += 1
+
+        summary = summarize(wall_ms)
+        models = ", ".join(sorted({agent_settings['model'] for agent_settings in settings.values()}))
+        print(
+            f"{profile:<10}{summary['p50_ms'] / 1000:>9.2f}{summary['p95_ms'] / 1000:>9.2f}"
+            f"{totals.get('cost_usd', 0) / runs:>11.5f}"
+            f"{(totals.get('prompt_tokens', 0) + totals.get('completion_tokens', 0)) / runs:>9.0f}  {models}"
+        )
+    return completed == runs * len(profiles)
+
+
+# Cấu hình timeout/hedging của từng chế độ, theo bội số của độ trễ LLM giả lập
+_TAIL_MODES = {
+    'baseline': {'LLM_CALL_TIMEOUT_SECONDS': 0, 'LLM_HEDGE_ENABLED': False, 'LLM_MAX_RETRIES': 0},
+    'timeout': {'LLM_CALL_TIMEOUT_SECONDS': 4, 'LLM_HEDGE_ENABLED': False, 'LLM_MAX_RETRIES': 2},
+    'hedged': {'LLM_CALL_TIMEOUT_SECONDS': 0, 'LLM_HEDGE_ENABLED': True, 'LLM_MAX_RETRIES': 0},
+}
+
+
+def bench_tail_latency(modes=None, runs=20, llm_latency=0.05, slow_rate=0.05, slow_factor=20.0,
+                       search_latency=0.0, completion_chars=1500):
+    """
+    So sánh phần đuôi thời gian brief khi LLM giả lập có slow_rate lời gọi chậm gấp
+    slow_factor lần: không giới hạn, timeout + thử lại có jitter, và hedging theo p95
+
+    Returns:
+        bool: True nếu mọi lần chạy hoàn tất
+    """
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ.setdefault("SERPER_API_KEY", "offline")
+
+    import hedging
+    from agents import create_agents
+    from instrumentation import RunMetrics, activate, histogram_percentile, latency_histograms
+    from pipeline import MeetingCrew
+    from stubs import StubLLM, StubSerperDevTool
+    from tasks import create_tasks
+
+    overrides = {
+        'LLM_RETRY_BASE_SECONDS': llm_latency,
+        'LLM_RETRY_MAX_BACKOFF_SECONDS': llm_latency * 8,
+        'LLM_HEDGE_MIN_SAMPLES': 10,
+        'LLM_HEDGE_MIN_DELAY_SECONDS': llm_latency,
+        'LLM_LATENCY_BUCKETS': tuple(round(llm_latency * factor, 4) for factor in (1.5, 3, 6, 12, 25)),
+    }
+    saved = {key: getattr(Config, key) for key in set(overrides) | {key for mode in _TAIL_MODES.values() for key in mode}}
+    print(
+        f"⚙️ Chế độ: {Config.EXECUTION_MODE} · LLM latency={llm_latency}s · "
+        f"{slow_rate:.0%} lời gọi chậm x{slow_factor:g} · {runs} brief/chế độ"
+    )
+    print(f"{'mode':<10}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'max s':>8}{'hedge':>10}{'timeout':>9}{'retry':>7}")
+
+    completed = 0
+    histograms = {}
+    try:
+        for mode in modes or list(_TAIL_MODES):
+            for key, value in dict(overrides, **_TAIL_MODES[mode]).items():
+                # Timeout tính theo bội số độ trễ LLM giả lập
+                setattr(Config, key, value * llm_latency if key == 'LLM_CALL_TIMEOUT_SECONDS' else value)
+            # Mỗi chế độ bắt đầu với cửa sổ độ trễ trống (hedging tự học p95)
+            hedging._windows.clear()
+            wall_ms = []
+            records = []
+            totals = {}
+            for _ in range(runs):
+                llm = StubLLM(latency=llm_latency, completion_chars=completion_chars,
+                              slow_rate=slow_rate, slow_factor=slow_factor)
+                agents = create_agents(llm, search_tool=StubSerperDevTool(latency=search_latency))
+                crew = MeetingCrew(agents, create_tasks(agents, SAMPLE_MEETING, parallel=Config.is_parallel_execution()))
+                started = time.perf_counter()
+                with activate(RunMetrics(model=llm.model, company_name=SAMPLE_MEETING['company_name']),
+                              agents=agents) as metrics:
+                    crew.kickoff()
+                wall_ms.append((time.perf_counter() - started) * 1000)
+                records.extend(metrics.to_records())
+                for key, value in metrics.totals().items():
+                    totals[key] = totals.get(key, 0) + value
+                completed += 1
+
+            seconds = [sample / 1000 for sample in wall_ms]
+            print(
+                f"{mode:<10}{percentile(seconds, 50):>8.2f}{percentile(seconds, 95):>8.2f}"
+                f"{percentile(seconds, 99):>8.2f}{max(seconds):>8.2f}"
+                f"{totals.get('llm_hedge_wins', 0):>5}/{totals.get('llm_hedged', 0):<4}"
+                f"{totals.get('llm_timeouts', 0):>9}{totals.get('llm_retries', 0):>7}"
+            )
+            histograms[mode] = latency_histograms(records)
+    finally:
+        for key, value in saved.items():
+            setattr(Config, key, value)
+
+    print("\n📊 Histogram độ trễ lời gọi LLM theo task (số lời gọi / khoảng)")
+    for mode, by_task in histograms.items():
+        print(f"[{mode}]")
+        for task, histogram in by_task.items():
+            counts = " ".join(f"{label}:{count}" for label, count in histogram.items())
+            print(
+                f"  {task:<28} p95 {histogram_percentile(histogram, 95) or '-':>8} "
+                f"p99 {histogram_percentile(histogram, 99) or '-':>8}  {counts}"
+            )
+    return completed == runs * len(modes or _TAIL_MODES)
+
+
+def _parse_importtime(stderr):
+    """Các dòng của `python -X importtime`: (tên module, độ sâu, self µs, cumulative µs)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(parts[0]), int(parts[1])))
+    return entries
+
+
+def bench_startup(module='main', runs=3, budget_ms=None, top=10):
+    """
+    Đo thời gian import (cold start) của module bằng `python -X importtime`
+
+    Mỗi lần chạy là một process mới trong thư mục tạm (cache/báo cáo riêng, không
+    nạp trước). Module đo không được kéo theo các gói trong Config.LAZY_PACKAGES.
+
+    Returns:
+        bool: True nếu trung vị thời gian import nằm trong ngân sách budget_ms và
+            không gói nặng nào bị nạp lúc khởi động
+    """
+    budget_ms = budget_ms or Config.STARTUP_BUDGET_MS
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    totals_ms = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [repo_dir, os.environ.get('PYTHONPATH')])),
+            CACHE_DIR=os.path.join(workdir, "cache"),
+            WARMUP_IMPORTS="false",
+        )
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"❌ Không import được {module}:\n{completed.stderr[-2000:]}")
+                return False
+            entries = _parse_importtime(completed.stderr)
+            target = [cumulative for name, depth, _, cumulative in entries if name == module and depth == 0]
+            totals_ms.append((target[-1] if target else 0) / 1000)
+
+    # Phân tích của lần chạy cuối: thời gian riêng (self) theo gói, chỉ trong cây import
+    # của module (importtime in các module con trước module cha)
+    end = max(i for i, (name, depth, _, _) in enumerate(entries) if name == module and depth == 0)
+    start = end
+    while start > 0 and entries[start - 1][1] > 0:
+        start -= 1
+    packages = {}
+    for name, _, self_us, _ in entries[start:end + 1]:
+        root = name.split('.')[0]
+        packages[root] = packages.get(root, 0) + self_us / 1000
+    print(f"🚀 import {module}: {runs} lần, trung vị {percentile(totals_ms, 50):.0f} ms "
+          f"(min {min(totals_ms):.0f} ms, max {max(totals_ms):.0f} ms)")
+    for root, elapsed_ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"   {elapsed_ms:8.1f} ms  {root}")
+
+    loaded_lazy = sorted({
+        name for name, _, _, _ in entries if name.split('.')[0] in Config.LAZY_PACKAGES
+    })
+    if loaded_lazy:
+        print(f"❌ Gói lẽ ra chỉ nạp khi dùng: {', '.join(loaded_lazy[:top])}")
+    passed = percentile(totals_ms, 50) < budget_ms and not loaded_lazy
+    print(f"{'✅' if passed else '❌'} Ngân sách khởi động < {budget_ms:.0f} ms")
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline cho AI Meeting Agent")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('report-search', help="Tìm kiếm toàn văn trong kho báo cáo")
+    search_parser.add_argument('--reports', type=int, default=10000)
+    search_parser.add_argument('--queries', type=int, default=200)
+    search_parser.add_argument('--budget-ms', type=float, default=50.0)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="Pipeline đầy đủ với LLM/search giả lập")
+    pipeline_parser.add_argument('--runs', type=int, default=5)
+    pipeline_parser.add_argument('--llm-latency', type=float, default=0.0, help="Độ trễ mỗi lần gọi LLM (giây)")
+    pipeline_parser.add_argument('--search-latency', type=float, default=0.0, help="Độ trễ mỗi lần tìm kiếm (giây)")
+    pipeline_parser.add_argument('--completion-chars', type=int, default=1500)
+    pipeline_parser.add_argument('--payload-chars', type=int, default=2000)
+    pipeline_parser.add_argument('--execution-mode', choices=[Config.EXECUTION_MODE_SEQUENTIAL, Config.EXECUTION_MODE_PARALLEL])
+
+    rerun_parser = subparsers.add_parser('rerun', help="Chi phí dựng LLM/agents/crew mỗi rerun: trước và sau")
+    rerun_parser.add_argument('--runs', type=int, default=20)
+
+    groups_parser = subparsers.add_parser('contact-groups', help="Lấy tên nhóm liên hệ (People API giả lập)")
+    groups_parser.add_argument('--groups', type=int, default=50)
+    groups_parser.add_argument('--latency', type=float, default=0.05, help="Độ trễ mỗi round-trip (giây)")
+
+    contacts_parser = subparsers.add_parser('contacts-search', help="Tìm liên hệ cho ô chọn người tham gia")
+    contacts_parser.add_argument('--contacts', type=int, default=50000)
+    contacts_parser.add_argument('--queries', type=int, default=500)
+    contacts_parser.add_argument('--budget-ms', type=float, default=5.0)
+
+    routing_parser = subparsers.add_parser('routing', help="So sánh các routing profile model theo agent")
+    routing_parser.add_argument('--profiles', nargs='+', choices=list(Config.ROUTING_PROFILES))
+    routing_parser.add_argument('--runs', type=int, default=3)
+    routing_parser.add_argument('--llm-latency', type=float, default=0.05, help="Độ trễ mỗi lần gọi gpt-4o-mini (giây)")
+    routing_parser.add_argument('--search-latency', type=float, default=0.0)
+    routing_parser.add_argument('--completion-chars', type=int, default=1500)
+    routing_parser.add_argument('--execution-mode', choices=[Config.EXECUTION_MODE_SEQUENTIAL, Config.EXECUTION_MODE_PARALLEL])
+
+    tail_parser = subparsers.add_parser('tail-latency', help="Phần đuôi thời gian brief: timeout và hedging LLM")
+    tail_parser.add_argument('--modes', nargs='+', choices=list(_TAIL_MODES))
+    tail_parser.add_argument('--runs', type=int, default=20)
+    tail_parser.add_argument('--llm-latency', type=float, default=0.05, help="Độ trễ bình thường mỗi lần gọi LLM (giây)")
+    tail_parser.add_argument('--slow-rate', type=float, default=0.05, help="Tỉ lệ lời gọi rơi vào đuôi chậm")
+    tail_parser.add_argument('--slow-factor', type=float, default=20.0, help="Lời gọi chậm dài gấp bao nhiêu lần")
+    tail_parser.add_argument('--execution-mode', choices=[Config.EXECUTION_MODE_SEQUENTIAL, Config.EXECUTION_MODE_PARALLEL])
+
+    startup_parser = subparsers.add_parser('startup', help="Thời gian import lúc khởi động (-X importtime)")
+    startup_parser.add_argument('--module', default='main')
+    startup_parser.add_argument('--runs', type=int, default=3)
+    startup_parser.add_argument('--budget-ms', type=float, default=Config.STARTUP_BUDGET_MS)
+
+    args = parser.parse_args(argv)
+    if args.command == 'report-search':
+        passed = bench_report_search(args.reports, args.queries, args.budget_ms)
+    elif args.command == 'pipeline':
+        if args.execution_mode:
+            Config.EXECUTION_MODE = args.execution_mode
+        passed = bench_pipeline(args.runs, args.llm_latency, args.search_latency,
+                                args.completion_chars, args.payload_chars)
+    elif args.command == 'rerun':
+        passed = bench_rerun(args.runs)
+    elif args.command == 'contact-groups':
+        passed = bench_contact_groups(args.groups, args.latency)
+    elif args.command == 'contacts-search':
+        passed = bench_contacts_search(args.contacts, args.queries, args.budget_ms)
+    elif args.command == 'routing':
+        if args.execution_mode:
+            Config.EXECUTION_MODE = args.execution_mode
+        passed = bench_routing(args.profiles, args.runs, args.llm_latency, args.search_latency, args.completion_chars)
+    elif args.command == 'tail-latency':
+        if args.execution_mode:
+            Config.EXECUTION_MODE = args.execution_mode
+        passed = bench_tail_latency(args.modes, args.runs, args.llm_latency, args.slow_rate, args.slow_factor)
+    elif args.command == 'startup':
+        passed = bench_startup(args.module, args.runs, args.budget_ms)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Lưu đầu ra từng task của một lần chạy (theo run ID) ngay khi task hoàn thành, để chạy
+tiếp từ task chưa xong khi process chết hoặc provider lỗi giữa chừng
+"""
+import threading
+import time
+
+from config import Config
+from storage import connect_sqlite
+from task_memo import context_tasks, prefill_output, task_output_text
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_checkpoints (
+    run_id TEXT NOT NULL,
+    task_key TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, task_key)
+);
+CREATE INDEX IF NOT EXISTS idx_task_checkpoints_created_at ON task_checkpoints(created_at);
+"""
+
+
+class CheckpointStore:
+    """Kho SQLite lưu đầu ra đã hoàn thành theo (run ID, task)"""
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+        self.prune()
+
+    def save(self, run_id, task_key, output):
+        """Ghi đầu ra của một task (commit ngay, còn lại sau khi process chết)"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO task_checkpoints (run_id, task_key, output, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, task_key, output, time.time())
+            )
+
+    def load(self, run_id):
+        """Đầu ra đã lưu của lần chạy: task_key -> output"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_key, output FROM task_checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchall()
+        return {row['task_key']: row['output'] for row in rows}
+
+    def completed(self, run_id, task_keys):
+        """Key các task đã có checkpoint, theo thứ tự task_keys"""
+        saved = self.load(run_id)
+        return [key for key in task_keys if key in saved]
+
+    def delete(self, run_id):
+        """Xóa checkpoint khi lần chạy đã hoàn tất"""
+        with self._lock:
+            self._conn.execute("DELETE FROM task_checkpoints WHERE run_id = ?", (run_id,))
+
+    def prune(self):
+        """Xóa checkpoint của các lần chạy đã quá ttl_seconds"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM task_checkpoints WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+
+    def apply(self, run_id, tasks, task_keys):
+        """
+        Điền sẵn đầu ra đã lưu cho các task của lần chạy
+
+        Task chỉ được điền khi mọi task trong context của nó cũng đã có đầu ra, nên
+        crew chạy tiếp từ task đầu tiên chưa hoàn thành.
+
+        Returns:
+            list: Key của các task được điền từ checkpoint
+        """
+        saved = self.load(run_id)
+        resumed = []
+        for key, task in zip(task_keys, tasks):
+            if key not in saved or task_output_text(task) is not None:
+                continue
+            if any(task_output_text(t) is None for t in context_tasks(task)):
+                continue
+            prefill_output(task, saved[key])
+            resumed.append(key)
+        return resumed
+
+    def attach(self, run_id, tasks, task_keys):
+        """Gắn callback lưu checkpoint cho các task chưa có đầu ra"""
+        for key, task in zip(task_keys, tasks):
+            if task_output_text(task) is None:
+                task.callback = self._task_callback(run_id, key, task.callback)
+
+    def _task_callback(self, run_id, key, previous=None):
+        def _callback(output):
+            raw = getattr(output, 'raw', None)
+            self.save(run_id, key, raw if raw is not None else str(output))
+            if previous:
+                previous(output)
+        return _callback
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """Instance CheckpointStore dùng chung trong process"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = CheckpointStore(Config.CHECKPOINT_PATH, ttl_seconds=Config.CHECKPOINT_TTL_SECONDS)
+        return _shared_store
+
+
+def test_checkpoints():
+    """Test function để kiểm tra lưu checkpoint qua task callback (không gọi API)"""
+    import os
+    import tempfile
+
+    class _StubOutput:
+        def __init__(self, raw):
+            self.raw = raw
+
+    class _StubTask:
+        def __init__(self):
+            self.callback = None
+            self.output = None
+
+    print("🧪 Testing checkpoints...")
+    keys = ('context', 'industry', 'strategy', 'executive')
+    with tempfile.TemporaryDirectory() as workdir:
+        store = CheckpointStore(os.path.join(workdir, "checkpoints.sqlite3"), ttl_seconds=3600)
+        tasks = [_StubTask() for _ in keys]
+        store.attach('run-1', tasks, keys)
+        # Ba task đầu hoàn thành, task cuối lỗi (callback không được gọi)
+        for index, task in enumerate(tasks[:3]):
+            task.callback(_StubOutput(f"output {index}"))
+
+        # Process mới đọc lại checkpoint từ file
+        reopened = CheckpointStore(store.path, ttl_seconds=3600)
+        completed = reopened.completed('run-1', keys)
+        print(f"💾 Task đã lưu: {completed}")
+        passed = (
+            completed == ['context', 'industry', 'strategy']
+            and reopened.load('run-1')['strategy'] == "output 2"
+            and reopened.load('run-2') == {}
+        )
+        reopened.delete('run-1')
+        passed = passed and reopened.load('run-1') == {}
+    print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_checkpoints()
@@ -14,9 +14,144 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     SERPER_API_KEY = os.getenv("SERPER_API_KEY")
     
+    # SMTP settings (gửi brief qua email)
+    SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+    SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+    SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+    SMTP_MAX_CONNECTIONS = int(os.getenv("SMTP_MAX_CONNECTIONS", 3))
+    SMTP_TIMEOUT = 30
+    
     # Model settings
     MODEL_NAME = "gpt-4o-mini"
     MODEL_TEMPERATURE = 0.7
+    MODEL_MAX_TOKENS = None
+    
+    # Model routing: mỗi profile ghi đè model/temperature/max_tokens theo agent (key trong
+    # create_agents); agent không có trong profile dùng MODEL_NAME/MODEL_TEMPERATURE/MODEL_MAX_TOKENS
+    FAST_MODEL_NAME = os.getenv("FAST_MODEL_NAME", "gpt-4o-mini")
+    QUALITY_MODEL_NAME = os.getenv("QUALITY_MODEL_NAME", "gpt-4o")
+    ROUTING_PROFILES = {
+        # Một model cho mọi agent (như trước khi có routing)
+        "single": {},
+        # Tóm tắt kết quả tìm kiếm dùng model nhanh; chiến lược và brief cuối dùng model tốt hơn
+        "tiered": {
+            'context_analyzer': {'model': FAST_MODEL_NAME, 'temperature': 0.3, 'max_tokens': 1500},
+            'industry_insights_generator': {'model': FAST_MODEL_NAME, 'temperature': 0.3, 'max_tokens': 1500},
+            'strategy_formulator': {'model': QUALITY_MODEL_NAME, 'temperature': 0.7},
+            'executive_briefing_creator': {'model': QUALITY_MODEL_NAME, 'temperature': 0.5},
+        },
+        "quality": {
+            'context_analyzer': {'model': QUALITY_MODEL_NAME},
+            'industry_insights_generator': {'model': QUALITY_MODEL_NAME},
+            'strategy_formulator': {'model': QUALITY_MODEL_NAME},
+            'executive_briefing_creator': {'model': QUALITY_MODEL_NAME},
+        },
+    }
+    ROUTING_PROFILE = os.getenv("ROUTING_PROFILE", "single")
+    
+    # LLM call settings: timeout cho mỗi lời gọi, thử lại có jitter khi timeout/lỗi tạm thời,
+    # hedging (gửi thêm một bản sao khi lời gọi chậm hơn p95 gần đây, lấy kết quả về trước)
+    LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", 90))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_RETRY_BASE_SECONDS = 1.0
+    LLM_RETRY_MAX_BACKOFF_SECONDS = 20.0
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE = 95
+    LLM_HEDGE_MIN_SAMPLES = 20
+    LLM_HEDGE_MIN_DELAY_SECONDS = 1.0
+    LLM_LATENCY_WINDOW = 200
+    # Ngưỡng (giây) của histogram độ trễ lời gọi LLM theo task
+    LLM_LATENCY_BUCKETS = (1, 2, 5, 10, 20, 30, 60, 120)
+    LATENCY_HISTORY_REPORTS = 20
+    
+    # Bảng giá ước tính (USD / 1 triệu token): (input, output)
+    MODEL_PRICING = {
+        "gpt-4o-mini": (0.15, 0.60),
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4.1-mini": (0.40, 1.60),
+        "gpt-4.1": (2.00, 8.00),
+    }
+    
+    # Rate limit settings (dùng chung cho mọi session trong process)
+    # Giới hạn theo provider: (requests/phút, tokens/phút), None = không giới hạn
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    LLM_RPM = int(os.getenv("LLM_RPM", 500))
+    LLM_TPM = int(os.getenv("LLM_TPM", 200000))
+    SERPER_RPM = int(os.getenv("SERPER_RPM", 300))
+    RATE_LIMITS = {
+        "openai": (LLM_RPM, LLM_TPM),
+        "serper": (SERPER_RPM, None),
+    }
+    RATE_LIMIT_MAX_RETRIES = 5
+    RATE_LIMIT_MAX_BACKOFF_SECONDS = 60.0
+    
+    # Execution settings
+    # "sequential": 4 task chạy lần lượt
+    # "parallel": phân tích bối cảnh và phân tích ngành chạy song song rồi hợp lại
+    # (phân tích ngành không dùng kết quả phân tích bối cảnh nên nội dung brief thay đổi: phải bật tường minh)
+    EXECUTION_MODE_SEQUENTIAL = "sequential"
+    EXECUTION_MODE_PARALLEL = "parallel"
+    EXECUTION_MODE = os.getenv("EXECUTION_MODE", EXECUTION_MODE_SEQUENTIAL)
+    
+    # Streaming settings
+    # Agents được stream output lên giao diện (phân tách bằng dấu phẩy)
+    STREAM_AGENTS = tuple(
+        name.strip() for name in os.getenv("STREAM_AGENTS", "executive_briefing_creator").split(",") if name.strip()
+    )
+    
+    # Search cache settings
+    CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+    SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    SEARCH_CACHE_PATH = os.path.join(CACHE_DIR, "search_cache.sqlite3")
+    SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", 24 * 60 * 60))
+    SEARCH_CACHE_MAX_ENTRIES = 5000
+    
+    # Search result compaction (bỏ trùng, cắt bớt trước khi đưa kết quả vào prompt)
+    SEARCH_COMPACTION_ENABLED = os.getenv("SEARCH_COMPACTION_ENABLED", "true").lower() == "true"
+    SEARCH_RESULT_TOKEN_BUDGET = int(os.getenv("SEARCH_RESULT_TOKEN_BUDGET", 800))
+    SEARCH_SNIPPET_TOKEN_BUDGET = 80
+    # Hai kết quả có độ tương đồng Jaccard (theo cụm 5 từ) từ ngưỡng này được coi là trùng
+    SEARCH_DEDUP_SIMILARITY = 0.6
+    SEARCH_SHINGLE_SIZE = 5
+    
+    # Task memoization settings
+    TASK_MEMO_ENABLED = os.getenv("TASK_MEMO_ENABLED", "true").lower() == "true"
+    TASK_MEMO_PATH = os.path.join(CACHE_DIR, "task_memo.sqlite3")
+    TASK_MEMO_TTL_SECONDS = SEARCH_CACHE_TTL_SECONDS
+    
+    # Checkpoint đầu ra từng task theo job, để chạy tiếp job lỗi/bị ngắt từ task chưa xong
+    CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+    CHECKPOINT_PATH = os.path.join(CACHE_DIR, "checkpoints.sqlite3")
+    CHECKPOINT_TTL_SECONDS = 7 * 24 * 3600
+    
+    # Google Contacts cache (đồng bộ tăng dần qua sync token)
+    CONTACTS_CACHE_PATH = os.path.join(CACHE_DIR, "contacts.sqlite3")
+    CONTACT_GROUPS_TTL_SECONDS = 60 * 60
+    CONTACT_GROUPS_WORKERS = 8
+    ATTENDEE_SUGGESTIONS = 8
+    
+    # Batch settings
+    BATCH_CONCURRENCY = 4
+    
+    # Background job queue settings
+    JOB_QUEUE_PATH = os.path.join(CACHE_DIR, "jobs.sqlite3")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_INTERVAL = 1.0
+    JOB_IDLE_POLL_INTERVAL = 2.0
+    MAX_RECENT_JOBS = 5
+    # Yêu cầu giống hệt trong khoảng này sau khi job hoàn tất sẽ dùng lại kết quả
+    SINGLE_FLIGHT_REUSE_SECONDS = int(os.getenv("SINGLE_FLIGHT_REUSE_SECONDS", 10 * 60))
+    
+    # Outbound mail queue settings (gửi nền, thử lại với exponential backoff)
+    MAIL_QUEUE_PATH = os.path.join(CACHE_DIR, "outbox.sqlite3")
+    MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BASE_SECONDS = 30.0
+    MAIL_RETRY_MAX_SECONDS = 60 * 60.0
+    MAIL_BATCH_SIZE = 20
+    MAIL_LEASE_SECONDS = 5 * 60
+    MAIL_IDLE_POLL_INTERVAL = 2.0
     
     # Meeting settings
     MIN_MEETING_DURATION = 15
@@ -27,16 +162,57 @@ class Config:
     # File settings
     MAX_HISTORY_FILES = 5
     FILE_ENCODING = 'utf-8'
+    REPORTS_DIR = "reports"
+    REPORT_INDEX_PATH = os.path.join(REPORTS_DIR, "index.sqlite3")
+    # Bản render HTML/bản in của báo cáo, theo hash nội dung
+    RENDER_CACHE_DIR = os.path.join(CACHE_DIR, "rendered")
+    RENDER_CACHE_ITEMS = 32
+    SEARCH_RESULTS_LIMIT = 10
     
     # UI settings
     PAGE_TITLE = "🤖 AI Agent - Meeting Scheduler"
     PAGE_LAYOUT = "wide"
     
+    # Startup settings: crewai và Google API chỉ được import khi dùng lần đầu;
+    # sau lần hiển thị đầu tiên có thể nạp trước chúng trên thread nền
+    WARMUP_IMPORTS = os.getenv("WARMUP_IMPORTS", "true").lower() == "true"
+    WARMUP_MODULES = (
+        "agents",
+        "pipeline",
+        "tasks",
+        "googleapiclient.discovery",
+        "google_auth_oauthlib.flow",
+        "google.oauth2.credentials",
+    )
+    # Các gói không được nạp khi khởi động main.py (kiểm tra bởi warmup.test_startup và benchmark startup)
+    LAZY_PACKAGES = ("crewai", "crewai_tools", "litellm", "googleapiclient", "google_auth_oauthlib")
+    # Ngân sách thời gian import main.py (trung vị, ms)
+    STARTUP_BUDGET_MS = 1500.0
+    
     @classmethod
     def validate_api_keys(cls):
         """Kiểm tra tính hợp lệ của API keys"""
         return bool(cls.OPENAI_API_KEY and cls.SERPER_API_KEY)
     
+    @classmethod
+    def agent_llm_settings(cls, agent_key, profile=None):
+        """Cấu hình LLM (model, temperature, max_tokens) của agent theo routing profile"""
+        settings = {
+            'model': cls.MODEL_NAME,
+            'temperature': cls.MODEL_TEMPERATURE,
+            'max_tokens': cls.MODEL_MAX_TOKENS,
+        }
+        routing = cls.ROUTING_PROFILES.get(profile or cls.ROUTING_PROFILE)
+        if routing is None:
+            raise ValueError(f"Không có routing profile '{profile or cls.ROUTING_PROFILE}'")
+        settings.update(routing.get(agent_key, {}))
+        return settings
+    
+    @classmethod
+    def is_parallel_execution(cls):
+        """Kiểm tra chế độ chạy song song các task độc lập"""
+        return cls.EXECUTION_MODE == cls.EXECUTION_MODE_PARALLEL
+    
     @classmethod
     def set_environment_variables(cls):
         """Thiết lập environment variables"""
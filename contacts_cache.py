@@ -0,0 +1,412 @@
+"""
+Đồng bộ Google Contacts (People API) vào cache SQLite cục bộ, chỉ áp dụng phần thay đổi
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from storage import connect_sqlite
+
+PERSON_FIELDS = 'names,emailAddresses,organizations,memberships'
+MAX_PAGE_SIZE = 1000
+# Giới hạn số nhóm mỗi lời gọi contactGroups().batchGet
+MAX_GROUPS_PER_BATCH = 200
+
+# Tên hiển thị của các nhóm hệ thống
+SYSTEM_LABELS = {
+    'myContacts': 'Liên hệ của tôi',
+    'starred': 'Quan trọng',
+    'blocked': 'Bị chặn',
+    'family': 'Gia đình',
+    'friends': 'Bạn bè',
+    'coworkers': 'Đồng nghiệp'
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    resource_name TEXT PRIMARY KEY,
+    person TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS contacts_deleted (
+    resource_name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contacts_sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def person_to_contact(person, groups_dict):
+    """Chuyển một person của People API thành contact (None nếu thiếu tên hoặc email)"""
+    names = person.get('names', [])
+    emails_data = person.get('emailAddresses', [])
+    
+    if not (names and emails_data):
+        return None
+    
+    name = names[0].get('displayName')
+    email = emails_data[0].get('value')
+    
+    # Chức danh và công ty
+    title = ''
+    organizations = person.get('organizations', [])
+    if organizations:
+        org = organizations[0]
+        title = org.get('title', '')
+    
+    # Nhãn/nhóm
+    labels = []
+    memberships = person.get('memberships', [])
+    for membership in memberships:
+        contact_group = membership.get('contactGroupMembership', {})
+        if contact_group:
+            group_id = contact_group.get('contactGroupResourceName', '').replace('contactGroups/', '')
+            if group_id:
+                label_name = SYSTEM_LABELS.get(group_id, groups_dict.get(group_id, 'Nhóm tùy chỉnh'))
+                labels.append(label_name)
+    
+    return {
+        'name': name,
+        'email': email,
+        'title': title,
+        'labels': labels
+    }
+
+
+def _is_expired_sync_token(error):
+    """People API trả về 410 GONE khi sync token hết hạn (khoảng 7 ngày)"""
+    response = getattr(error, 'resp', None)
+    return str(getattr(response, 'status', '')) == '410'
+
+
+class ContactsCache:
+    """
+    Lưu nguyên bản ghi person của People API cùng sync token gần nhất
+
+    Mỗi lần apply có thay đổi tăng revision; person được ghi/xóa mang revision đó để
+    các index trong bộ nhớ chỉ cập nhật phần thay đổi (changes_since).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(contacts)")}
+        if 'revision' not in columns:
+            self._conn.execute("ALTER TABLE contacts ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+
+    def get_sync_token(self):
+        return self._get_state('sync_token')
+
+    def revision(self):
+        """(revision hiện tại, revision của lần đồng bộ toàn bộ gần nhất)"""
+        return int(self._get_state('revision') or 0), int(self._get_state('full_revision') or 0)
+
+    def changes_since(self, revision):
+        """
+        Thay đổi sau revision
+
+        Returns:
+            tuple: (danh sách person được thêm/sửa, danh sách resource_name bị xóa)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT person FROM contacts WHERE revision > ?", (revision,)
+            ).fetchall()
+            deleted = self._conn.execute(
+                "SELECT resource_name FROM contacts_deleted WHERE revision > ?", (revision,)
+            ).fetchall()
+        return [json.loads(row['person']) for row in rows], [row['resource_name'] for row in deleted]
+
+    def save_groups(self, groups_dict):
+        """Ghi nhớ tên nhóm để chuyển person thành contact mà không cần gọi API"""
+        self._set_state('groups', json.dumps(groups_dict, ensure_ascii=False))
+
+    def get_groups(self):
+        return json.loads(self._get_state('groups') or '{}')
+
+    def _get_state(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM contacts_sync_state WHERE key = ?", (key,)
+            ).fetchone()
+        return row['value'] if row else None
+
+    def _set_state(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contacts_sync_state (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def apply(self, people, sync_token, full=False):
+        """
+        Áp dụng một lần đồng bộ trong một transaction
+
+        Args:
+            people: Các person trả về (person có metadata.deleted sẽ bị xóa khỏi cache)
+            sync_token: nextSyncToken để lần sau chỉ lấy phần thay đổi
+            full: Đồng bộ toàn bộ, thay thế mọi thứ đang có trong cache
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM contacts_sync_state WHERE key = 'revision'"
+                ).fetchone()
+                revision = int(row['value']) + 1 if row else 1
+                if full:
+                    self._conn.execute("DELETE FROM contacts")
+                    self._conn.execute("DELETE FROM contacts_deleted")
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO contacts_sync_state (key, value) VALUES ('full_revision', ?)",
+                        (str(revision),)
+                    )
+                for person in people:
+                    resource_name = person.get('resourceName')
+                    if not resource_name:
+                        continue
+                    if person.get('metadata', {}).get('deleted'):
+                        self._conn.execute("DELETE FROM contacts WHERE resource_name = ?", (resource_name,))
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO contacts_deleted (resource_name, revision) VALUES (?, ?)",
+                            (resource_name, revision)
+                        )
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO contacts (resource_name, person, updated_at, revision) "
+                            "VALUES (?, ?, ?, ?)",
+                            (resource_name, json.dumps(person, ensure_ascii=False), now, revision)
+                        )
+                if full or people:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO contacts_sync_state (key, value) VALUES ('revision', ?)",
+                        (str(revision),)
+                    )
+                if sync_token:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO contacts_sync_state (key, value) VALUES ('sync_token', ?)",
+                        (sync_token,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def list_people(self):
+        """Mọi person đang có trong cache"""
+        with self._lock:
+            rows = self._conn.execute("SELECT person FROM contacts ORDER BY resource_name").fetchall()
+        return [json.loads(row['person']) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM contacts")
+            self._conn.execute("DELETE FROM contacts_deleted")
+            self._conn.execute("DELETE FROM contacts_sync_state")
+
+
+def _list_connections(service, sync_token=None):
+    """
+    Đọc hết các trang connections (pageSize tối đa)
+
+    Returns:
+        tuple: (danh sách person, nextSyncToken)
+    """
+    people = []
+    page_token = None
+    next_sync_token = None
+    while True:
+        params = {
+            'resourceName': 'people/me',
+            'pageSize': MAX_PAGE_SIZE,
+            'personFields': PERSON_FIELDS,
+            'requestSyncToken': True,
+        }
+        if sync_token:
+            params['syncToken'] = sync_token
+        if page_token:
+            params['pageToken'] = page_token
+
+        response = service.people().connections().list(**params).execute()
+        people.extend(response.get('connections', []))
+        next_sync_token = response.get('nextSyncToken') or next_sync_token
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return people, next_sync_token
+
+
+def sync_contacts(service, cache):
+    """
+    Đồng bộ danh bạ vào cache: lần đầu (hoặc khi sync token hết hạn) tải toàn bộ,
+    các lần sau chỉ tải phần thay đổi kể từ lần trước
+
+    Returns:
+        dict: {'full': đồng bộ toàn bộ hay không, 'changes': số person nhận về}
+    """
+    sync_token = cache.get_sync_token()
+    if sync_token:
+        try:
+            people, next_sync_token = _list_connections(service, sync_token)
+            cache.apply(people, next_sync_token)
+            return {'full': False, 'changes': len(people)}
+        except Exception as e:
+            if not _is_expired_sync_token(e):
+                raise
+
+    people, next_sync_token = _list_connections(service)
+    cache.apply(people, next_sync_token, full=True)
+    return {'full': True, 'changes': len(people)}
+
+
+def _group_id(resource_name):
+    return resource_name.replace('contactGroups/', '')
+
+
+def _group_display_name(group, group_id):
+    return group.get('formattedName') or group.get('name') or group_id
+
+
+def _list_contact_groups(service):
+    groups = []
+    page_token = None
+    while True:
+        params = {'pageSize': MAX_PAGE_SIZE}
+        if page_token:
+            params['pageToken'] = page_token
+        response = service.contactGroups().list(**params).execute()
+        groups.extend(response.get('contactGroups', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return groups
+
+
+def _batch_get_groups(service, resource_names):
+    """Chi tiết nhóm qua batchGet, mỗi lời gọi tối đa MAX_GROUPS_PER_BATCH nhóm"""
+    details = {}
+    for start in range(0, len(resource_names), MAX_GROUPS_PER_BATCH):
+        response = service.contactGroups().batchGet(
+            resourceNames=resource_names[start:start + MAX_GROUPS_PER_BATCH],
+            maxMembers=0
+        ).execute()
+        for item in response.get('responses', []):
+            group = item.get('contactGroup')
+            if group:
+                details[item.get('requestedResourceName') or group.get('resourceName')] = group
+    return details
+
+
+def _parallel_get_groups(service, resource_names):
+    """Dự phòng khi không dùng được batchGet: gọi get song song với số thread giới hạn"""
+    def fetch(resource_name):
+        try:
+            return resource_name, service.contactGroups().get(resourceName=resource_name, maxMembers=0).execute()
+        except Exception:
+            return resource_name, None
+
+    with ThreadPoolExecutor(max_workers=max(1, Config.CONTACT_GROUPS_WORKERS)) as executor:
+        return {name: group for name, group in executor.map(fetch, resource_names) if group}
+
+
+def resolve_contact_groups(service):
+    """
+    Tên hiển thị của các nhóm liên hệ theo ID nhóm
+
+    Một lời gọi list và ceil(N / MAX_GROUPS_PER_BATCH) lời gọi batchGet thay vì
+    một lời gọi get cho mỗi nhóm; nhóm không lấy được chi tiết dùng tên trong list.
+    """
+    groups = _list_contact_groups(service)
+    resource_names = [group['resourceName'] for group in groups if group.get('resourceName')]
+    try:
+        details = _batch_get_groups(service, resource_names)
+    except Exception:
+        details = _parallel_get_groups(service, resource_names)
+
+    groups_dict = {}
+    for group in groups:
+        resource_name = group.get('resourceName', '')
+        group_id = _group_id(resource_name)
+        groups_dict[group_id] = _group_display_name(details.get(resource_name, group), group_id)
+    return groups_dict
+
+
+_groups_cache = {}
+_groups_cache_lock = threading.Lock()
+
+
+def get_contact_groups(service, refresh=False):
+    """resolve_contact_groups có cache trong process (Config.CONTACT_GROUPS_TTL_SECONDS)"""
+    now = time.time()
+    with _groups_cache_lock:
+        cached = _groups_cache.get('groups')
+        if cached and not refresh and now - cached[0] < Config.CONTACT_GROUPS_TTL_SECONDS:
+            return cached[1]
+
+    groups_dict = resolve_contact_groups(service)
+    with _groups_cache_lock:
+        _groups_cache['groups'] = (now, groups_dict)
+    return groups_dict
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_contacts_cache():
+    """Instance ContactsCache dùng chung trong process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ContactsCache(Config.CONTACTS_CACHE_PATH)
+        return _shared_cache
+
+
+def test_contacts_sync():
+    """Test function để kiểm tra đồng bộ với People API giả lập (không gọi API)"""
+    import os
+    import tempfile
+
+    from fakes import FakePeopleService
+
+    print("🧪 Testing contacts sync...")
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = ContactsCache(os.path.join(workdir, "contacts.sqlite3"))
+        service = FakePeopleService.generate(2500)
+
+        first = sync_contacts(service, cache)
+        pages_full = service.list_calls
+
+        service.update_person(0, name="Người đã đổi tên")
+        service.delete_person(1)
+        second = sync_contacts(service, cache)
+
+        service.expire_sync_tokens()
+        third = sync_contacts(service, cache)
+
+        names = {person['names'][0]['displayName'] for person in cache.list_people()}
+        print(f"📥 Lần đầu: {first['changes']} liên hệ qua {pages_full} trang")
+        print(f"🔄 Lần hai: {second['changes']} thay đổi · Token hết hạn: đồng bộ lại {third['changes']}")
+        passed = (
+            first == {'full': True, 'changes': 2500}
+            and pages_full == 3
+            and second == {'full': False, 'changes': 2}
+            and third['full']
+            and cache.count() == 2499
+            and "Người đã đổi tên" in names
+        )
+        print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_contacts_sync()
@@ -0,0 +1,387 @@
+"""
+Index tìm kiếm danh bạ trong bộ nhớ (tiền tố + trigram) cho ô chọn người tham gia
+"""
+import bisect
+import collections
+import functools
+import heapq
+import re
+import threading
+import unicodedata
+
+from contacts_cache import get_contacts_cache, person_to_contact
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+# Tách từ gốc (chưa chuẩn hóa) để cache theo từ, kể cả các phần của email
+_WORD_SPLIT = re.compile(r"[\s.,;:@_+\-/()]+")
+# Số vị trí duyệt tuần tự trước khi chuyển sang giao tập id (tìm nhiều từ)
+_PREFIX_SCAN_BUDGET = 200
+# Số ứng viên tối đa được chấm điểm khi tìm gần đúng
+_MAX_FUZZY_CANDIDATES = 300
+# Số id tối đa được đếm trên các posting trigram (hiếm trước) để chọn ứng viên gần đúng
+_FUZZY_COUNT_BUDGET = 5000
+MIN_FUZZY_SCORE = 0.4
+
+
+def normalize_text(text):
+    """Chữ thường, bỏ dấu tiếng Việt ("Nguyễn Đức" -> "nguyen duc")"""
+    text = unicodedata.normalize('NFKD', str(text or '').lower().replace('đ', 'd'))
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_SPLIT.split(normalize_text(text)) if token]
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_terms(word):
+    # Tên/chức danh lặp lại rất nhiều trong danh bạ nên cache theo từ gốc
+    tokens = tuple(tokenize(word))
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return tokens, frozenset(grams)
+
+
+def trigrams(text):
+    """Tập trigram của từng từ (có đệm khoảng trắng để ưu tiên đầu từ)"""
+    grams = set()
+    for word in _WORD_SPLIT.split(str(text or '')):
+        grams |= _word_terms(word)[1]
+    return grams
+
+
+def _contact_terms(contact):
+    """(tập token, tập trigram) của tên, email và chức danh"""
+    tokens = set()
+    grams = set()
+    for field in ('name', 'email', 'title'):
+        for word in _WORD_SPLIT.split(str(contact.get(field) or '')):
+            word_tokens, word_grams = _word_terms(word)
+            tokens.update(word_tokens)
+            grams |= word_grams
+    return tokens, grams
+
+
+class ContactsIndex:
+    """
+    Tìm liên hệ theo tên, email, chức danh; lọc theo nhãn
+
+    - Tiền tố: danh sách (token, id) đã sắp xếp, tìm bằng bisect; nhiều từ thì giao
+      tập id theo từng token (danh sách token đã sắp xếp + token -> tập id)
+    - Gần đúng: posting list trigram -> id, chấm điểm theo tỉ lệ trigram trùng
+
+    Contact trả về có thêm 'resource_name' (id trong index) để phân biệt các liên hệ
+    trùng email.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._contacts = {}
+        self._doc_tokens = {}
+        self._doc_trigrams = {}
+        self._prefix = []
+        self._vocab = []
+        self._token_docs = {}
+        self._postings = {}
+        self._labels = {}
+        self.revision = None
+
+    def __len__(self):
+        return len(self._contacts)
+
+    def upsert(self, doc_id, contact):
+        with self._lock:
+            if doc_id in self._contacts:
+                self.remove(doc_id)
+            tokens, grams = _contact_terms(contact)
+            self._contacts[doc_id] = dict(contact, resource_name=doc_id)
+            self._doc_tokens[doc_id] = tokens
+            self._doc_trigrams[doc_id] = grams
+            for token in tokens:
+                bisect.insort(self._prefix, (token, doc_id))
+                if token not in self._token_docs:
+                    bisect.insort(self._vocab, token)
+                    self._token_docs[token] = set()
+                self._token_docs[token].add(doc_id)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(doc_id)
+            for label in contact.get('labels') or []:
+                self._labels.setdefault(label, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            contact = self._contacts.pop(doc_id, None)
+            if contact is None:
+                return
+            for token in self._doc_tokens.pop(doc_id):
+                position = bisect.bisect_left(self._prefix, (token, doc_id))
+                if position < len(self._prefix) and self._prefix[position] == (token, doc_id):
+                    del self._prefix[position]
+                docs = self._token_docs[token]
+                docs.discard(doc_id)
+                if not docs:
+                    del self._token_docs[token]
+                    del self._vocab[bisect.bisect_left(self._vocab, token)]
+            for gram in self._doc_trigrams.pop(doc_id):
+                self._postings[gram].discard(doc_id)
+            for label in contact.get('labels') or []:
+                self._labels.get(label, set()).discard(doc_id)
+
+    def rebuild(self, contacts):
+        """Xây lại toàn bộ index từ dict id -> contact (nhanh hơn upsert từng cái)"""
+        with self._lock:
+            self.__init__()
+            prefix = []
+            for doc_id, contact in contacts.items():
+                tokens, grams = _contact_terms(contact)
+                self._contacts[doc_id] = dict(contact, resource_name=doc_id)
+                self._doc_tokens[doc_id] = tokens
+                self._doc_trigrams[doc_id] = grams
+                prefix.extend((token, doc_id) for token in tokens)
+                for token in tokens:
+                    self._token_docs.setdefault(token, set()).add(doc_id)
+                for gram in grams:
+                    self._postings.setdefault(gram, set()).add(doc_id)
+                for label in contact.get('labels') or []:
+                    self._labels.setdefault(label, set()).add(doc_id)
+            prefix.sort()
+            self._prefix = prefix
+            self._vocab = sorted(self._token_docs)
+
+    def labels(self):
+        """Các nhãn đang có liên hệ, sắp xếp theo tên"""
+        with self._lock:
+            return sorted(label for label, ids in self._labels.items() if ids)
+
+    def search(self, query, labels=None, limit=10):
+        """
+        Liên hệ khớp query: khớp tiền tố mọi từ trước, sau đó bổ sung kết quả gần đúng
+
+        Args:
+            query: Chuỗi tìm kiếm (tên, email, chức danh; không phân biệt dấu)
+            labels: Chỉ lấy liên hệ có ít nhất một trong các nhãn này
+            limit: Số kết quả tối đa
+        """
+        query_tokens = tokenize(query)
+        with self._lock:
+            allowed = None
+            if labels:
+                allowed = set().union(*(self._labels.get(label, set()) for label in labels))
+            if not query_tokens:
+                ids = sorted(allowed)[:limit] if allowed is not None else []
+                return [self._contacts[doc_id] for doc_id in ids]
+
+            results = self._prefix_search(query_tokens, allowed, limit)
+            if len(results) < limit:
+                seen = set(results)
+                fuzzy = self._fuzzy_search(query, allowed, limit)
+                results.extend(doc_id for doc_id in fuzzy if doc_id not in seen)
+            return [self._contacts[doc_id] for doc_id in results[:limit]]
+
+    def _token_range(self, token):
+        start = bisect.bisect_left(self._prefix, (token,))
+        end = bisect.bisect_left(self._prefix, (token + '\uffff',))
+        return start, end
+
+    def _vocab_range(self, token):
+        """Các token trong index có tiền tố token"""
+        start = bisect.bisect_left(self._vocab, token)
+        end = bisect.bisect_left(self._vocab, token + '\uffff')
+        return self._vocab[start:end]
+
+    def _prefix_search(self, query_tokens, allowed, limit):
+        ranges = sorted((self._token_range(token), token) for token in set(query_tokens))
+        ranges.sort(key=lambda item: item[0][1] - item[0][0])
+        (start, end), _ = ranges[0]
+        if start == end:
+            # Có từ không là tiền tố của token nào: không liên hệ nào khớp mọi từ
+            return []
+
+        # Duyệt khoảng hẹp nhất theo thứ tự và dừng khi đủ kết quả (trường hợp phổ biến:
+        # nhiều liên hệ khớp); chỉ khi duyệt hết ngân sách mà chưa đủ mới giao tập id
+        results = []
+        scan_end = end if len(ranges) == 1 else min(end, start + _PREFIX_SCAN_BUDGET)
+        for position in range(start, scan_end):
+            doc_id = self._prefix[position][1]
+            if doc_id in results or (allowed is not None and doc_id not in allowed):
+                continue
+            doc_tokens = self._doc_tokens[doc_id]
+            if all(any(doc_token.startswith(token) for doc_token in doc_tokens) for _, token in ranges[1:]):
+                results.append(doc_id)
+                if len(results) >= limit:
+                    return results
+        if scan_end == end:
+            return results
+
+        # Nhiều từ: giao tập id theo khoảng hẹp nhất trước, mỗi từ tiếp theo giao với tập id
+        # của từng token có tiền tố đó; từ khớp quá nhiều token khác nhau (so với số ứng
+        # viên còn lại) thì kiểm tra trực tiếp trên token của từng liên hệ
+        candidates = set().union(*(self._token_docs[token] for token in self._vocab_range(ranges[0][1])))
+        if allowed is not None:
+            candidates &= allowed
+        for _, token in ranges[1:]:
+            if not candidates:
+                break
+            vocab = self._vocab_range(token)
+            if len(vocab) <= len(candidates):
+                candidates = set().union(*(candidates & self._token_docs[doc_token] for doc_token in vocab))
+            else:
+                candidates = {
+                    doc_id for doc_id in candidates
+                    if any(doc_token.startswith(token) for doc_token in self._doc_tokens[doc_id])
+                }
+        return sorted(candidates)[:limit]
+
+    def _fuzzy_search(self, query, allowed, limit):
+        query_grams = trigrams(query)
+        if len(query_grams) < 3:
+            return []
+
+        postings = sorted(
+            (self._postings[gram] for gram in query_grams if self._postings.get(gram)),
+            key=len
+        )
+        # Đếm số trigram trùng của từng liên hệ trên các posting hiếm trước, trong giới hạn
+        # _FUZZY_COUNT_BUDGET id. Trigram hiếm nhất thường do chính lỗi gõ tạo ra, nên ứng
+        # viên là các liên hệ trùng nhiều trigram nhất chứ không chỉ posting hiếm nhất
+        hits = collections.Counter()
+        counted = 0
+        for posting in postings:
+            if counted + len(posting) > _FUZZY_COUNT_BUDGET:
+                break
+            hits.update(posting)
+            counted += len(posting)
+        if hits:
+            candidates = heapq.nlargest(_MAX_FUZZY_CANDIDATES, hits, key=hits.__getitem__)
+        else:
+            # Mọi trigram đều phổ biến: thu hẹp bằng giao các posting nhỏ nhất
+            candidates = set(postings[0]) if postings else set()
+            for posting in postings[1:]:
+                if len(candidates) <= _MAX_FUZZY_CANDIDATES:
+                    break
+                narrowed = candidates & posting
+                if len(narrowed) < limit:
+                    break
+                candidates = narrowed
+
+        # Điểm tính trên toàn bộ trigram của query
+        scored = []
+        for doc_id in candidates:
+            if allowed is not None and doc_id not in allowed:
+                continue
+            score = len(query_grams & self._doc_trigrams[doc_id]) / len(query_grams)
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((-score, doc_id))
+        scored.sort()
+        return [doc_id for _, doc_id in scored[:limit]]
+
+    def refresh(self, cache):
+        """
+        Đồng bộ index với ContactsCache: chỉ áp dụng thay đổi sau revision đã index,
+        xây lại toàn bộ khi cache vừa đồng bộ toàn bộ hoặc bị xóa
+
+        Returns:
+            bool: True nếu index có thay đổi
+        """
+        revision, full_revision = cache.revision()
+        with self._lock:
+            if revision == self.revision:
+                return False
+            groups = cache.get_groups()
+            if self.revision is None or full_revision > self.revision or revision < self.revision:
+                contacts = {}
+                for person in cache.list_people():
+                    contact = person_to_contact(person, groups)
+                    if contact:
+                        contacts[person['resourceName']] = contact
+                self.rebuild(contacts)
+            else:
+                people, deleted = cache.changes_since(self.revision)
+                for resource_name in deleted:
+                    self.remove(resource_name)
+                for person in people:
+                    contact = person_to_contact(person, groups)
+                    if contact:
+                        self.upsert(person['resourceName'], contact)
+                    else:
+                        self.remove(person['resourceName'])
+            self.revision = revision
+            return True
+
+
+def format_attendee(contact):
+    """Dòng "Tên - chức danh" cho ô người tham gia"""
+    title = contact.get('title')
+    return f"{contact['name']} - {title}" if title else contact['name']
+
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+def get_contacts_index():
+    """Index dùng chung trong process, cập nhật theo cache danh bạ mỗi lần lấy"""
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = ContactsIndex()
+    _shared_index.refresh(get_contacts_cache())
+    return _shared_index
+
+
+def test_contacts_index():
+    """Test function để kiểm tra tìm kiếm và cập nhật tăng dần theo cache (không gọi API)"""
+    import os
+    import tempfile
+
+    from contacts_cache import ContactsCache, sync_contacts
+    from fakes import FakePeopleService
+
+    print("🧪 Testing ContactsIndex...")
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = ContactsCache(os.path.join(workdir, "contacts.sqlite3"))
+        service = FakePeopleService.generate(1000)
+        sync_contacts(service, cache)
+        cache.save_groups({'group1': 'Nhóm 1'})
+
+        index = ContactsIndex()
+        index.refresh(cache)
+        prefix_hits = index.search("liên hệ 12", limit=20)
+        fuzzy_hits = index.search("contct12@exmple")
+        label_hits = index.search("liên", labels=['Nhóm 1'], limit=1000)
+
+        service.update_person(7, name="Trần Thị Bích Ngọc")
+        service.delete_person(8)
+        sync_contacts(service, cache)
+        changed = index.refresh(cache)
+        renamed = index.search("bich ngoc")
+        deleted = index.search("Liên hệ 8", limit=1)
+
+        # Trigram hiếm nhất của query gõ sai ("anx") chỉ có ở liên hệ khác: liên hệ đúng vẫn
+        # phải được chấm điểm
+        typo_index = ContactsIndex()
+        for doc_id, name in (('a', "Nguyễn Văn Thanh"), ('b', "Trần Thái"), ('c', "Lê Hân")):
+            typo_index.upsert(doc_id, {'name': name, 'email': '', 'title': ''})
+        before_typo = [hit['resource_name'] for hit in typo_index.search("thanx")]
+        typo_index.upsert('d', {'name': "Alex Lanx", 'email': '', 'title': ''})
+        after_typo = [hit['resource_name'] for hit in typo_index.search("thanx")]
+
+        print(f"🔎 Tiền tố: {len(prefix_hits)} · Gần đúng: {fuzzy_hits[0]['email'] if fuzzy_hits else None}")
+        print(f"🏷️ Lọc nhãn: {len(label_hits)} · Sau cập nhật: {len(index)} liên hệ")
+        passed = (
+            len(prefix_hits) == 20 and prefix_hits[0]['name'] == "Liên hệ 12"
+            and fuzzy_hits and fuzzy_hits[0]['email'] == "contact12@example.com"
+            and len(label_hits) == 200 and all('Nhóm 1' in hit['labels'] for hit in label_hits)
+            and changed and len(index) == 999
+            and [hit['name'] for hit in renamed] == ["Trần Thị Bích Ngọc"]
+            and all(hit['name'] != "Liên hệ 8" for hit in deleted)
+            and format_attendee(renamed[0]) == "Trần Thị Bích Ngọc - Chức danh 7"
+            and 'a' in before_typo and after_typo == before_typo
+        )
+        print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_contacts_index()
@@ -0,0 +1,271 @@
+"""
+People API và SMTP server giả lập (offline, không phụ thuộc crewai) cho test và benchmark
+"""
+import socketserver
+import threading
+import time
+
+class FakeHttpError(Exception):
+    """Lỗi HTTP giả lập có resp.status như googleapiclient.errors.HttpError"""
+
+    def __init__(self, status, message=''):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.resp = type('FakeResponse', (), {'status': status})()
+
+
+class _FakeRequest:
+    def __init__(self, service, func, **params):
+        self._service = service
+        self._func = func
+        self._params = params
+
+    def execute(self):
+        # Mỗi lần execute là một round-trip HTTP
+        self._service.round_trips += 1
+        if self._service.latency:
+            time.sleep(self._service.latency)
+        return self._func(**self._params)
+
+
+class _FakeContactGroups:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, **params):
+        return _FakeRequest(self._service, self._service._list_groups, **params)
+
+    def get(self, resourceName, **params):
+        return _FakeRequest(self._service, self._service._get_group, resourceName=resourceName)
+
+    def batchGet(self, resourceNames, **params):
+        if not self._service.supports_batch:
+            raise FakeHttpError(501, "NOT_IMPLEMENTED")
+        return _FakeRequest(self._service, self._service._batch_get_groups, resourceNames=resourceNames)
+
+
+class FakePeopleService:
+    """
+    People API giả lập (service object của googleapiclient) trong bộ nhớ
+
+    Hỗ trợ phân trang connections().list, syncToken (trả về person đã đổi/xóa kể từ
+    token) và lỗi 410 khi token hết hạn, contactGroups list/get/batchGet; mỗi
+    round-trip có thể chịu độ trễ latency và được đếm để kiểm tra.
+    """
+
+    def __init__(self, people=(), groups=(), latency=0.0, supports_batch=True):
+        self.latency = latency
+        self.supports_batch = supports_batch
+        self.round_trips = 0
+        self._version = 0
+        self._people = {}
+        self._tombstones = {}
+        self._expired_before = 0
+        self._groups = {group['resourceName']: dict(group) for group in groups}
+        self.list_calls = 0
+        self.group_calls = 0
+        for person in people:
+            self._put(person)
+
+    @classmethod
+    def generate(cls, count, group_count=5, **kwargs):
+        """Danh bạ tổng hợp gồm count liên hệ phân bổ vào group_count nhóm tùy chỉnh"""
+        groups = [
+            {'resourceName': f"contactGroups/group{i}", 'name': f"Nhóm {i}", 'formattedName': f"Nhóm {i}"}
+            for i in range(group_count)
+        ]
+        people = [
+            {
+                'resourceName': f"people/c{i:06d}",
+                'names': [{'displayName': f"Liên hệ {i}"}],
+                'emailAddresses': [{'value': f"contact{i}@example.com"}],
+                'organizations': [{'title': f"Chức danh {i % 20}", 'name': f"Công ty {i % 50}"}],
+                'memberships': [
+                    {'contactGroupMembership': {'contactGroupResourceName': 'contactGroups/myContacts'}},
+                    {'contactGroupMembership': {'contactGroupResourceName': groups[i % group_count]['resourceName']}},
+                ] if group_count else [],
+            }
+            for i in range(count)
+        ]
+        return cls(people, groups, **kwargs)
+
+    def people(self):
+        return self
+
+    def connections(self):
+        return self
+
+    def contactGroups(self):
+        return _FakeContactGroups(self)
+
+    def list(self, **params):
+        return _FakeRequest(self, self._list_connections, **params)
+
+    def update_person(self, index, name):
+        person = dict(self._people[f"people/c{index:06d}"][1])
+        person['names'] = [{'displayName': name}]
+        self._put(person)
+
+    def delete_person(self, index):
+        resource_name = f"people/c{index:06d}"
+        self._people.pop(resource_name)
+        self._version += 1
+        self._tombstones[resource_name] = self._version
+
+    def expire_sync_tokens(self):
+        self._expired_before = self._version + 1
+
+    def _put(self, person):
+        self._version += 1
+        self._people[person['resourceName']] = (self._version, person)
+        self._tombstones.pop(person['resourceName'], None)
+
+    def _list_connections(self, resourceName, pageSize=100, personFields='', pageToken=None,
+                          syncToken=None, requestSyncToken=False, **kwargs):
+        self.list_calls += 1
+        if syncToken is not None:
+            since = int(syncToken.lstrip('v'))
+            if since < self._expired_before:
+                raise FakeHttpError(410, "EXPIRED_SYNC_TOKEN")
+            items = [person for version, person in self._people.values() if version > since]
+            items += [
+                {'resourceName': name, 'metadata': {'deleted': True}}
+                for name, version in self._tombstones.items() if version > since
+            ]
+        else:
+            items = [person for _, person in self._people.values()]
+        items.sort(key=lambda person: person['resourceName'])
+
+        offset = int(pageToken or 0)
+        size = min(pageSize, 1000)
+        response = {'connections': items[offset:offset + size], 'totalItems': len(items)}
+        if offset + size < len(items):
+            response['nextPageToken'] = str(offset + size)
+        elif requestSyncToken:
+            response['nextSyncToken'] = f"v{self._version}"
+        return response
+
+    def _list_groups(self, pageSize=1000, pageToken=None, **params):
+        self.group_calls += 1
+        names = sorted(self._groups)
+        offset = int(pageToken or 0)
+        response = {
+            'contactGroups': [
+                {'resourceName': name, 'name': self._groups[name]['name']}
+                for name in names[offset:offset + min(pageSize, 1000)]
+            ]
+        }
+        if offset + pageSize < len(names):
+            response['nextPageToken'] = str(offset + pageSize)
+        return response
+
+    def _batch_get_groups(self, resourceNames):
+        self.group_calls += 1
+        if len(resourceNames) > 200:
+            raise FakeHttpError(400, "TOO_MANY_RESOURCE_NAMES")
+        return {
+            'responses': [
+                {'requestedResourceName': name, 'contactGroup': dict(self._groups[name])}
+                for name in resourceNames if name in self._groups
+            ]
+        }
+
+    def _get_group(self, resourceName):
+        self.group_calls += 1
+        if resourceName not in self._groups:
+            raise FakeHttpError(404, "NOT_FOUND")
+        return dict(self._groups[resourceName])
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('utf-8'))
+
+    def handle(self):
+        server = self.server.owner
+        server._count_connection()
+        sent = 0
+        recipients = []
+        self.reply("220 localhost ESMTP LocalSMTPServer")
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == 'AUTH':
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address.startswith('reject'):
+                    self.reply("550 5.1.1 User unknown")
+                elif address.startswith('flaky') and server._first_attempt(address):
+                    self.reply("451 4.3.0 Try again later")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b'\r\n') == b'.':
+                        break
+                    lines.append(data_line)
+                server._store(recipients, b"".join(lines))
+                sent += 1
+                self.reply("250 OK queued")
+                if server.drop_after and sent >= server.drop_after:
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer:
+    """
+    SMTP server cục bộ (không TLS) lưu thư trong bộ nhớ để kiểm tra việc gửi thư
+
+    Người nhận bắt đầu bằng "reject" bị từ chối (550), "flaky" bị từ chối tạm thời (451)
+    ở lần gửi đầu; drop_after đóng kết nối sau mỗi drop_after thư để kiểm tra việc kết nối lại.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, drop_after=None):
+        self.drop_after = drop_after
+        self.messages = []
+        self.connections = 0
+        self._attempted = set()
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def _first_attempt(self, address):
+        with self._lock:
+            first = address not in self._attempted
+            self._attempted.add(address)
+            return first
+
+    def _store(self, recipients, data):
+        with self._lock:
+            self.messages.append({'recipients': list(recipients), 'data': data})
@@ -0,0 +1,260 @@
+"""
+Giới hạn thời gian và hedging cho lời gọi provider: hết timeout thì bỏ lời gọi, chậm hơn
+p95 gần đây thì gửi thêm một bản sao và lấy kết quả về trước
+"""
+import collections
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from config import Config
+
+# Tên lớp lỗi tạm thời của litellm/openai/httpx (gửi lại có thể thành công)
+_TRANSIENT_ERRORS = (
+    'Timeout', 'APITimeoutError', 'APIConnectionError', 'ServiceUnavailableError',
+    'InternalServerError', 'ReadTimeout', 'ConnectTimeout',
+)
+
+
+class LLMTimeoutError(TimeoutError):
+    """Không có phản hồi nào trong thời gian cho phép của một lần gọi"""
+
+
+def is_transient_error(error):
+    """Timeout, lỗi kết nối hoặc lỗi 5xx của provider (429 do limiter xử lý riêng)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _TRANSIENT_ERRORS:
+        return True
+    status = getattr(error, 'status_code', None)
+    return isinstance(status, int) and status >= 500
+
+
+def retry_delay(attempt):
+    """Thời gian chờ trước lần thử lại thứ attempt + 1: full jitter trên backoff lũy thừa"""
+    cap = min(Config.LLM_RETRY_MAX_BACKOFF_SECONDS, Config.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+class LatencyWindow:
+    """Độ trễ của các lời gọi gần đây (cửa sổ trượt) cho một model"""
+
+    def __init__(self, size=None):
+        self._samples = collections.deque(maxlen=size or Config.LLM_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct, min_samples=1):
+        """Phân vị pct (0-100), None nếu chưa đủ min_samples mẫu"""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered or len(ordered) < min_samples:
+            return None
+        return ordered[min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+
+def latency_window(model):
+    """LatencyWindow dùng chung trong process cho model"""
+    with _windows_lock:
+        if model not in _windows:
+            _windows[model] = LatencyWindow()
+        return _windows[model]
+
+
+def hedge_delay(model):
+    """
+    Chờ bao lâu trước khi gửi bản sao của lời gọi tới model
+
+    Returns:
+        float | None: p95 độ trễ gần đây (không nhỏ hơn LLM_HEDGE_MIN_DELAY_SECONDS),
+            None nếu tắt hedging hoặc chưa đủ mẫu
+    """
+    if not Config.LLM_HEDGE_ENABLED:
+        return None
+    delay = latency_window(model).percentile(Config.LLM_HEDGE_PERCENTILE, Config.LLM_HEDGE_MIN_SAMPLES)
+    return None if delay is None else max(delay, Config.LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+class _Race:
+    """Trạng thái chung của các bản gọi: đã chọn xong kết quả chưa, kết quả nào bị bỏ"""
+
+    def __init__(self, on_discard=None):
+        self.lock = threading.Lock()
+        self.decided = False
+        self.on_discard = on_discard
+        self.futures = []
+
+    def decide(self, winner=None):
+        """Chốt kết quả; các bản đã xong mà không được chọn được báo qua on_discard"""
+        with self.lock:
+            self.decided = True
+            discarded = [
+                future.result() for future in self.futures
+                if future is not winner and future.done() and future.exception() is None
+            ]
+        for result in discarded:
+            self.discard(result)
+
+    def discard(self, result):
+        if self.on_discard is not None:
+            self.on_discard(result)
+
+
+def _start(request, window, race):
+    """
+    Chạy request() trên daemon thread (giữ contextvars của thread gọi)
+
+    Lời gọi quá hạn hoặc thua hedge không hủy được giữa chừng: thread chạy nốt rồi bỏ
+    kết quả (báo qua on_discard vì provider vẫn tính quota), nhưng độ trễ vẫn được ghi
+    vào window để p95 không bị lệch về phía nhanh.
+    """
+    future = Future()
+    context = contextvars.copy_context()
+    race.futures.append(future)
+
+    def run():
+        started = time.perf_counter()
+        try:
+            result = context.run(request)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if window is not None:
+            window.add(time.perf_counter() - started)
+        with race.lock:
+            future.set_result(result)
+            discarded = race.decided
+        if discarded:
+            race.discard(result)
+
+    threading.Thread(target=run, name="llm-call", daemon=True).start()
+    return future
+
+
+def call_with_deadline(request, timeout=None, hedge_after=None, before_hedge=None, window=None,
+                       hedge_request=None, on_discard=None):
+    """
+    Gọi request() với thời hạn timeout, gửi thêm một bản sao nếu sau hedge_after giây chưa xong
+
+    Args:
+        request: Hàm thực hiện lời gọi (gọi được nhiều lần song song)
+        timeout: Thời hạn (giây) cho cả lời gọi gốc và bản sao; None = không giới hạn
+        hedge_after: Độ trễ trước khi gửi bản sao; None = không hedge
+        before_hedge: Gọi ngay trước khi gửi bản sao (ví dụ chờ lượt ở rate limiter)
+        window: LatencyWindow nhận độ trễ của từng request hoàn tất
+        hedge_request: Hàm dùng cho bản sao (mặc định request)
+        on_discard: Gọi với kết quả của từng bản hoàn tất nhưng bị bỏ (thua hedge hoặc
+            xong sau thời hạn), có thể sau khi hàm này đã trả về
+
+    Returns:
+        tuple: (kết quả, {'hedged': bool, 'hedge_won': bool})
+
+    Raises:
+        LLMTimeoutError: Hết thời hạn mà chưa có kết quả
+        Exception: Lỗi của request nếu mọi bản đều lỗi
+    """
+    started = time.monotonic()
+    deadline = started + timeout if timeout else None
+    race = _Race(on_discard)
+    primary = _start(request, window, race)
+    pending = {primary}
+    outcome = {'hedged': False, 'hedge_won': False}
+    error = None
+
+    while pending:
+        now = time.monotonic()
+        wait_for = None if deadline is None else max(deadline - now, 0.0)
+        can_hedge = hedge_after is not None and not outcome['hedged']
+        if can_hedge:
+            until_hedge = max(started + hedge_after - now, 0.0)
+            wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                outcome['hedge_won'] = future is not primary
+                race.decide(winner=future)
+                return future.result(), outcome
+            error = future.exception()
+        if done:
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        if can_hedge:
+            if before_hedge is not None:
+                before_hedge()
+            outcome['hedged'] = True
+            pending.add(_start(hedge_request or request, window, race))
+
+    race.decide()
+    if not pending:
+        raise error
+    raise LLMTimeoutError(f"Không có phản hồi sau {timeout:g}s")
+
+
+def test_hedging():
+    """Test function để kiểm tra timeout, hedging và thử lại có jitter (không gọi API)"""
+    print("🧪 Testing hedging...")
+    calls = []
+    lock = threading.Lock()
+
+    def tail_request():
+        # Lần gọi đầu rơi vào đuôi chậm, bản sao trả về nhanh
+        with lock:
+            calls.append(time.monotonic())
+            index = len(calls)
+        time.sleep(1.0 if index == 1 else 0.02)
+        return index
+
+    window = LatencyWindow(size=50)
+    discarded = []
+    loser_done = threading.Event()
+
+    def on_discard(result):
+        discarded.append(result)
+        loser_done.set()
+
+    started = time.monotonic()
+    result, outcome = call_with_deadline(tail_request, timeout=2.0, hedge_after=0.1, window=window,
+                                         on_discard=on_discard)
+    hedged_in = time.monotonic() - started
+    # Bản gốc (thua) chạy nốt trên thread nền và chỉ được báo qua on_discard
+    loser_done.wait(timeout=2.0)
+
+    try:
+        call_with_deadline(lambda: time.sleep(1.0), timeout=0.1)
+        timed_out = False
+    except LLMTimeoutError as e:
+        timed_out = is_transient_error(e)
+
+    for seconds in range(1, 101):
+        window.add(seconds / 100)
+    delays = [retry_delay(attempt) for attempt in range(8) for _ in range(20)]
+    print(f"⏱️ Hedge: {hedged_in:.2f}s ({outcome}) · p95 cửa sổ: {window.percentile(95):.2f}s")
+    passed = (
+        result == 2 and outcome == {'hedged': True, 'hedge_won': True} and hedged_in < 0.5
+        and discarded == [1]
+        and timed_out
+        and 0.9 <= window.percentile(95) <= 1.0
+        and LatencyWindow().percentile(95, min_samples=5) is None
+        and all(0 <= delay <= Config.LLM_RETRY_MAX_BACKOFF_SECONDS for delay in delays)
+        and len({round(delay, 6) for delay in delays}) > len(delays) // 2
+    )
+    print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_hedging()
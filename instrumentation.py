@@ -0,0 +1,310 @@
+"""
+Đo thời gian, số lần gọi LLM/tool, token và chi phí ước tính cho từng agent
+"""
+import contextlib
+import contextvars
+import json
+import threading
+import time
+
+from config import Config
+
+# Task tương ứng với từng agent trong create_agents/create_tasks
+AGENT_TASKS = {
+    'context_analyzer': 'context_analysis_task',
+    'industry_insights_generator': 'industry_analysis_task',
+    'strategy_formulator': 'strategy_development_task',
+    'executive_briefing_creator': 'executive_brief_task',
+}
+
+_current_metrics = contextvars.ContextVar('run_metrics', default=None)
+
+
+def estimate_tokens(model, messages=None, text=None):
+    """Đếm token bằng litellm nếu có, nếu không ước tính ~4 ký tự/token"""
+    try:
+        import litellm
+        if messages is not None:
+            return litellm.token_counter(model=model, messages=messages)
+        return litellm.token_counter(model=model, text=text or '')
+    except Exception:
+        if messages is not None:
+            text = " ".join(str(m.get('content', '')) for m in messages) if not isinstance(messages, str) else messages
+        return max(len(text or '') // 4, 0)
+
+
+def latency_bucket_labels(buckets=None):
+    """Nhãn các cột của histogram độ trễ theo Config.LLM_LATENCY_BUCKETS ("≤1s", ..., ">120s")"""
+    buckets = buckets or Config.LLM_LATENCY_BUCKETS
+    return [f"≤{bound:g}s" for bound in buckets] + [f">{buckets[-1]:g}s"]
+
+
+def latency_bucket(seconds, buckets=None):
+    """Nhãn cột histogram chứa độ trễ seconds"""
+    buckets = buckets or Config.LLM_LATENCY_BUCKETS
+    labels = latency_bucket_labels(buckets)
+    for bound, label in zip(buckets, labels):
+        if seconds <= bound:
+            return label
+    return labels[-1]
+
+
+def latency_histograms(records):
+    """
+    Histogram độ trễ lời gọi LLM theo task, cộng dồn từ nhiều record (một hoặc nhiều lần chạy)
+
+    Returns:
+        dict: task -> {nhãn cột: số lời gọi}, các cột theo thứ tự tăng dần
+    """
+    histograms = {}
+    for record in records:
+        histogram = record.get('llm_latency_hist')
+        if not histogram:
+            continue
+        merged = histograms.setdefault(record.get('task') or record.get('agent'), {})
+        for label, count in histogram.items():
+            merged[label] = merged.get(label, 0) + count
+    return histograms
+
+
+def histogram_percentile(histogram, pct):
+    """Nhãn cột chứa phân vị pct (0-100) của histogram, None nếu histogram rỗng"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = pct / 100 * total
+    seen = 0
+    for label, count in histogram.items():
+        seen += count
+        if count and seen >= rank:
+            return label
+    return None
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Chi phí ước tính (USD) theo bảng giá Config.MODEL_PRICING"""
+    pricing = Config.MODEL_PRICING.get(str(model or '').split('/')[-1])
+    if not pricing:
+        return 0.0
+    input_price, output_price = pricing
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class RunMetrics:
+    """Số liệu của một lần chạy crew, gom theo agent"""
+
+    def __init__(self, model=None, company_name=None):
+        self.model = model or Config.MODEL_NAME
+        self.company_name = company_name
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+        self.agents = {}
+        self._stream_listeners = []
+
+    def record_llm_call(self, agent_key, model, prompt_tokens, completion_tokens, started_at, finished_at,
+                        rate_limit_wait=0.0, hedged=False, hedge_won=False, retries=0, timeouts=0):
+        latency = finished_at - started_at
+        with self._lock:
+            stats = self._agent(agent_key, started_at)
+            stats['llm_calls'] += 1
+            stats['llm_time_s'] += latency
+            stats['llm_latency_max_s'] = max(stats['llm_latency_max_s'], latency)
+            bucket = latency_bucket(latency)
+            stats['llm_latency_hist'][bucket] = stats['llm_latency_hist'].get(bucket, 0) + 1
+            stats['llm_hedged'] += int(bool(hedged))
+            stats['llm_hedge_wins'] += int(bool(hedge_won))
+            stats['llm_retries'] += retries
+            stats['llm_timeouts'] += timeouts
+            stats['rate_limit_wait_s'] += rate_limit_wait
+            stats['prompt_tokens'] += prompt_tokens
+            stats['completion_tokens'] += completion_tokens
+            stats['cost_usd'] += estimate_cost(model or self.model, prompt_tokens, completion_tokens)
+            stats['model'] = model or stats['model']
+            stats['last_finished_at'] = max(stats['last_finished_at'], finished_at)
+
+    def record_discarded_llm_call(self, agent_key, prompt_tokens, completion_tokens):
+        """
+        Lời gọi LLM hoàn tất nhưng bị bỏ (thua hedge, xong sau thời hạn): không tính vào
+        token/chi phí của câu trả lời, nhưng vẫn dùng quota của provider
+        """
+        with self._lock:
+            stats = self._agent(agent_key, time.perf_counter())
+            stats['llm_discarded_calls'] += 1
+            stats['llm_discarded_tokens'] += prompt_tokens + completion_tokens
+
+    def record_tool_call(self, agent_key, tool_name, started_at, finished_at, cached=False):
+        with self._lock:
+            stats = self._agent(agent_key, started_at)
+            stats['tool_calls'] += 1
+            stats['tool_time_s'] += finished_at - started_at
+            stats['tool_cache_hits'] += int(bool(cached))
+            stats['tools'][tool_name] = stats['tools'].get(tool_name, 0) + 1
+            stats['last_finished_at'] = max(stats['last_finished_at'], finished_at)
+
+    def record_rate_limit_wait(self, agent_key, waited):
+        """Thời gian chờ limiter của lời gọi tool (lời gọi LLM ghi qua record_llm_call)"""
+        with self._lock:
+            stats = self._agent(agent_key, time.perf_counter())
+            stats['rate_limit_wait_s'] += waited
+
+    def record_search_compaction(self, agent_key, raw_tokens, sent_tokens):
+        """Token của kết quả tìm kiếm trước và sau khi thu gọn (search_compaction)"""
+        with self._lock:
+            stats = self._agent(agent_key, time.perf_counter())
+            stats['search_tokens_raw'] += raw_tokens
+            stats['search_tokens_sent'] += sent_tokens
+            stats['search_tokens_saved'] += max(raw_tokens - sent_tokens, 0)
+
+    def add_stream_listener(self, listener):
+        """
+        Đăng ký callback listener(agent_key, chunk) nhận từng đoạn text được stream
+
+        chunk là None khi lời gọi stream được gửi lại (429, timeout): listener bỏ phần
+        text đã nhận của agent vì câu trả lời sẽ được stream lại từ đầu.
+        """
+        with self._lock:
+            self._stream_listeners.append(listener)
+
+    def has_stream_listeners(self):
+        with self._lock:
+            return bool(self._stream_listeners)
+
+    def record_stream_chunk(self, agent_key, chunk, started_at, received_at):
+        """Ghi nhận một đoạn text stream (đo time-to-first-token) và chuyển cho listeners"""
+        with self._lock:
+            stats = self._agent(agent_key, started_at)
+            if stats['time_to_first_token_s'] is None:
+                stats['time_to_first_token_s'] = received_at - started_at
+            listeners = list(self._stream_listeners)
+        for listener in listeners:
+            listener(agent_key, chunk)
+
+    def reset_stream(self, agent_key):
+        """Lời gọi stream của agent được gửi lại: báo listeners bỏ text đã stream"""
+        with self._lock:
+            listeners = list(self._stream_listeners)
+        for listener in listeners:
+            listener(agent_key, None)
+
+    def to_records(self):
+        """Danh sách record (mỗi agent một dòng) để lưu/xuất JSON lines"""
+        with self._lock:
+            records = []
+            for agent_key, stats in self.agents.items():
+                record = {
+                    'agent': agent_key,
+                    'task': AGENT_TASKS.get(agent_key),
+                    'company_name': self.company_name,
+                    'created_at': self.created_at,
+                    'wall_time_s': round(stats['last_finished_at'] - stats['first_started_at'], 3),
+                }
+                record.update({
+                    key: round(value, 6) if isinstance(value, float) else value
+                    for key, value in stats.items()
+                    if key not in ('first_started_at', 'last_finished_at')
+                })
+                records.append(record)
+        return records
+
+    def totals(self):
+        """Tổng hợp toàn bộ lần chạy"""
+        records = self.to_records()
+        return {
+            key: round(sum(record[key] for record in records), 6)
+            for key in ('llm_calls', 'prompt_tokens', 'completion_tokens', 'tool_calls', 'cost_usd',
+                        'search_tokens_saved', 'llm_hedged', 'llm_hedge_wins', 'llm_retries', 'llm_timeouts',
+                        'llm_discarded_tokens')
+        }
+
+    def _agent(self, agent_key, started_at):
+        key = agent_key or 'unknown'
+        if key not in self.agents:
+            self.agents[key] = {
+                'model': None,
+                'llm_calls': 0,
+                'llm_time_s': 0.0,
+                'llm_latency_max_s': 0.0,
+                'llm_latency_hist': dict.fromkeys(latency_bucket_labels(), 0),
+                'llm_hedged': 0,
+                'llm_hedge_wins': 0,
+                'llm_retries': 0,
+                'llm_timeouts': 0,
+                'llm_discarded_calls': 0,
+                'llm_discarded_tokens': 0,
+                'prompt_tokens': 0,
+                'completion_tokens': 0,
+                'cost_usd': 0.0,
+                'tool_calls': 0,
+                'tool_time_s': 0.0,
+                'tool_cache_hits': 0,
+                'rate_limit_wait_s': 0.0,
+                'search_tokens_raw': 0,
+                'search_tokens_sent': 0,
+                'search_tokens_saved': 0,
+                'tools': {},
+                'time_to_first_token_s': None,
+                'first_started_at': started_at,
+                'last_finished_at': started_at,
+            }
+        stats = self.agents[key]
+        stats['first_started_at'] = min(stats['first_started_at'], started_at)
+        return stats
+
+
+@contextlib.contextmanager
+def activate(metrics, agents=None):
+    """
+    Ghi số liệu của mọi lời gọi LLM/tool trong khối lệnh vào metrics
+
+    Thread do CrewAI tạo cho task async không kế thừa contextvars, nên metrics còn được
+    gắn thẳng vào LLM/tool của agents (bản sao riêng của lần chạy, xem bind_llm/bind_tool)
+    để số liệu không bị mất khi nhiều lần chạy diễn ra đồng thời.
+    """
+    token = _current_metrics.set(metrics)
+    bind_metrics(agents, metrics)
+    try:
+        yield metrics
+    finally:
+        bind_metrics(agents, None)
+        _current_metrics.reset(token)
+
+
+def bind_metrics(agents, metrics):
+    """Gắn metrics (hoặc gỡ khi metrics là None) vào LLM và tools của từng agent"""
+    for agent in (agents or {}).values():
+        for component in [getattr(agent, 'llm', None), *(getattr(agent, 'tools', None) or [])]:
+            if hasattr(component, 'bind_metrics'):
+                component.bind_metrics(metrics)
+
+
+def current_metrics(component=None):
+    """
+    RunMetrics cho lời gọi hiện tại: metrics gắn với component (LLM/tool của lần chạy)
+    nếu có, ngược lại metrics của context hiện tại (activate)
+    """
+    metrics = getattr(component, 'metrics', None)
+    return metrics if metrics is not None else _current_metrics.get()
+
+
+def percentile(values, pct):
+    """Giá trị phân vị pct (0-100) của danh sách số"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    """Tóm tắt p50/p95/max (ms) của một tập mẫu"""
+    return {
+        'count': len(samples_ms),
+        'p50_ms': percentile(samples_ms, 50),
+        'p95_ms': percentile(samples_ms, 95),
+        'max_ms': max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def records_to_jsonl(records):
+    """Chuyển danh sách record thành chuỗi JSON lines"""
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
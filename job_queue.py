@@ -0,0 +1,341 @@
+"""
+Hàng đợi job chuẩn bị cuộc họp chạy nền (bảng job SQLite + worker pool trong process)
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from config import Config
+from storage import connect_sqlite
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# Cách một yêu cầu được gộp với job sẵn có (single-flight)
+COALESCE_JOINED = 'joined'
+COALESCE_REUSED = 'reused'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    meeting_key TEXT NOT NULL,
+    meeting_data TEXT NOT NULL,
+    fresh_search INTEGER NOT NULL DEFAULT 0,
+    verbose INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    report_filename TEXT,
+    reused_stages TEXT,
+    error TEXT,
+    owner TEXT,
+    subscribers INTEGER NOT NULL DEFAULT 1,
+    resumes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created_at ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_meeting_key ON jobs(meeting_key, status);
+"""
+
+# Cột thêm sau khi bảng jobs đã được tạo ở phiên bản trước
+_ADDED_COLUMNS = {
+    'subscribers': "INTEGER NOT NULL DEFAULT 1",
+    'resumes': "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _default_agents_factory(fresh_search):
+    from agents import create_agents
+    from pipeline import create_llms
+
+    return create_agents(create_llms(), fresh_search=fresh_search)
+
+
+class JobQueue:
+    """
+    Job lưu trong SQLite, được các worker thread của process nhận và chạy
+
+    Mỗi worker giữ bộ agents riêng (agent CrewAI có trạng thái nên không dùng chung
+    giữa các crew chạy song song), tạo một lần và dùng lại cho các job sau.
+    """
+
+    def __init__(self, path, workers, agents_factory=None):
+        self.path = path
+        self.workers = workers
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._agents_factory = agents_factory or _default_agents_factory
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+        self._add_missing_columns()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._trackers = {}
+        self._threads = []
+        self._recover_orphans()
+
+    def start(self):
+        """Khởi động worker threads (chạy cả các job còn trong hàng đợi từ lần trước)"""
+        if self._threads:
+            return self
+        for index in range(max(1, self.workers)):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def enqueue(self, meeting_data, fresh_search=False, verbose=False):
+        """
+        Thêm job chuẩn bị cuộc họp vào hàng đợi (single-flight theo meeting_data)
+
+        Yêu cầu giống hệt một job đang chờ/chạy sẽ gắn vào job đó; nếu một job giống hệt
+        vừa hoàn tất trong Config.SINGLE_FLIGHT_REUSE_SECONDS thì dùng lại kết quả.
+        fresh_search không dùng lại kết quả cũ và chỉ gắn vào job cũng bỏ qua cache.
+
+        Returns:
+            tuple: (ID của job, None | COALESCE_JOINED | COALESCE_REUSED)
+        """
+        from pipeline import meeting_data_key
+
+        meeting_key = meeting_data_key(meeting_data)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                job_id, coalesced = self._find_coalescable(meeting_key, fresh_search, now)
+                if job_id:
+                    self._conn.execute(
+                        "UPDATE jobs SET subscribers = subscribers + 1 WHERE id = ?", (job_id,)
+                    )
+                else:
+                    job_id = uuid.uuid4().hex
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, meeting_key, meeting_data, fresh_search, verbose, status, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (job_id, meeting_key, json.dumps(meeting_data, ensure_ascii=False),
+                         int(bool(fresh_search)), int(bool(verbose)), JOB_QUEUED, now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if coalesced is None:
+            self._wakeup.set()
+        return job_id, coalesced
+
+    def resume(self, job_id):
+        """
+        Đưa job lỗi trở lại hàng đợi; khi chạy, các task đã có checkpoint được dùng lại
+        và crew tiếp tục từ task đầu tiên chưa hoàn thành
+
+        Returns:
+            bool: True nếu job được đưa lại hàng đợi (False nếu job không ở trạng thái lỗi)
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, owner = NULL, started_at = NULL, finished_at = NULL, "
+                "resumes = resumes + 1 WHERE id = ? AND status = ?",
+                (JOB_QUEUED, job_id, JOB_FAILED)
+            )
+        if cursor.rowcount:
+            self._wakeup.set()
+        return bool(cursor.rowcount)
+
+    def checkpointed_stages(self, job_id):
+        """Các giai đoạn của job đã có checkpoint (sẽ không chạy lại khi resume)"""
+        from checkpoints import get_checkpoint_store
+        from progress import STAGE_KEYS
+
+        if not Config.CHECKPOINT_ENABLED:
+            return []
+        return get_checkpoint_store().completed(job_id, STAGE_KEYS)
+
+    def _find_coalescable(self, meeting_key, fresh_search, now):
+        row = self._conn.execute(
+            "SELECT id FROM jobs WHERE meeting_key = ? AND status IN (?, ?) AND fresh_search >= ? "
+            "ORDER BY created_at LIMIT 1",
+            (meeting_key, JOB_QUEUED, JOB_RUNNING, int(bool(fresh_search)))
+        ).fetchone()
+        if row:
+            return row['id'], COALESCE_JOINED
+        if fresh_search or Config.SINGLE_FLIGHT_REUSE_SECONDS <= 0:
+            return None, None
+        
+        row = self._conn.execute(
+            "SELECT id FROM jobs WHERE meeting_key = ? AND status = ? AND finished_at >= ? "
+            "ORDER BY finished_at DESC LIMIT 1",
+            (meeting_key, JOB_DONE, now - Config.SINGLE_FLIGHT_REUSE_SECONDS)
+        ).fetchone()
+        if row:
+            return row['id'], COALESCE_REUSED
+        return None, None
+
+    def get(self, job_id):
+        """Thông tin job (dict) hoặc None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_recent(self, limit):
+        """Các job mới nhất"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def position(self, job_id):
+        """Số job đang xếp hàng phía trước job này (0 nếu đã được nhận)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < "
+                "(SELECT created_at FROM jobs WHERE id = ? AND status = ?)",
+                (JOB_QUEUED, job_id, JOB_QUEUED)
+            ).fetchone()[0]
+
+    def get_progress(self, job_id):
+        """Snapshot tiến trình của job đang chạy trong process này (None nếu không có)"""
+        tracker = self._trackers.get(job_id)
+        return tracker.snapshot() if tracker else None
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job = self._claim_next()
+            if job is None:
+                self._wakeup.wait(timeout=Config.JOB_IDLE_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._execute(job)
+
+    def _claim_next(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, started_at = ? WHERE id = ?",
+                        (JOB_RUNNING, self.owner, time.time(), row['id'])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._row_to_job(row) if row else None
+
+    def _execute(self, job):
+        from checkpoints import get_checkpoint_store
+        from instrumentation import RunMetrics, activate
+        from pipeline import create_crew
+        from progress import CrewProgressTracker
+        from report_store import get_report_store
+
+        meeting_data = job['meeting_data']
+        try:
+            agents = self._agents(job['fresh_search'])
+            # Checkpoint theo job ID (duy nhất): chỉ có khi chính job này đã chạy dở, nên job lỗi
+            # được resume hoặc job mồ côi được nhận lại luôn chạy tiếp từ task chưa xong
+            crew = create_crew(agents, meeting_data, verbose=job['verbose'], reuse=not job['fresh_search'],
+                               run_id=job['id'], resume=True)
+            tracker = CrewProgressTracker()
+            self._trackers[job['id']] = tracker.attach(crew, resumed=crew.resumed)
+
+            metrics = RunMetrics(model=Config.MODEL_NAME, company_name=meeting_data['company_name'])
+            metrics.add_stream_listener(tracker.on_stream_chunk)
+            with activate(metrics, agents=agents):
+                tracker.start(crew).join()
+            if tracker.error:
+                raise tracker.error
+
+            filename = get_report_store().save(tracker.result, meeting_data['company_name'], metrics=metrics.to_records())
+            reused = [key for key, stage in tracker.snapshot()['stages'].items() if stage['reused']]
+            self._finish(job['id'], JOB_DONE, report_filename=filename, reused_stages=reused)
+            if Config.CHECKPOINT_ENABLED:
+                get_checkpoint_store().delete(job['id'])
+        except Exception as e:
+            self._finish(job['id'], JOB_FAILED, error=str(e))
+        finally:
+            tracker = self._trackers.pop(job['id'], None)
+            if tracker is not None:
+                tracker.detach()
+
+    def _agents(self, fresh_search):
+        cache = getattr(self._local, 'agents', None)
+        if cache is None:
+            cache = self._local.agents = {}
+        if fresh_search not in cache:
+            cache[fresh_search] = self._agents_factory(fresh_search)
+        return cache[fresh_search]
+
+    def _finish(self, job_id, status, report_filename=None, reused_stages=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, report_filename = ?, reused_stages = ?, error = ?, finished_at = ? "
+                "WHERE id = ?",
+                (status, report_filename, json.dumps(reused_stages or []), error, time.time(), job_id)
+            )
+
+    def _recover_orphans(self):
+        """Đưa lại vào hàng đợi các job 'running' của process đã chết trên máy này"""
+        host = socket.gethostname()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE status = ?", (JOB_RUNNING,)
+            ).fetchall()
+            for row in rows:
+                owner_host, _, owner_pid = (row['owner'] or '').rpartition(':')
+                if owner_host == host and not _pid_alive(owner_pid):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL WHERE id = ?",
+                        (JOB_QUEUED, row['id'])
+                    )
+
+    def _add_missing_columns(self):
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job['meeting_data'] = json.loads(job['meeting_data'])
+        job['fresh_search'] = bool(job['fresh_search'])
+        job['verbose'] = bool(job['verbose'])
+        job['reused_stages'] = json.loads(job['reused_stages'] or '[]')
+        return job
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+
+
+_shared_queue = None
+_shared_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Hàng đợi job dùng chung cho mọi session trong process, worker đã được khởi động"""
+    global _shared_queue
+    with _shared_queue_lock:
+        if _shared_queue is None:
+            _shared_queue = JobQueue(Config.JOB_QUEUE_PATH, workers=Config.JOB_WORKERS).start()
+        return _shared_queue
@@ -0,0 +1,200 @@
+"""
+LLM client có đo lường, mỗi agent dùng một bản sao gắn với key của agent đó
+"""
+import copy
+import time
+
+from crewai import LLM
+
+from config import Config
+from hedging import LLMTimeoutError, call_with_deadline, hedge_delay, is_transient_error, latency_window, retry_delay
+from instrumentation import current_metrics, estimate_tokens
+from rate_limit import get_rate_limiter, provider_for_model
+
+
+class MeteredLLM(LLM):
+    """
+    LLM của CrewAI ghi lại thời gian, token và chi phí của từng lời gọi
+
+    Mỗi lời gọi (kể cả stream) bị giới hạn bởi LLM_CALL_TIMEOUT_SECONDS và được thử lại
+    (có jitter) khi timeout; khi bật LLM_HEDGE_ENABLED, lời gọi chậm hơn p95 gần đây của model được gửi
+    thêm một bản sao và lấy kết quả về trước.
+    """
+
+    agent_key = None
+    metrics = None
+
+    def for_agent(self, agent_key):
+        """Bản sao của LLM gắn với một agent (để gom số liệu theo agent)"""
+        clone = copy.copy(self)
+        clone.agent_key = agent_key
+        return clone
+
+    def bind_metrics(self, metrics):
+        """Gắn RunMetrics của lần chạy (xem instrumentation.activate)"""
+        self.metrics = metrics
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        metrics = current_metrics(self)
+        limiter = get_rate_limiter(provider_for_model(self.model), self.model)
+        prompt_tokens = estimate_tokens(self.model, messages=messages)
+        started_at = time.perf_counter()
+        outcome = {'hedged': False, 'hedge_won': False, 'retries': 0, 'timeouts': 0}
+        if self._should_stream(metrics, tools):
+            # Bản sao sẽ stream trùng text lên UI: không hedge, thời hạn kiểm tra theo từng đoạn
+            stream_state = {'emitted': False}
+            request = lambda: self._stream(messages, metrics, started_at, stream_state)
+        else:
+            request = lambda: self._call_bounded(
+                lambda: self._call_provider(
+                    messages, tools=tools, callbacks=callbacks, available_functions=available_functions, **kwargs
+                ),
+                limiter, prompt_tokens, outcome, metrics,
+                # Callbacks của CrewAI (đếm token của agent) chỉ gắn với lời gọi gốc, không với bản sao
+                hedge_request=lambda: self._call_provider(
+                    messages, tools=tools, available_functions=available_functions, **kwargs
+                )
+            )
+        response, waited = self._call_with_retries(request, limiter, prompt_tokens, outcome)
+        finished_at = time.perf_counter()
+        completion_tokens = estimate_tokens(self.model, text=str(response or ''))
+        limiter.consume_tokens(completion_tokens)
+        
+        if metrics is not None:
+            metrics.record_llm_call(
+                self.agent_key,
+                self.model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                started_at=started_at,
+                finished_at=finished_at,
+                rate_limit_wait=waited,
+                hedged=outcome['hedged'],
+                hedge_won=outcome['hedge_won'],
+                retries=outcome['retries'],
+                timeouts=outcome['timeouts']
+            )
+        return response
+
+    def _call_with_retries(self, request, limiter, prompt_tokens, outcome):
+        """
+        Gọi qua limiter dùng chung (chờ lượt theo RPM/TPM, tự backoff khi bị 429);
+        timeout và lỗi tạm thời được thử lại tối đa LLM_MAX_RETRIES lần, chờ có jitter
+        """
+        waited = 0.0
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            try:
+                response, attempt_waited = limiter.call(request, tokens=prompt_tokens)
+                return response, waited + attempt_waited
+            except Exception as e:
+                if isinstance(e, LLMTimeoutError):
+                    outcome['timeouts'] += 1
+                if attempt == Config.LLM_MAX_RETRIES or not is_transient_error(e):
+                    raise
+                outcome['retries'] += 1
+                time.sleep(retry_delay(attempt))
+
+    def _call_bounded(self, request, limiter, prompt_tokens, outcome, metrics=None, hedge_request=None):
+        """
+        Một lần gọi giới hạn bởi LLM_CALL_TIMEOUT_SECONDS, có hedge nếu đang bật
+
+        Chỉ kết quả được chọn được tính vào token/chi phí của lần chạy (call ghi sau khi
+        trả về); bản thua hedge hoặc xong sau thời hạn vẫn dùng quota của provider nên
+        được trừ vào limiter và ghi riêng (record_discarded_llm_call).
+        """
+        def on_discard(response):
+            completion_tokens = estimate_tokens(self.model, text=str(response or ''))
+            limiter.consume_tokens(completion_tokens)
+            if metrics is not None:
+                metrics.record_discarded_llm_call(self.agent_key, prompt_tokens, completion_tokens)
+
+        response, hedge = call_with_deadline(
+            request,
+            timeout=Config.LLM_CALL_TIMEOUT_SECONDS or None,
+            hedge_after=hedge_delay(self.model),
+            # Bản sao cũng là một request với provider: chờ lượt ở limiter như lời gọi gốc
+            before_hedge=lambda: limiter.acquire(prompt_tokens),
+            window=latency_window(self.model),
+            hedge_request=hedge_request,
+            on_discard=on_discard
+        )
+        outcome['hedged'] = outcome['hedged'] or hedge['hedged']
+        outcome['hedge_won'] = hedge['hedge_won']
+        return response
+
+    def _call_provider(self, messages, **kwargs):
+        """Lời gọi thực tới provider (lớp con có thể thay thế, ví dụ LLM giả lập)"""
+        return super().call(messages, **kwargs)
+
+    def _should_stream(self, metrics, tools):
+        # Chỉ stream khi có người nghe (UI) và không dùng function calling
+        return (
+            metrics is not None
+            and not tools
+            and self.agent_key in Config.STREAM_AGENTS
+            and metrics.has_stream_listeners()
+        )
+
+    def _stream(self, messages, metrics, started_at, state=None):
+        """
+        Stream câu trả lời trong thời hạn LLM_CALL_TIMEOUT_SECONDS cho cả lời gọi
+
+        timeout của litellm chỉ giới hạn từng lần đọc (stream bị treo); stream vẫn nhả
+        từng đoạn nhưng quá chậm bị dừng khi vượt thời hạn tổng.
+        """
+        # Lần gửi lại (limiter khi 429, _call_with_retries khi timeout/lỗi tạm thời) stream
+        # lại từ đầu: bỏ phần text đã đẩy lên UI để không bị lặp
+        if state is not None:
+            if state['emitted']:
+                metrics.reset_stream(self.agent_key)
+            state['emitted'] = False
+        timeout = Config.LLM_CALL_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout if timeout else None
+        parts = []
+        chunks = self._stream_provider(messages)
+        try:
+            for chunk in chunks:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise LLMTimeoutError(f"Stream chưa hoàn tất sau {timeout:g}s")
+                if chunk:
+                    parts.append(chunk)
+                    if state is not None:
+                        state['emitted'] = True
+                    metrics.record_stream_chunk(self.agent_key, chunk, started_at, time.perf_counter())
+        finally:
+            chunks.close()
+        return "".join(parts)
+
+    def _stream_provider(self, messages):
+        """Stream text từ provider qua litellm, trả về từng đoạn"""
+        import litellm
+
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        params = {
+            'model': self.model,
+            'messages': messages,
+            'temperature': self.temperature,
+            'max_tokens': getattr(self, 'max_tokens', None),
+            'stop': getattr(self, 'stop', None) or None,
+            'api_key': getattr(self, 'api_key', None),
+            'base_url': getattr(self, 'base_url', None),
+            'timeout': getattr(self, 'timeout', None),
+            'stream': True,
+        }
+        for chunk in litellm.completion(**{key: value for key, value in params.items() if value is not None}):
+            choices = getattr(chunk, 'choices', None) or []
+            if choices:
+                yield getattr(choices[0].delta, 'content', None) or ''
+
+
+def bind_llm(llm, agent_key):
+    """
+    LLM riêng cho agent nếu client hỗ trợ, ngược lại dùng chung
+
+    llm có thể là một client dùng cho mọi agent, hoặc dict agent_key -> client
+    (model routing, xem pipeline.create_llms).
+    """
+    if isinstance(llm, dict):
+        llm = llm[agent_key]
+    return llm.for_agent(agent_key) if hasattr(llm, 'for_agent') else llm
@@ -0,0 +1,282 @@
+"""
+Hàng đợi email gửi đi lưu trong SQLite, worker nền gửi và thử lại với backoff
+"""
+import random
+import threading
+import time
+import uuid
+
+from config import Config
+from storage import connect_sqlite
+
+MAIL_PENDING = 'pending'
+MAIL_SENDING = 'sending'
+MAIL_SENT = 'sent'
+MAIL_DEAD = 'dead'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_batch ON outbox(batch_id);
+"""
+
+
+def retry_delay(attempts, base=None, maximum=None):
+    """Thời gian chờ trước lần thử thứ attempts + 1: base * 2^(attempts - 1), có jitter"""
+    base = Config.MAIL_RETRY_BASE_SECONDS if base is None else base
+    maximum = Config.MAIL_RETRY_MAX_SECONDS if maximum is None else maximum
+    return min(base * 2 ** max(attempts - 1, 0) * random.uniform(0.8, 1.2), maximum)
+
+
+class MailQueue:
+    """
+    Outbox SQLite với một worker thread gửi theo lô qua send_bulk
+
+    Thư đang gửi được "thuê" trong MAIL_LEASE_SECONDS: nếu process chết giữa chừng,
+    thư sẽ được worker khác (hoặc lần chạy sau) gửi lại khi hết hạn thuê.
+    """
+
+    def __init__(self, path, pool=None, sender=None):
+        self.path = path
+        self._pool = pool
+        self._sender = sender
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Khởi động worker gửi thư (gửi cả các thư còn lại từ lần trước)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker_loop, name="mail-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def enqueue(self, messages):
+        """
+        Thêm các thư (receiver_email, subject, body) vào outbox
+
+        Returns:
+            str: ID của lô thư (dùng với batch_status)
+        """
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO outbox (id, batch_id, recipient, subject, body, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (uuid.uuid4().hex, batch_id, recipient, subject, body, MAIL_PENDING, now, now)
+                    for recipient, subject, body in messages
+                ]
+            )
+        self._wakeup.set()
+        return batch_id
+
+    def get(self, message_id):
+        """Trạng thái một thư (dict, không gồm nội dung) hoặc None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, batch_id, recipient, subject, status, attempts, next_attempt_at, last_error, "
+                "created_at, sent_at FROM outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_batch(self, batch_id):
+        """Trạng thái từng thư trong lô"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, recipient, status, attempts, next_attempt_at, last_error, sent_at "
+                "FROM outbox WHERE batch_id = ? ORDER BY recipient", (batch_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def batch_status(self, batch_id):
+        """Số thư theo trạng thái trong lô, ví dụ {'sent': 3, 'pending': 1}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS count FROM outbox WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ).fetchall()
+        return {row['status']: row['count'] for row in rows}
+
+    def retry_dead(self, batch_id):
+        """Đưa các thư đã bị loại (dead) của lô trở lại hàng đợi"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ? WHERE batch_id = ? AND status = ?",
+                (MAIL_PENDING, time.time(), batch_id, MAIL_DEAD)
+            )
+        self._wakeup.set()
+
+    def process_due(self, limit=None):
+        """
+        Gửi một lô thư đến hạn (worker gọi liên tục; cũng dùng trực tiếp khi kiểm tra)
+
+        Returns:
+            int: Số thư đã xử lý
+        """
+        from meeting_scheduler import send_bulk
+
+        messages = self._claim_due(limit or Config.MAIL_BATCH_SIZE)
+        if not messages:
+            return 0
+
+        results = send_bulk(
+            [(message['recipient'], message['subject'], message['body']) for message in messages],
+            pool=self._pool,
+            sender=self._sender
+        )
+        for message, result in zip(messages, results):
+            if result['ok']:
+                self._mark_sent(message['id'])
+            else:
+                self._mark_failed(message, result['error'], permanent=result.get('permanent', False))
+        return len(messages)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.process_due()
+            except Exception as e:
+                print(f"❌ Lỗi worker gửi thư: {e}")
+                processed = 0
+            if not processed:
+                self._wakeup.wait(timeout=Config.MAIL_IDLE_POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def _claim_due(self, limit):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Thư 'sending' hết hạn thuê là của worker đã dừng giữa chừng
+                rows = self._conn.execute(
+                    "SELECT * FROM outbox WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (MAIL_PENDING, MAIL_SENDING, now, limit)
+                ).fetchall()
+                # Mỗi lần nhận thư tính là một lần thử, kể cả khi worker chết trước khi
+                # ghi kết quả: thư đã dùng hết lượt thử thì loại (dead) thay vì gửi lại mãi
+                claimed, exhausted = [], []
+                for row in rows:
+                    (exhausted if row['attempts'] >= Config.MAIL_MAX_ATTEMPTS else claimed).append(dict(row))
+                self._conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                    [(MAIL_SENDING, now + Config.MAIL_LEASE_SECONDS, message['id']) for message in claimed]
+                )
+                self._conn.executemany(
+                    "UPDATE outbox SET status = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    [(MAIL_DEAD, now, message['last_error'] or "Hết hạn thuê khi đang gửi", message['id'])
+                     for message in exhausted]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for message in claimed:
+            message['attempts'] += 1
+        return claimed
+
+    def _mark_sent(self, message_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, last_error = NULL, sent_at = ? WHERE id = ?",
+                (MAIL_SENT, time.time(), message_id)
+            )
+
+    def _mark_failed(self, message, error, permanent=False):
+        # attempts đã được tăng khi nhận thư (_claim_due)
+        attempts = message['attempts']
+        if permanent or attempts >= Config.MAIL_MAX_ATTEMPTS:
+            status, next_attempt_at = MAIL_DEAD, time.time()
+        else:
+            status, next_attempt_at = MAIL_PENDING, time.time() + retry_delay(attempts)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (status, attempts, next_attempt_at, error, message['id'])
+            )
+
+
+_shared_queue = None
+_shared_queue_lock = threading.Lock()
+
+
+def get_mail_queue():
+    """Hàng đợi email dùng chung trong process, worker đã được khởi động"""
+    global _shared_queue
+    with _shared_queue_lock:
+        if _shared_queue is None:
+            _shared_queue = MailQueue(Config.MAIL_QUEUE_PATH).start()
+        return _shared_queue
+
+
+def test_mail_queue():
+    """Test function để kiểm tra gửi nền, thử lại và dead-letter với SMTP server cục bộ"""
+    import os
+    import tempfile
+
+    from meeting_scheduler import SMTPConnectionPool
+    from fakes import LocalSMTPServer
+
+    print("🧪 Testing MailQueue...")
+    with tempfile.TemporaryDirectory() as tmp, LocalSMTPServer() as server:
+        pool = SMTPConnectionPool(server.host, server.port, use_ssl=False, max_connections=2)
+        queue = MailQueue(os.path.join(tmp, "outbox.sqlite3"), pool=pool, sender="brief@example.com")
+        recipients = ["a@example.com", "b@example.com", "flaky@example.com", "reject@example.com"]
+        started = time.monotonic()
+        batch_id = queue.enqueue([(email, "Brief cuộc họp", "<p>Nội dung</p>") for email in recipients])
+        enqueue_ms = (time.monotonic() - started) * 1000
+
+        queue.process_due()
+        first_pass = queue.batch_status(batch_id)
+        # Đưa thư đang chờ thử lại về "đến hạn" thay vì đợi backoff
+        with queue._lock:
+            queue._conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE status = ?", (MAIL_PENDING,))
+        queue.process_due()
+        final = {item['recipient']: item for item in queue.list_batch(batch_id)}
+
+        # Worker chết khi đang gửi ở lượt thử cuối: hết hạn thuê thì thư bị loại, không gửi lại
+        stuck_id = final["a@example.com"]['id']
+        with queue._lock:
+            queue._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = 0 WHERE id = ?",
+                (MAIL_SENDING, Config.MAIL_MAX_ATTEMPTS, stuck_id)
+            )
+        reclaimed = queue.process_due()
+        stuck = queue.get(stuck_id)
+        pool.close()
+
+        print(f"⏱️ enqueue: {enqueue_ms:.1f} ms · Lần 1: {first_pass} · Sau thử lại: {queue.batch_status(batch_id)}")
+        passed = (
+            first_pass == {MAIL_SENT: 2, MAIL_PENDING: 1, MAIL_DEAD: 1}
+            and final["flaky@example.com"]['status'] == MAIL_SENT
+            and final["flaky@example.com"]['attempts'] == 2
+            and final["reject@example.com"]['attempts'] == 1
+            and len(server.messages) == 3
+            and final["a@example.com"]['status'] == MAIL_SENT
+            and reclaimed == 0 and stuck['status'] == MAIL_DEAD
+        )
+        print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_mail_queue()
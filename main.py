@@ -1,38 +1,50 @@
+import time
+
+_rerun_started_at = time.perf_counter()
+
 import streamlit as st
-from crewai import Crew, LLM
-from crewai.process import Process
 
 # Import các modules tự tạo
 from config import Config
-from agents import create_agents
-from tasks import create_tasks
+from job_queue import get_job_queue, JOB_DONE
+from pipeline import validate_inputs
+from report_store import get_report_store
 from utils import (
-    save_meeting_result, 
+    display_attendee_picker,
     display_meeting_history, 
     display_metrics, 
-    validate_inputs,
     display_sidebar_instructions,
     create_download_button,
-    display_crew_progress,
+    display_job_progress,
+    display_recent_jobs,
     display_agent_details,
-    display_fun_facts
+    display_fun_facts,
+    display_report_search,
+    display_rerun_timing,
+    display_run_metrics,
+    display_send_brief
 )
+from warmup import start_warmup
+
 
 # Streamlit app setup
 st.set_page_config(page_title=Config.PAGE_TITLE, layout=Config.PAGE_LAYOUT)
 st.title(Config.PAGE_TITLE)
 
+# Job nền (hoặc thư brief) của session còn đang chờ/chạy thì trang tự poll lại
+job_pending = False
+mail_pending = False
+
 # Check if all API keys are set
 if Config.validate_api_keys():
     # Set API keys as environment variables
     Config.set_environment_variables()
 
-    chatgpt = LLM(model=Config.MODEL_NAME, temperature=Config.MODEL_TEMPERATURE, api_key=Config.OPENAI_API_KEY)
-
     # Input fields
     company_name = st.text_input("Nhập tên công ty:")
     meeting_objective = st.text_input("Mục đích cuộc họp:")
-    attendees = st.text_area("Nhập người tham gia và vai trò của họ (một người mỗi dòng):")
+    display_attendee_picker()
+    attendees = st.text_area("Nhập người tham gia và vai trò của họ (một người mỗi dòng):", key="attendees")
     meeting_duration = st.number_input(
         "Nhập thời gian (phút):", 
         min_value=Config.MIN_MEETING_DURATION, 
@@ -44,6 +56,7 @@ if Config.validate_api_keys():
     
     # Tùy chọn hiển thị log chi tiết
     show_verbose = st.checkbox("🔍 Hiển thị log chi tiết quá trình", value=False)
+    fresh_search = st.checkbox("🔄 Bỏ qua cache tìm kiếm (lấy dữ liệu mới nhất)", value=False)
     
     # Validation
     all_fields_filled = validate_inputs(company_name, meeting_objective, attendees, focus_areas)
@@ -53,53 +66,64 @@ if Config.validate_api_keys():
     else:
         st.success("✅ Thông tin đã đầy đủ, sẵn sàng chuẩn bị cuộc họp!")
 
-        # Tạo agents và tasks
-        agents = create_agents(chatgpt)
-        
-        meeting_data = {
-            'company_name': company_name,
-            'meeting_objective': meeting_objective,
-            'attendees': attendees,
-            'meeting_duration': meeting_duration,
-            'focus_areas': focus_areas
-        }
-        
-        tasks = create_tasks(agents, meeting_data)
-
-        # Tạo crew
-        meeting_prep_crew = Crew(
-            agents=list(agents.values()),
-            tasks=tasks,
-            verbose=show_verbose,
-            process=Process.sequential
-        )
-
-        # Chạy crew khi người dùng nhấp vào nút
+        # Đưa job vào hàng đợi nền khi người dùng nhấp vào nút
         if st.button("🚀 Chuẩn bị cuộc họp", disabled=not all_fields_filled, type="primary"):
             if show_verbose:
                 st.info("🔍 Chế độ verbose được bật - sẽ hiển thị log chi tiết")
             
-            # Hiển thị thông tin agents (có thể đóng/mở)
-            display_agent_details()
+            meeting_data = {
+                'company_name': company_name,
+                'meeting_objective': meeting_objective,
+                'attendees': attendees,
+                'meeting_duration': meeting_duration,
+                'focus_areas': focus_areas
+            }
             
-            # Hiển thị fun facts
-            display_fun_facts()
+            # Crew chạy trên worker nền dùng chung, không bị mất khi rerun hay đóng tab
+            # (task không đổi đầu vào sẽ dùng lại kết quả trước, trừ khi bỏ qua cache)
+            # Yêu cầu giống hệt đang chạy/vừa xong sẽ dùng chung một job (single-flight)
+            job_id, coalesced = get_job_queue().enqueue(
+                meeting_data, fresh_search=fresh_search, verbose=show_verbose
+            )
+            st.session_state['active_job_id'] = job_id
+            st.session_state['active_job_coalesced'] = coalesced
+    
+    # Theo dõi job đang chọn (trạng thái đọc lại từ hàng đợi mỗi lần rerun)
+    job_queue = get_job_queue()
+    active_job_id = st.session_state.get('active_job_id')
+    active_job = job_queue.get(active_job_id) if active_job_id else None
+    if active_job:
+        # Hiển thị thông tin agents (có thể đóng/mở)
+        display_agent_details()
+        
+        # Hiển thị fun facts
+        display_fun_facts(seed=active_job_id)
+        
+        st.markdown("### 🚀 Tiến trình chuẩn bị cuộc họp")
+        job_pending = display_job_progress(
+            active_job,
+            snapshot=job_queue.get_progress(active_job_id),
+            queue_position=job_queue.position(active_job_id),
+            coalesced=st.session_state.get('active_job_coalesced'),
+            job_queue=job_queue
+        )
+        
+        filename = active_job['report_filename']
+        if active_job['status'] == JOB_DONE and filename:
+            company = active_job['meeting_data']['company_name']
+            st.success("✅ Đã chuẩn bị xong cuộc họp!")
+            st.markdown("---")
+            st.markdown("### 📋 Kết quả chuẩn bị cuộc họp")
+            st.markdown(get_report_store().read(filename))
+            display_run_metrics(get_report_store().get_metrics(filename), key=active_job_id)
             
-            # Chạy crew với progress display
-            st.markdown("### 🚀 Tiến trình chuẩn bị cuộc họp")
-            result = display_crew_progress(meeting_prep_crew, meeting_data)
+            st.info(f"📁 Kết quả đã được lưu vào file: {filename}")
+            create_download_button(filename, company)
             
-            if result:
-                st.success("✅ Đã chuẩn bị xong cuộc họp!")
-                st.markdown("---")
-                st.markdown("### 📋 Kết quả chuẩn bị cuộc họp")
-                st.markdown(result)
-                
-                # Lưu kết quả và tạo download button
-                filename = save_meeting_result(result, company_name)
-                if filename:
-                    st.info(f"📁 Kết quả đã được lưu vào file: {filename}")
-                    create_download_button(filename, company_name)
+            # Thư được đưa vào outbox và gửi trên worker nền, trang không phải chờ SMTP
+            mail_pending = display_send_brief(
+                filename, company, active_job['meeting_data']['attendees'], key=active_job_id
+            )
 
     # Hiển thị metrics dashboard
     display_metrics(meeting_duration, attendees, company_name)
@@ -107,7 +131,19 @@ if Config.validate_api_keys():
 
     # Sidebar instructions and meeting history
     display_sidebar_instructions()
+    display_recent_jobs(job_queue)
     display_meeting_history()
+    display_report_search()
 
 else:
-    st.error("❌ Thiếu API keys!")
\ No newline at end of file
+    st.error("❌ Thiếu API keys!")
+
+display_rerun_timing(_rerun_started_at)
+
+# Trang đã hiển thị xong: nạp trước crewai/Google API trên thread nền cho job đầu tiên
+start_warmup()
+
+# Job/thư còn đang chờ: rerun sau một khoảng ngắn để cập nhật tiến trình
+if job_pending or mail_pending:
+    time.sleep(Config.JOB_POLL_INTERVAL)
+    st.rerun()
@@ -1,40 +1,230 @@
+"""
+Gửi email (brief cuộc họp) qua SMTP, dùng lại kết nối đã xác thực cho nhiều thư
+"""
+import contextlib
 import smtplib
-from email.mime.text import MIMEText
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-import os
+from email.mime.text import MIMEText
+
+from config import Config
+
+sender_email = Config.SMTP_USERNAME
+sender_password = Config.SMTP_PASSWORD
+
+if not sender_email or not sender_password:
+    print("Error loading environment variables: SMTP_USERNAME and SMTP_PASSWORD must be set in the environment variables.")
+
+# Lỗi cho thấy kết nối đã hỏng (server đóng, mạng rớt): kết nối lại rồi gửi lại
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+# Server trả lời từ chối (người nhận/người gửi/nội dung): kết nối vẫn dùng lại được
+_REJECTED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_permanent_error(error):
+    """Server trả mã 5xx cho thư này (gửi lại cũng bị từ chối); lỗi đăng nhập không tính"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return False
+
+
+def build_message(receiver_email, subject, body, sender=None):
+    """Email HTML gửi tới một người nhận"""
+    msg = MIMEMultipart()
+    msg['From'] = sender or sender_email
+    msg['To'] = receiver_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+
+class SMTPConnectionPool:
+    """
+    Tối đa max_connections kết nối SMTP đã EHLO/login, dùng lại cho nhiều thư
+
+    Kết nối bị server đóng khi đang rảnh sẽ được mở lại khi gửi (một lần cho mỗi thư).
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, max_connections=3, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.stats = {'connections': 0, 'reconnects': 0, 'sent': 0}
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        with self._lock:
+            self.stats['connections'] += 1
+        return server
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Mượn một kết nối (chờ nếu đã dùng hết max_connections)
+
+        Trả về danh sách một phần tử để người dùng có thể thay kết nối khi kết nối lại.
+        """
+        self._slots.acquire()
+        holder = None
+        try:
+            with self._lock:
+                server = self._idle.pop() if self._idle else None
+            holder = [server or self._connect()]
+            try:
+                yield holder
+            except _REJECTED_ERRORS:
+                # Server từ chối thư nhưng kết nối vẫn dùng được
+                holder[0].rset()
+                self._return(holder[0])
+                holder = None
+                raise
+            self._return(holder[0])
+            holder = None
+        finally:
+            if holder is not None:
+                _close_quietly(holder[0])
+            self._slots.release()
+
+    def _return(self, server):
+        with self._lock:
+            self._idle.append(server)
 
-load_dotenv()
+    def send(self, msg, from_addr=None, to_addrs=None):
+        """Gửi một thư, kết nối lại và gửi lại một lần nếu kết nối đã bị đóng"""
+        from_addr = from_addr or msg['From']
+        to_addrs = to_addrs or [msg['To']]
+        with self.connection() as holder:
+            try:
+                holder[0].sendmail(from_addr, to_addrs, msg.as_string())
+            except _CONNECTION_ERRORS:
+                _close_quietly(holder[0])
+                holder[0] = self._connect()
+                with self._lock:
+                    self.stats['reconnects'] += 1
+                holder[0].sendmail(from_addr, to_addrs, msg.as_string())
+        with self._lock:
+            self.stats['sent'] += 1
 
-try: 
-    sender_email = os.getenv("SMTP_USERNAME")  
-    sender_password = os.getenv("SMTP_PASSWORD")
-    
-    if not sender_email or not sender_password:
-        raise ValueError("SMTP_USERNAME and SMTP_PASSWORD must be set in the environment variables.")
-    
-except Exception as e:
-    print(f"Error loading environment variables: {e}")
+    def close(self):
+        """Đóng mọi kết nối đang rảnh"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server in idle:
+            _close_quietly(server)
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def send_bulk(messages, pool=None, sender=None):
+    """
+    Gửi nhiều thư song song qua pool kết nối
+
+    Args:
+        messages: Danh sách (receiver_email, subject, body)
+        pool: SMTPConnectionPool (mặc định: pool dùng chung theo Config)
+        sender: Địa chỉ người gửi (mặc định: SMTP_USERNAME)
+
+    Returns:
+        list: Kết quả theo từng người nhận {'recipient', 'ok', 'error', 'permanent'}, cùng thứ tự đầu vào
+    """
+    pool = pool or get_smtp_pool()
+    sender = sender or pool.username or sender_email
+
+    def send_one(item):
+        receiver_email, subject, body = item
+        try:
+            pool.send(build_message(receiver_email, subject, body, sender=sender))
+            return {'recipient': receiver_email, 'ok': True, 'error': None, 'permanent': False}
+        except Exception as e:
+            return {'recipient': receiver_email, 'ok': False, 'error': str(e), 'permanent': is_permanent_error(e)}
+
+    messages = list(messages)
+    if not messages:
+        return []
+    with ThreadPoolExecutor(max_workers=min(pool.max_connections, len(messages))) as executor:
+        return list(executor.map(send_one, messages))
 
 
 def send_mail(receiver_email, subject, body):
+    """Gửi một email HTML (dùng chung pool kết nối với send_bulk)"""
+    result = send_bulk([(receiver_email, subject, body)])[0]
+    if result['ok']:
+        print('Đã gửi thư thành công')
+    else:
+        print(f"Lỗi khi gửi email: {result['error']}")
+    return result['ok']
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """Pool kết nối SMTP dùng chung trong process"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = SMTPConnectionPool(
+                Config.SMTP_HOST,
+                Config.SMTP_PORT,
+                username=sender_email,
+                password=sender_password,
+                use_ssl=Config.SMTP_USE_SSL,
+                max_connections=Config.SMTP_MAX_CONNECTIONS,
+                timeout=Config.SMTP_TIMEOUT
+            )
+        return _shared_pool
+
+
+def test_bulk_send():
+    """Test function để kiểm tra gửi hàng loạt với SMTP server cục bộ (không gửi thư thật)"""
+    from fakes import LocalSMTPServer
+
+    print("🧪 Testing bulk SMTP...")
+    with LocalSMTPServer(drop_after=7) as server:
+        pool = SMTPConnectionPool(server.host, server.port, use_ssl=False, max_connections=3)
+        recipients = [f"attendee{i}@example.com" for i in range(40)] + ["reject@example.com"]
+        results = send_bulk([(email, "Brief cuộc họp", "<p>Nội dung</p>") for email in recipients],
+                             pool=pool, sender="brief@example.com")
+        pool.close()
+
+        failed = [result['recipient'] for result in results if not result['ok']]
+        print(f"📨 Đã gửi: {len(server.messages)} · Kết nối: {server.connections} · Lỗi: {failed}")
+        passed = (
+            len(server.messages) == 40
+            and failed == ["reject@example.com"]
+            and [result['recipient'] for result in results] == recipients
+            and server.connections < len(recipients) // 2
+            and pool.stats['reconnects'] > 0
+        )
+        print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
 
-  msg = MIMEMultipart()
-  msg['From'] = sender_email
-  msg['To'] = receiver_email
-  msg['Subject'] = subject
-
-  msg.attach(MIMEText(body, 'html'))
-
-  try:
-      server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
-      server.ehlo()
-      server.login(sender_email, sender_password)
-      server.sendmail(sender_email, receiver_email, msg.as_string())
-      server.close()
-
-      print('Đã gửi thư thành công')
-      return True
-  except Exception as e:
-      print(f"Lỗi khi gửi email: {e}")
-      return False
\ No newline at end of file
+if __name__ == "__main__":
+    test_bulk_send()
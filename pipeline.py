@@ -0,0 +1,131 @@
+"""
+Khởi tạo LLM và Crew cho hệ thống chuẩn bị cuộc họp
+
+crewai chỉ được import khi thực sự tạo LLM/Crew, để các nơi chỉ cần meeting_data_key
+(ví dụ lúc đưa job vào hàng đợi) không phải chờ nạp cả framework.
+"""
+import hashlib
+import json
+
+from config import Config
+from instrumentation import AGENT_TASKS
+from progress import STAGE_KEYS
+from search_cache import normalize_query
+from task_memo import get_task_memo, task_output_text
+
+
+MEETING_FIELDS = ('company_name', 'meeting_objective', 'attendees', 'meeting_duration', 'focus_areas')
+
+
+def validate_inputs(company_name, meeting_objective, attendees, focus_areas):
+    """Kiểm tra tính hợp lệ của inputs"""
+    if not company_name or not company_name.strip():
+        return False
+    if not meeting_objective or not meeting_objective.strip():
+        return False
+    if not attendees or not attendees.strip():
+        return False
+    if not focus_areas or not focus_areas.strip():
+        return False
+    return True
+
+
+def meeting_data_key(meeting_data):
+    """Hash chuẩn hóa của meeting_data (bỏ qua khác biệt hoa/thường và khoảng trắng)"""
+    canonical = {
+        field: normalize_query(meeting_data.get(field, ''))
+        for field in MEETING_FIELDS
+        if field != 'meeting_duration'
+    }
+    canonical['meeting_duration'] = int(meeting_data.get('meeting_duration') or Config.DEFAULT_MEETING_DURATION)
+    payload = json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MeetingCrew:
+    """
+    Crew cho một lần chuẩn bị cuộc họp
+
+    Các task có kết quả ghi nhớ (fingerprint khớp) được điền sẵn đầu ra và không
+    đưa vào Crew; chỉ các task bị thay đổi đầu vào mới thực sự chạy.
+
+    Khi có run_id, đầu ra của từng task được lưu vào checkpoints ngay khi task xong;
+    resume=True điền sẵn các task đã lưu của run_id và tiếp tục từ task chưa hoàn thành.
+    """
+
+    def __init__(self, agents, tasks, verbose=False, memo=None, reuse=True, checkpoints=None, run_id=None,
+                 resume=False):
+        from crewai import Crew
+        from crewai.process import Process
+
+        self.tasks = tasks
+        self.memo = memo
+        self.resumed = checkpoints.apply(run_id, tasks, STAGE_KEYS) if checkpoints and run_id and resume else []
+        self.reused = memo.apply(tasks, STAGE_KEYS) if memo and reuse else []
+        if checkpoints and run_id:
+            checkpoints.attach(run_id, tasks, STAGE_KEYS)
+        
+        pending = [task for task in tasks if task_output_text(task) is None]
+        self.crew = Crew(
+            agents=list(agents.values()),
+            tasks=pending,
+            verbose=verbose,
+            process=Process.sequential
+        ) if pending else None
+
+    def kickoff(self, inputs=None):
+        """Chạy các task còn lại, trả về kết quả của task cuối cùng"""
+        try:
+            if self.crew is None:
+                return self.tasks[-1].output
+            return self.crew.kickoff(inputs=inputs) if inputs else self.crew.kickoff()
+        finally:
+            if self.memo:
+                self.memo.record(self.tasks, STAGE_KEYS)
+
+
+def create_llm(agent_key=None, profile=None):
+    """Tạo LLM client theo cấu hình trong Config (cấu hình riêng của agent_key nếu có)"""
+    from llm import MeteredLLM
+
+    return MeteredLLM(
+        api_key=Config.OPENAI_API_KEY,
+        timeout=Config.LLM_CALL_TIMEOUT_SECONDS or None,
+        **Config.agent_llm_settings(agent_key, profile)
+    )
+
+
+def create_llms(profile=None):
+    """
+    LLM client cho từng agent theo routing profile (mặc định Config.ROUTING_PROFILE)
+
+    Returns:
+        dict: agent_key -> LLM, truyền thẳng cho create_agents
+    """
+    return {agent_key: create_llm(agent_key, profile) for agent_key in AGENT_TASKS}
+
+
+def create_crew(agents, meeting_data, verbose=False, reuse=True, run_id=None, resume=False):
+    """
+    Tạo tasks và Crew cho một lần chuẩn bị cuộc họp
+    
+    Args:
+        agents (dict): Dictionary chứa tất cả agents (từ create_agents)
+        meeting_data (dict): Thông tin cuộc họp từ user input
+        verbose (bool): Hiển thị log chi tiết của crew
+        reuse (bool): Dùng lại kết quả ghi nhớ của các task không đổi đầu vào
+        run_id (str): ID lần chạy (job) để lưu checkpoint và chạy tiếp khi bị ngắt
+        resume (bool): Dùng checkpoint đã lưu của run_id (chạy tiếp lần chạy dở)
+    
+    Returns:
+        MeetingCrew: Crew sẵn sàng kickoff
+    """
+    from checkpoints import get_checkpoint_store
+    from tasks import create_tasks
+
+    tasks = create_tasks(agents, meeting_data, parallel=Config.is_parallel_execution())
+    memo = get_task_memo() if Config.TASK_MEMO_ENABLED else None
+    checkpoints = get_checkpoint_store() if Config.CHECKPOINT_ENABLED and run_id else None
+    
+    return MeetingCrew(agents, tasks, verbose=verbose, memo=memo, reuse=reuse,
+                       checkpoints=checkpoints, run_id=run_id, resume=resume)
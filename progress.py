@@ -0,0 +1,286 @@
+"""
+Theo dõi tiến trình thực tế của Crew thông qua task/step callbacks
+"""
+import contextvars
+import threading
+import time
+
+# Thứ tự các giai đoạn khớp với danh sách task trả về từ create_tasks
+STAGE_KEYS = ('context', 'industry', 'strategy', 'executive')
+
+# Agent (key trong create_agents) thực hiện từng giai đoạn
+AGENT_STAGE_KEYS = {
+    'context_analyzer': 'context',
+    'industry_insights_generator': 'industry',
+    'strategy_formulator': 'strategy',
+    'executive_briefing_creator': 'executive',
+}
+
+STAGE_PENDING = 'pending'
+STAGE_RUNNING = 'running'
+STAGE_DONE = 'done'
+
+# Mức tiến trình (%) cho từng loại sự kiện
+PROGRESS_STARTED = 10
+PROGRESS_PER_STEP = 15
+PROGRESS_MAX_RUNNING = 90
+
+
+class CrewProgressTracker:
+    """Thu thập sự kiện thực tế (bắt đầu task, gọi tool, hoàn thành) từ một Crew"""
+
+    def __init__(self, stage_keys=STAGE_KEYS):
+        self._lock = threading.Lock()
+        self._task_keys = {}
+        self._agent_keys = {}
+        self._attached_agents = []
+        self._dependencies = {}
+        self.stages = {
+            key: {
+                'state': STAGE_PENDING,
+                'progress': 0,
+                'message': '⏳ Đang chờ...',
+                'steps': 0,
+                'tool_calls': 0,
+                'started_at': None,
+                'finished_at': None,
+                'reused': False,
+                'resumed': False,
+            }
+            for key in stage_keys
+        }
+        self.streams = {}
+        self.streaming_stage = None
+        self.started_at = None
+        self.first_step_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def attach(self, crew, resumed=()):
+        """
+        Gắn callbacks vào các task và agent của crew
+
+        resumed: key các giai đoạn được điền từ checkpoint của lần chạy dở (MeetingCrew.resumed),
+        hiển thị khác với giai đoạn dùng lại kết quả ghi nhớ.
+        """
+        tasks = list(crew.tasks)
+        for key, task in zip(self.stages, tasks):
+            self._task_keys[id(task)] = key
+            if getattr(task, 'output', None) is not None:
+                # Đầu ra đã có sẵn (checkpoint hoặc ghi nhớ) - task sẽ không chạy lại
+                if key in resumed:
+                    self._mark_resumed(key)
+                else:
+                    self._mark_reused(key)
+                continue
+            task.callback = self._task_callback(key, task.callback)
+            if task.agent is not None:
+                self._agent_keys[id(task.agent)] = key
+                self._attached_agents.append((task.agent, task.agent.step_callback))
+                task.agent.step_callback = self._step_callback(key)
+
+        for index, (key, task) in enumerate(zip(self.stages, tasks)):
+            context = getattr(task, 'context', None)
+            if isinstance(context, list):
+                # Context tường minh (kể cả rỗng ở chế độ song song) quyết định thời điểm sẵn sàng
+                self._dependencies[key] = [self._task_keys[id(t)] for t in context if id(t) in self._task_keys]
+            elif index > 0:
+                # Chế độ sequential: task chỉ sẵn sàng sau task liền trước
+                self._dependencies[key] = [list(self.stages)[index - 1]]
+            else:
+                self._dependencies[key] = []
+        return self
+
+    def detach(self):
+        """
+        Trả lại step_callback cũ cho các agent đã gắn (agent của worker được dùng lại
+        cho job sau, không được giữ callback của tracker này)
+        """
+        for agent, previous in reversed(self._attached_agents):
+            agent.step_callback = previous
+        self._attached_agents = []
+
+    def start(self, crew, inputs=None):
+        """Chạy crew.kickoff() ở thread nền, trả về thread để theo dõi"""
+        with self._lock:
+            self.started_at = time.perf_counter()
+            self._mark_ready_stages()
+
+        def _run():
+            try:
+                self.result = crew.kickoff(inputs=inputs) if inputs else crew.kickoff()
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._lock:
+                    self.finished_at = time.perf_counter()
+
+        # Thread nền kế thừa contextvars (ví dụ RunMetrics đang hoạt động)
+        context = contextvars.copy_context()
+        worker = threading.Thread(target=context.run, args=(_run,), name="crew-kickoff", daemon=True)
+        worker.start()
+        return worker
+
+    def snapshot(self):
+        """Trạng thái hiện tại (bản sao) để hiển thị lên UI"""
+        with self._lock:
+            stages = {key: dict(stage) for key, stage in self.stages.items()}
+            overall = int(sum(stage['progress'] for stage in stages.values()) / max(len(stages), 1))
+            return {
+                'stages': stages,
+                'streams': dict(self.streams),
+                'streaming_stage': self.streaming_stage,
+                'overall': overall,
+                'elapsed': (self.finished_at or time.perf_counter()) - self.started_at if self.started_at else 0.0,
+                'time_to_first_step': self.time_to_first_step,
+                'done': self.finished_at is not None,
+            }
+
+    def on_stream_chunk(self, agent_key, chunk):
+        """Listener nhận text được stream từ LLM của một agent (None: lời gọi được gửi lại)"""
+        key = AGENT_STAGE_KEYS.get(agent_key, agent_key)
+        with self._lock:
+            if chunk is None:
+                self.streams.pop(key, None)
+                return
+            self.streams[key] = self.streams.get(key, '') + chunk
+            self.streaming_stage = key
+            if key in self.stages and self.stages[key]['state'] == STAGE_PENDING:
+                self._mark_running(key)
+            if self.first_step_at is None:
+                self.first_step_at = time.perf_counter()
+
+    @property
+    def time_to_first_step(self):
+        """Thời gian từ lúc bấm nút tới bước LLM/tool đầu tiên (giây)"""
+        if self.started_at is None or self.first_step_at is None:
+            return None
+        return self.first_step_at - self.started_at
+
+    def _task_callback(self, key, previous=None):
+        def _callback(output):
+            with self._lock:
+                stage = self.stages[key]
+                stage['state'] = STAGE_DONE
+                stage['progress'] = 100
+                stage['message'] = '✅ Hoàn thành'
+                stage['finished_at'] = time.perf_counter()
+                self._mark_ready_stages()
+            if previous:
+                previous(output)
+        return _callback
+
+    def _step_callback(self, key):
+        def _callback(step):
+            now = time.perf_counter()
+            tool = getattr(step, 'tool', None)
+            with self._lock:
+                if self.first_step_at is None:
+                    self.first_step_at = now
+                stage = self.stages[key]
+                if stage['state'] == STAGE_PENDING:
+                    self._mark_running(key)
+                stage['steps'] += 1
+                stage['progress'] = min(PROGRESS_STARTED + stage['steps'] * PROGRESS_PER_STEP, PROGRESS_MAX_RUNNING)
+                if tool:
+                    stage['tool_calls'] += 1
+                    stage['message'] = f"🛠️ Đang dùng tool: {tool}"
+                else:
+                    stage['message'] = f"💭 Đang suy luận (bước {stage['steps']})..."
+        return _callback
+
+    def _mark_ready_stages(self):
+        """
+        Giai đoạn đã đủ đầu vào nhưng CrewAI có thể chưa chạy (sequential, task async đang
+        xếp hàng): chỉ đổi thông báo; trạng thái running đến từ step/stream đầu tiên của agent
+        """
+        for key, stage in self.stages.items():
+            if stage['state'] != STAGE_PENDING:
+                continue
+            if all(self.stages[dep]['state'] == STAGE_DONE for dep in self._dependencies.get(key, [])):
+                stage['message'] = '⏳ Sẵn sàng, chờ agent bắt đầu...'
+
+    def _mark_reused(self, key):
+        stage = self.stages[key]
+        stage['state'] = STAGE_DONE
+        stage['reused'] = True
+        stage['progress'] = 100
+        stage['message'] = '♻️ Dùng lại kết quả trước'
+
+    def _mark_resumed(self, key):
+        stage = self.stages[key]
+        stage['state'] = STAGE_DONE
+        stage['resumed'] = True
+        stage['progress'] = 100
+        stage['message'] = '💾 Đã hoàn thành ở lần chạy trước'
+
+    def _mark_running(self, key):
+        stage = self.stages[key]
+        stage['state'] = STAGE_RUNNING
+        stage['progress'] = max(stage['progress'], PROGRESS_STARTED)
+        stage['message'] = '🚀 Đã bắt đầu...'
+        stage['started_at'] = time.perf_counter()
+
+
+def test_progress():
+    """Test function để kiểm tra với crew giả lập (không gọi API)"""
+
+    class _StubAgent:
+        step_callback = None
+
+    class _StubTask:
+        def __init__(self):
+            self.agent = _StubAgent()
+            self.callback = None
+            self.context = None
+            self.output = None
+
+    class _StubStep:
+        tool = 'Search the internet'
+
+    class _StubCrew:
+        def __init__(self):
+            self.tasks = [_StubTask() for _ in STAGE_KEYS]
+            self.first_llm_call_at = None
+
+        def kickoff(self):
+            for task in self.tasks:
+                if self.first_llm_call_at is None:
+                    self.first_llm_call_at = time.perf_counter()
+                # Trước bước đầu tiên của agent, chưa giai đoạn nào được coi là đang chạy
+                running_before_step.append(_running_stages())
+                task.agent.step_callback(_StubStep())
+                running_after_step.append(_running_stages())
+                task.callback('ok')
+            return 'ok'
+
+    def _running_stages():
+        return [key for key, stage in tracker.snapshot()['stages'].items() if stage['state'] == STAGE_RUNNING]
+
+    print("🧪 Testing CrewProgressTracker...")
+    running_before_step = []
+    running_after_step = []
+    crew = _StubCrew()
+    tracker = CrewProgressTracker().attach(crew)
+    clicked_at = time.perf_counter()
+    tracker.start(crew).join()
+
+    latency = crew.first_llm_call_at - clicked_at
+    snapshot = tracker.snapshot()
+    tracker.detach()
+    detached = all(task.agent.step_callback is None for task in crew.tasks)
+    print(f"⏱️ Time-to-first-LLM-call: {latency * 1000:.2f} ms")
+    print(f"📊 Tiến trình tổng: {snapshot['overall']}%")
+    one_at_a_time = (
+        running_before_step == [[] for _ in STAGE_KEYS]
+        and running_after_step == [[key] for key in STAGE_KEYS]
+    )
+    if latency < 0.5 and snapshot['overall'] == 100 and tracker.result == 'ok' and detached and one_at_a_time:
+        print("✅ Test thành công")
+    else:
+        print("❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_progress()
@@ -0,0 +1,249 @@
+"""
+Giới hạn tốc độ gọi provider (requests/phút và tokens/phút) dùng chung trong process
+"""
+import random
+import threading
+import time
+
+from config import Config
+
+
+class RateLimitExceeded(Exception):
+    """Vẫn bị provider từ chối (429) sau khi đã thử lại đủ số lần"""
+
+
+def provider_for_model(model):
+    """Provider của model theo quy ước litellm ("openai" nếu không có tiền tố)"""
+    model = str(model or Config.MODEL_NAME)
+    return model.split('/', 1)[0] if '/' in model else 'openai'
+
+
+def is_rate_limit_error(error):
+    """Lỗi 429 / rate limit từ litellm, openai hoặc requests"""
+    if type(error).__name__ in ('RateLimitError', 'RateLimitExceeded'):
+        return True
+    status = getattr(error, 'status_code', None)
+    response = getattr(error, 'response', None)
+    if status is None and response is not None:
+        status = getattr(response, 'status_code', None)
+    return status == 429
+
+
+def _retry_after(error):
+    """Giá trị header Retry-After (giây) nếu provider trả về"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after') or headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket nạp đều capacity đơn vị mỗi phút"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now, rate_factor):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.available = min(self.capacity, self.available + elapsed * self.capacity * rate_factor / 60)
+
+    def wait_time(self, amount, rate_factor):
+        # Yêu cầu lớn hơn capacity chỉ cần đợi bucket đầy
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / (self.capacity * rate_factor)
+
+
+class RateLimiter:
+    """
+    Token bucket theo requests/phút và tokens/phút cho một provider/model
+
+    Khi gặp 429, limiter dừng mọi lời gọi trong khoảng backoff (tăng gấp đôi mỗi lần,
+    tôn trọng Retry-After) và giảm tốc độ nạp còn một nửa; tốc độ hồi phục dần sau
+    mỗi lời gọi thành công.
+    """
+
+    MIN_RATE_FACTOR = 0.1
+    RECOVERY_STEP = 0.05
+
+    def __init__(self, name, rpm=None, tpm=None, max_backoff=60.0):
+        self.name = name
+        self.max_backoff = max_backoff
+        self._requests = _Bucket(rpm) if rpm else None
+        self._tokens = _Bucket(tpm) if tpm else None
+        self._condition = threading.Condition()
+        self._rate_factor = 1.0
+        self._backoff = 0.0
+        self._blocked_until = 0.0
+        self._waiting = 0
+        self._stats = {
+            'requests': 0,
+            'throttled': 0,
+            'rate_limited': 0,
+            'wait_time_s': 0.0,
+            'max_queue_depth': 0,
+        }
+
+    def acquire(self, tokens=0):
+        """
+        Chờ đến khi được phép gửi một request dùng khoảng tokens token
+
+        Returns:
+            float: Thời gian đã chờ (giây)
+        """
+        started = time.monotonic()
+        with self._condition:
+            self._waiting += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._waiting)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = max(self._blocked_until - now, 0.0)
+                    for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                        if bucket is not None:
+                            bucket.refill(now, self._rate_factor)
+                            wait = max(wait, bucket.wait_time(amount, self._rate_factor))
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+
+                if self._requests is not None:
+                    self._requests.available -= 1
+                if self._tokens is not None:
+                    self._tokens.available -= tokens
+            finally:
+                self._waiting -= 1
+
+            waited = time.monotonic() - started
+            self._stats['requests'] += 1
+            self._stats['wait_time_s'] += waited
+            self._stats['throttled'] += int(waited > 0.001)
+            return waited
+
+    def consume_tokens(self, tokens):
+        """Trừ thêm token biết được sau khi có kết quả (ví dụ completion tokens)"""
+        if self._tokens is None or not tokens:
+            return
+        with self._condition:
+            self._tokens.refill(time.monotonic(), self._rate_factor)
+            self._tokens.available -= tokens
+
+    def record_success(self):
+        with self._condition:
+            self._backoff = 0.0
+            self._rate_factor = min(1.0, self._rate_factor + self.RECOVERY_STEP)
+
+    def record_rate_limited(self, retry_after=None):
+        """Provider trả về 429: tạm dừng và giảm tốc độ cho mọi lời gọi dùng limiter này"""
+        with self._condition:
+            self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+            delay = max(retry_after or 0.0, self._backoff * random.uniform(0.8, 1.2))
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._rate_factor = max(self.MIN_RATE_FACTOR, self._rate_factor / 2)
+            self._stats['rate_limited'] += 1
+            self._condition.notify_all()
+
+    def call(self, func, tokens=0, retries=None):
+        """
+        Gọi func() trong giới hạn, tự thử lại khi bị 429
+
+        Returns:
+            tuple: (kết quả của func, tổng thời gian chờ limiter tính bằng giây)
+        """
+        retries = Config.RATE_LIMIT_MAX_RETRIES if retries is None else retries
+        waited = 0.0
+        for attempt in range(retries + 1):
+            waited += self.acquire(tokens)
+            try:
+                result = func()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                self.record_rate_limited(_retry_after(e))
+                if attempt == retries:
+                    raise RateLimitExceeded(f"{self.name}: vẫn bị giới hạn sau {retries} lần thử lại") from e
+                continue
+            self.record_success()
+            return result, waited
+
+    def stats(self):
+        """Số liệu hiện tại: độ sâu hàng đợi, số lần bị chặn/429, tổng thời gian chờ"""
+        with self._condition:
+            return dict(
+                self._stats,
+                name=self.name,
+                queue_depth=self._waiting,
+                rate_factor=round(self._rate_factor, 3),
+                wait_time_s=round(self._stats['wait_time_s'], 3),
+            )
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider, model=None):
+    """Limiter dùng chung trong process cho (provider, model), theo Config.RATE_LIMITS"""
+    key = f"{provider}:{model}" if model else provider
+    with _limiters_lock:
+        if key not in _limiters:
+            rpm, tpm = Config.RATE_LIMITS.get(provider, (None, None))
+            enabled = Config.RATE_LIMIT_ENABLED
+            _limiters[key] = RateLimiter(
+                key,
+                rpm=rpm if enabled else None,
+                tpm=tpm if enabled else None,
+                max_backoff=Config.RATE_LIMIT_MAX_BACKOFF_SECONDS
+            )
+        return _limiters[key]
+
+
+def all_limiter_stats():
+    """Số liệu của mọi limiter đã được dùng"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+def test_rate_limiter():
+    """Test function để kiểm tra giới hạn RPM và backoff khi gặp 429 (không gọi API)"""
+
+    class _RateLimitError(Exception):
+        status_code = 429
+
+    print("🧪 Testing RateLimiter...")
+    # 120 requests/phút = 2 request/giây, bucket đầy cho phép burst 120 request đầu
+    limiter = RateLimiter("test", rpm=120, tpm=None, max_backoff=0.2)
+    limiter._requests.available = 1
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    throttled_for = time.monotonic() - started
+
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise _RateLimitError("429 Too Many Requests")
+        return 'ok'
+
+    limiter._requests.available = limiter._requests.capacity
+    result, _ = limiter.call(flaky, retries=3)
+    stats = limiter.stats()
+    print(f"⏱️ 3 request với 1 lượt sẵn có: {throttled_for:.2f}s")
+    print(f"🔁 Số lần thử: {len(attempts)} · 429: {stats['rate_limited']} · rate_factor: {stats['rate_factor']}")
+    if 0.9 <= throttled_for < 1.5 and result == 'ok' and stats['rate_limited'] == 2 and stats['queue_depth'] == 0:
+        print("✅ Test thành công")
+    else:
+        print("❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_rate_limiter()
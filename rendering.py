@@ -0,0 +1,360 @@
+"""
+Chuyển báo cáo markdown sang HTML (nội dung email, bản in) và cache kết quả theo hash nội dung
+"""
+import hashlib
+import html
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config import Config
+
+# Tăng khi đổi cách render để không dùng lại bản render cũ trên đĩa
+RENDER_VERSION = 1
+
+FORMAT_MARKDOWN = 'md'
+FORMAT_EMAIL = 'email'
+FORMAT_PRINT = 'print'
+
+FORMAT_EXTENSIONS = {FORMAT_MARKDOWN: 'md', FORMAT_EMAIL: 'email.html', FORMAT_PRINT: 'print.html'}
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*$')
+_HORIZONTAL_RULE = re.compile(r'^(?:\*\s*){3,}$|^(?:-\s*){3,}$|^(?:_\s*){3,}$')
+_LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+_TABLE_SEPARATOR = re.compile(r'^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$')
+_CODE_SPAN = re.compile(r'(`+)(.+?)\1')
+_LINK = re.compile(r'\[([^\]]+)\]\((https?://[^)\s]+|mailto:[^)\s]+)\)')
+_AUTOLINK = re.compile(r'(?<!["=>])\bhttps?://[^\s<]+[^\s<.,;:!?)\]]')
+_BOLD = re.compile(r'\*\*(?!\s)(.+?)(?<!\s)\*\*|__(?!\s)(.+?)(?<!\s)__')
+_ITALIC = re.compile(r'(?<![*\w])\*(?![\s*])(.+?)(?<![\s*])\*(?!\*)|(?<!\w)_(?![\s_])(.+?)(?<![\s_])_(?!\w)')
+
+_PRINT_CSS = """
+@page { size: A4; margin: 18mm 16mm; }
+body { font-family: "Segoe UI", Roboto, Arial, sans-serif; font-size: 11pt; line-height: 1.5; color: #1f2328; max-width: 780px; margin: 0 auto; padding: 24px; }
+h1 { font-size: 20pt; border-bottom: 2px solid #d0d7de; padding-bottom: 6px; }
+h2 { font-size: 15pt; margin-top: 1.4em; }
+h3 { font-size: 12.5pt; }
+h1, h2, h3, h4 { page-break-after: avoid; }
+table { border-collapse: collapse; width: 100%; margin: 12px 0; }
+th, td { border: 1px solid #d0d7de; padding: 4px 8px; text-align: left; vertical-align: top; }
+th { background: #f6f8fa; }
+tr, li, pre, blockquote { page-break-inside: avoid; }
+pre { background: #f6f8fa; padding: 10px; white-space: pre-wrap; font-size: 9.5pt; }
+code { font-family: Consolas, monospace; }
+blockquote { border-left: 4px solid #d0d7de; margin: 0; padding-left: 12px; color: #57606a; }
+a { color: #0969da; }
+@media print { body { padding: 0; max-width: none; } a { color: inherit; } }
+"""
+
+
+def content_hash(text):
+    """Hash nội dung (kèm phiên bản renderer) dùng làm khóa cache"""
+    return hashlib.sha256(f"{RENDER_VERSION}\n{text}".encode('utf-8')).hexdigest()
+
+
+def _inline(text):
+    """Định dạng trong dòng: code, link, đậm, nghiêng (nội dung đã được escape)"""
+    parts = []
+    last = 0
+    for match in _CODE_SPAN.finditer(text):
+        parts.append(_inline_text(text[last:match.start()]))
+        parts.append(f"<code>{html.escape(match.group(2).strip())}</code>")
+        last = match.end()
+    parts.append(_inline_text(text[last:]))
+    return ''.join(parts)
+
+
+def _inline_text(text):
+    text = html.escape(text, quote=False)
+    text = _LINK.sub(lambda m: f'<a href="{m.group(2).replace(chr(34), "%22")}">{m.group(1)}</a>', text)
+    text = _AUTOLINK.sub(lambda m: f'<a href="{m.group(0).replace(chr(34), "%22")}">{m.group(0)}</a>', text)
+    text = _BOLD.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = _ITALIC.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+    return text
+
+
+def _table_cells(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+
+def _next_is_list_item(lines, index):
+    for line in lines[index + 1:]:
+        if line.strip():
+            return bool(_LIST_ITEM.match(line)) or line[:1] in (' ', '\t')
+    return False
+
+
+def markdown_to_html(text):
+    """
+    Chuyển markdown (kiểu output của các agent) sang HTML
+
+    Hỗ trợ tiêu đề, đoạn văn, danh sách lồng nhau, bảng, code, trích dẫn, đường kẻ
+    và định dạng trong dòng; mọi nội dung đều được escape.
+    """
+    lines = text.replace('\r\n', '\n').split('\n')
+    out = []
+    paragraph = []
+    lists = []  # (độ thụt lề, thẻ) của các danh sách đang mở
+
+    def flush_paragraph():
+        if paragraph:
+            rendered = [_inline(line.strip()) + ('<br>' if line.endswith('  ') else '') for line in paragraph]
+            out.append(f"<p>{chr(10).join(rendered)}</p>")
+            paragraph.clear()
+
+    def close_lists(indent=-1):
+        while lists and lists[-1][0] > indent:
+            out.append(f"</li></{lists.pop()[1]}>")
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if stripped.startswith('```'):
+            flush_paragraph()
+            close_lists()
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith('```'):
+                code.append(lines[i])
+                i += 1
+            out.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+            i += 1
+            continue
+
+        if not stripped:
+            flush_paragraph()
+            if lists and not _next_is_list_item(lines, i):
+                close_lists()
+            i += 1
+            continue
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            flush_paragraph()
+            close_lists()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+            i += 1
+            continue
+
+        if _HORIZONTAL_RULE.match(stripped):
+            flush_paragraph()
+            close_lists()
+            out.append("<hr>")
+            i += 1
+            continue
+
+        if stripped.startswith('>'):
+            flush_paragraph()
+            close_lists()
+            quoted = []
+            while i < len(lines) and lines[i].strip().startswith('>'):
+                quoted.append(lines[i].strip()[1:].lstrip())
+                i += 1
+            out.append(f"<blockquote>{markdown_to_html(chr(10).join(quoted))}</blockquote>")
+            continue
+
+        if '|' in stripped and i + 1 < len(lines) and _TABLE_SEPARATOR.match(lines[i + 1].strip()):
+            flush_paragraph()
+            close_lists()
+            header = ''.join(f"<th>{_inline(cell)}</th>" for cell in _table_cells(stripped))
+            rows = []
+            i += 2
+            while i < len(lines) and '|' in lines[i]:
+                rows.append('<tr>' + ''.join(f"<td>{_inline(cell)}</td>" for cell in _table_cells(lines[i])) + '</tr>')
+                i += 1
+            out.append(f"<table><thead><tr>{header}</tr></thead><tbody>{''.join(rows)}</tbody></table>")
+            continue
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            flush_paragraph()
+            indent = len(item.group(1).expandtabs(4))
+            tag = 'ol' if item.group(2)[0].isdigit() else 'ul'
+            close_lists(indent)
+            if lists and lists[-1][0] == indent and lists[-1][1] != tag:
+                out.append(f"</li></{lists.pop()[1]}>")
+            if lists and lists[-1][0] == indent:
+                out.append(f"</li><li>{_inline(item.group(3))}")
+            else:
+                # Danh sách con nằm trong <li> đang mở của danh sách cha
+                lists.append((indent, tag))
+                out.append(f"<{tag}><li>{_inline(item.group(3))}")
+        elif lists and line[:1] in (' ', '\t'):
+            out[-1] += ' ' + _inline(stripped)
+        else:
+            close_lists()
+            paragraph.append(line)
+        i += 1
+
+    flush_paragraph()
+    close_lists()
+    return '\n'.join(out)
+
+
+def email_html(text):
+    """HTML làm nội dung email (style inline vì nhiều client bỏ thẻ <style>)"""
+    return (
+        '<div style="font-family: Arial, sans-serif; font-size: 14px; line-height: 1.5; '
+        f'color: #1f2328; max-width: 760px;">\n{markdown_to_html(text)}\n</div>'
+    )
+
+
+def print_document(text, title):
+    """Trang HTML hoàn chỉnh sẵn sàng để in / lưu PDF từ trình duyệt"""
+    return (
+        '<!DOCTYPE html>\n<html lang="vi">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{html.escape(title)}</title>\n<style>{_PRINT_CSS}</style>\n</head>\n'
+        f'<body>\n{markdown_to_html(text)}\n</body>\n</html>\n'
+    )
+
+
+class RenderCache:
+    """
+    Bản render của báo cáo theo hash nội dung: LRU trong bộ nhớ, sau đó là file trên đĩa
+
+    Nội dung không đổi thì hash không đổi, nên bản render không bao giờ cần làm mới;
+    đổi RENDER_VERSION sẽ sinh hash mới.
+    """
+
+    def __init__(self, directory, max_items=32):
+        self.directory = directory
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'renders': 0}
+
+    def render(self, text, title):
+        """
+        Render mọi định dạng của báo cáo một lần và lưu vào cache
+
+        Returns:
+            str: Hash nội dung (khóa để lấy lại bằng get)
+        """
+        digest = content_hash(text)
+        if all(os.path.exists(self._path(digest, fmt)) for fmt in FORMAT_EXTENSIONS):
+            return digest
+
+        outputs = {
+            FORMAT_MARKDOWN: text,
+            FORMAT_EMAIL: email_html(text),
+            FORMAT_PRINT: print_document(text, title),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        for fmt, output in outputs.items():
+            data = output.encode(Config.FILE_ENCODING)
+            self._write_atomic(self._path(digest, fmt), data)
+            self._remember((digest, fmt), data)
+        with self._lock:
+            self.stats['renders'] += 1
+        return digest
+
+    def get(self, digest, fmt):
+        """Bản render (bytes) theo hash và định dạng, None nếu chưa có"""
+        key = (digest, fmt)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return data
+        try:
+            with open(self._path(digest, fmt), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        with self._lock:
+            self.stats['disk_hits'] += 1
+        return data
+
+    def _path(self, digest, fmt):
+        return os.path.join(self.directory, digest[:2], f"{digest}.{FORMAT_EXTENSIONS[fmt]}")
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    """Cache bản render dùng chung trong process"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RenderCache(Config.RENDER_CACHE_DIR, max_items=Config.RENDER_CACHE_ITEMS)
+        return _shared_cache
+
+
+def test_rendering():
+    """Test function để kiểm tra chuyển markdown và cache bản render"""
+    import shutil
+
+    print("🧪 Testing rendering...")
+    sample = (
+        "# Chuẩn bị cuộc họp - A&B <Corp>\n"
+        "**Ngày tạo:** 01/01/2025\n\n"
+        "## Tóm tắt\n"
+        "- Mục *một* với `code`\n"
+        "  - Mục con [link](https://example.com/?a=1&b=2)\n"
+        "- Mục hai\n\n"
+        "1. Bước một\n2. Bước hai\n\n"
+        "| Chỉ số | Giá trị |\n|---|---|\n| Doanh thu | 10 |\n\n"
+        "> Trích dẫn\n\n---\n\nĐoạn cuối <script>alert(1)</script>\n"
+    )
+    body = markdown_to_html(sample)
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = RenderCache(tmp, max_items=2)
+        digest = cache.render(sample, "A&B")
+        cache.render(sample, "A&B")
+        cache._memory.clear()
+        from_disk = cache.get(digest, FORMAT_PRINT)
+        from_memory = cache.get(digest, FORMAT_PRINT)
+        print(f"📄 HTML: {len(body)} ký tự · Cache: {cache.stats}")
+        passed = (
+            "<h1>Chuẩn bị cuộc họp - A&amp;B &lt;Corp&gt;</h1>" in body
+            and "<ul><li>Mục <em>một</em> với <code>code</code>\n<ul><li>Mục con" in body
+            and '<a href="https://example.com/?a=1&amp;b=2">link</a>' in body
+            and "<ol><li>Bước một\n</li><li>Bước hai\n</li></ol>" in body
+            and "<td>Doanh thu</td>" in body
+            and "<blockquote>" in body and "<hr>" in body
+            and "<script>" not in body
+            and from_disk == from_memory and from_disk.startswith(b"<!DOCTYPE html>")
+            and cache.stats == {'memory_hits': 1, 'disk_hits': 1, 'renders': 1}
+        )
+        print("✅ Test thành công" if passed else "❌ Test thất bại!")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_rendering()
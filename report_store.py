@@ -0,0 +1,413 @@
+"""
+Kho báo cáo cuộc họp: nội dung lưu dạng file markdown, metadata lưu trong SQLite
+"""
+import datetime
+import glob
+import json
+import os
+import sys
+import re
+import threading
+import time
+
+from config import Config
+from rendering import RenderCache, get_render_cache
+from storage import connect_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL UNIQUE,
+    company_name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_company_name ON reports(company_name, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+    content,
+    company_name,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS report_metrics (
+    report_id INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_metrics_report_id ON report_metrics(report_id);
+CREATE TABLE IF NOT EXISTS report_store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Cột thêm sau khi bảng reports đã được tạo ở phiên bản trước
+_ADDED_COLUMNS = {
+    'content_hash': "TEXT",
+}
+
+# meeting_prep_<công ty>_<ddmmYYYY>_<HHMMSS>.md - tên công ty có thể chứa dấu "_"
+_LEGACY_FILENAME = re.compile(r'^meeting_prep_(?P<company>.*)_(?P<date>\d{8})_(?P<time>\d{6})\.md$')
+_REPORT_HEADER = "# Chuẩn bị cuộc họp - "
+
+
+def safe_company_name(company_name):
+    """Tên công ty an toàn để dùng trong tên file"""
+    return "".join(c for c in company_name if c.isalnum() or c in (' ', '-', '_')).strip()
+
+
+def _fts_query(text):
+    """Chuyển từ khóa người dùng thành truy vấn FTS5 an toàn (AND, từ cuối theo tiền tố)"""
+    tokens = re.findall(r'\w+', text or '', re.UNICODE)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class ReportStore:
+    """
+    Lưu và truy vấn báo cáo cuộc họp qua bảng metadata có index
+
+    Báo cáo được render (HTML email, bản in) một lần khi lưu; tải xuống và gửi
+    email lấy lại bản render qua hash nội dung thay vì đọc và chuyển đổi lại file.
+    """
+
+    def __init__(self, path, reports_dir, render_cache=None):
+        self.path = path
+        self.reports_dir = reports_dir
+        self.render_cache = render_cache or RenderCache(os.path.join(reports_dir, "rendered"))
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+        self._add_missing_columns()
+        self._backfill_search_index()
+
+    def save(self, result, company_name, created_at=None, metrics=None):
+        """
+        Ghi báo cáo ra file markdown và thêm metadata vào index
+
+        Args:
+            result: Kết quả crew (nội dung báo cáo)
+            company_name (str): Tên công ty
+            created_at (float): Timestamp tạo báo cáo (mặc định: hiện tại)
+            metrics (list): Các record đo lường của lần chạy (instrumentation)
+
+        Returns:
+            str: Đường dẫn file đã lưu
+        """
+        created = datetime.datetime.fromtimestamp(created_at) if created_at else datetime.datetime.now()
+        os.makedirs(self.reports_dir, exist_ok=True)
+
+        base = f"meeting_prep_{safe_company_name(company_name)}_{created.strftime('%d%m%Y_%H%M%S')}"
+        filename = os.path.join(self.reports_dir, f"{base}.md")
+        suffix = 1
+        while os.path.exists(filename):
+            suffix += 1
+            filename = os.path.join(self.reports_dir, f"{base}_{suffix}.md")
+
+        content = (
+            f"{_REPORT_HEADER}{company_name}\n"
+            f"**Ngày tạo:** {created.strftime('%d/%m/%Y %H:%M:%S')}\n\n"
+            f"{result}"
+        )
+        with open(filename, 'w', encoding=Config.FILE_ENCODING) as f:
+            f.write(content)
+
+        try:
+            digest = self.render_cache.render(content, self._title(company_name))
+        except Exception as e:
+            # Báo cáo vẫn được lưu; bản render sẽ được tạo lại khi cần
+            print(f"⚠️ Lỗi render báo cáo: {e}")
+            digest = None
+
+        self._insert(filename, company_name, created.timestamp(), content, metrics, digest)
+        return filename
+
+    def list_recent(self, limit):
+        """Các báo cáo mới nhất (dùng index trên created_at)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, filename, company_name, created_at FROM reports "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        """Tổng số báo cáo (bộ đếm duy trì cùng lúc với thao tác ghi)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM report_store_meta WHERE key = 'report_count'"
+            ).fetchone()
+        return int(row['value']) if row else 0
+
+    def count_since(self, timestamp):
+        """Số báo cáo tạo sau thời điểm timestamp (range scan trên index)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM reports WHERE created_at > ?", (timestamp,)
+            ).fetchone()[0]
+
+    def search(self, query, company_name=None, date_from=None, date_to=None, limit=20):
+        """
+        Tìm kiếm toàn văn trong các báo cáo, xếp hạng theo BM25
+
+        Args:
+            query (str): Từ khóa (không phân biệt dấu, từ cuối được tìm theo tiền tố)
+            company_name (str): Chỉ lấy báo cáo của công ty này
+            date_from (float): Timestamp bắt đầu (bao gồm)
+            date_to (float): Timestamp kết thúc (không bao gồm)
+            limit (int): Số kết quả tối đa
+
+        Returns:
+            list: Các báo cáo khớp kèm đoạn trích (snippet) có đánh dấu từ khóa
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+
+        sql = (
+            "SELECT r.id, r.filename, r.company_name, r.created_at, "
+            "snippet(reports_fts, 0, '**', '**', ' … ', 16) AS snippet, "
+            "reports_fts.rank AS rank "
+            "FROM reports_fts JOIN reports r ON r.id = reports_fts.rowid "
+            "WHERE reports_fts MATCH ?"
+        )
+        params = [match]
+        if company_name:
+            sql += " AND r.company_name = ?"
+            params.append(company_name)
+        if date_from is not None:
+            sql += " AND r.created_at >= ?"
+            params.append(date_from)
+        if date_to is not None:
+            sql += " AND r.created_at < ?"
+            params.append(date_to)
+        sql += " ORDER BY reports_fts.rank LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_companies(self):
+        """Danh sách tên công ty đã có báo cáo (dùng cho bộ lọc)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT company_name FROM reports ORDER BY company_name"
+            ).fetchall()
+        return [row['company_name'] for row in rows]
+
+    def get(self, filename):
+        """Metadata của một báo cáo theo đường dẫn file"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename, company_name, created_at FROM reports WHERE filename = ?",
+                (filename,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_metrics(self, filename):
+        """Các record đo lường được lưu cùng báo cáo"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.record FROM report_metrics m JOIN reports r ON r.id = m.report_id "
+                "WHERE r.filename = ?",
+                (filename,)
+            ).fetchall()
+        return [json.loads(row['record']) for row in rows]
+
+    def recent_metrics(self, limit):
+        """Các record đo lường của limit báo cáo mới nhất (tổng hợp độ trễ qua nhiều lần chạy)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.record FROM report_metrics m JOIN "
+                "(SELECT id FROM reports ORDER BY created_at DESC LIMIT ?) r ON r.id = m.report_id",
+                (limit,)
+            ).fetchall()
+        return [json.loads(row['record']) for row in rows]
+
+    def export_metrics_jsonl(self, path):
+        """
+        Xuất toàn bộ record đo lường ra file JSON lines để tổng hợp
+
+        Returns:
+            int: Số record đã xuất
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.filename, m.record FROM report_metrics m JOIN reports r ON r.id = m.report_id "
+                "ORDER BY r.created_at"
+            ).fetchall()
+        with open(path, 'w', encoding=Config.FILE_ENCODING) as f:
+            for row in rows:
+                record = json.loads(row['record'])
+                record['report'] = row['filename']
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return len(rows)
+
+    def read(self, filename):
+        """Đọc nội dung markdown của báo cáo"""
+        with open(filename, 'r', encoding=Config.FILE_ENCODING) as f:
+            return f.read()
+
+    def rendered(self, filename, fmt):
+        """
+        Bản render của báo cáo dạng bytes (rendering.FORMAT_MARKDOWN/EMAIL/PRINT)
+
+        Báo cáo cũ (hoặc bản render đã bị xóa) được render một lần rồi ghi nhớ hash.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, company_name, content_hash FROM reports WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row and row['content_hash']:
+            data = self.render_cache.get(row['content_hash'], fmt)
+            if data is not None:
+                return data
+
+        company_name = row['company_name'] if row else os.path.basename(filename)
+        digest = self.render_cache.render(self.read(filename), self._title(company_name))
+        if row:
+            with self._lock:
+                self._conn.execute("UPDATE reports SET content_hash = ? WHERE id = ?", (digest, row['id']))
+        return self.render_cache.get(digest, fmt)
+
+    def import_existing(self):
+        """
+        Nhập một lần các file báo cáo có sẵn trong thư mục reports vào index
+
+        Returns:
+            int: Số báo cáo được nhập thêm
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM report_store_meta WHERE key = 'legacy_imported'"
+            ).fetchone()
+        if done:
+            return 0
+
+        imported = 0
+        for path in glob.glob(os.path.join(self.reports_dir, "meeting_prep_*.md")):
+            if self.get(path):
+                continue
+            metadata = self._parse_legacy_file(path)
+            if metadata:
+                self._insert(path, metadata['company_name'], metadata['created_at'], self._read_quietly(path))
+                imported += 1
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO report_store_meta (key, value) VALUES ('legacy_imported', ?)",
+                (str(time.time()),)
+            )
+        return imported
+
+    def _insert(self, filename, company_name, created_at, content, metrics=None, content_hash=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO reports (filename, company_name, created_at, content_hash) "
+                    "VALUES (?, ?, ?, ?)",
+                    (filename, company_name, created_at, content_hash)
+                )
+                if cursor.rowcount:
+                    # Cập nhật index toàn văn ngay trong cùng transaction
+                    self._conn.execute(
+                        "INSERT INTO reports_fts (rowid, content, company_name) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, content, company_name)
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO report_metrics (report_id, record) VALUES (?, ?)",
+                        [(cursor.lastrowid, json.dumps(record, ensure_ascii=False)) for record in metrics or []]
+                    )
+                    self._conn.execute(
+                        "INSERT INTO report_store_meta (key, value) VALUES ('report_count', '1') "
+                        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _add_missing_columns(self):
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(reports)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE reports ADD COLUMN {name} {definition}")
+
+    def _backfill_search_index(self):
+        """Đưa các báo cáo đã index trước khi có tìm kiếm toàn văn vào reports_fts"""
+        with self._lock:
+            missing = self._conn.execute(
+                "SELECT id, filename, company_name FROM reports "
+                "WHERE id NOT IN (SELECT rowid FROM reports_fts)"
+            ).fetchall()
+        for row in missing:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO reports_fts (rowid, content, company_name) VALUES (?, ?, ?)",
+                    (row['id'], self._read_quietly(row['filename']), row['company_name'])
+                )
+
+    @staticmethod
+    def _title(company_name):
+        return f"{_REPORT_HEADER[2:]}{company_name}"
+
+    @staticmethod
+    def _read_quietly(path):
+        try:
+            with open(path, 'r', encoding=Config.FILE_ENCODING) as f:
+                return f.read()
+        except (OSError, UnicodeDecodeError):
+            return ''
+
+    @staticmethod
+    def _parse_legacy_file(path):
+        match = _LEGACY_FILENAME.match(os.path.basename(path))
+        if not match:
+            return None
+
+        # Ưu tiên tên công ty gốc ở dòng tiêu đề của file
+        company_name = match.group('company')
+        try:
+            with open(path, 'r', encoding=Config.FILE_ENCODING) as f:
+                header = f.readline().strip()
+            if header.startswith(_REPORT_HEADER):
+                company_name = header[len(_REPORT_HEADER):] or company_name
+        except (OSError, UnicodeDecodeError):
+            pass
+
+        try:
+            created_at = datetime.datetime.strptime(
+                match.group('date') + match.group('time'), '%d%m%Y%H%M%S'
+            ).timestamp()
+        except ValueError:
+            created_at = os.path.getmtime(path)
+
+        return {'company_name': company_name, 'created_at': created_at}
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_report_store():
+    """Instance kho báo cáo dùng chung, tự nhập các file cũ ở lần khởi tạo đầu tiên"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = ReportStore(Config.REPORT_INDEX_PATH, Config.REPORTS_DIR, render_cache=get_render_cache())
+            _shared_store.import_existing()
+        return _shared_store
+
+
+if __name__ == "__main__":
+    # python report_store.py export-metrics metrics.jsonl
+    if len(sys.argv) == 3 and sys.argv[1] == 'export-metrics':
+        count = get_report_store().export_metrics_jsonl(sys.argv[2])
+        print(f"✅ Đã xuất {count} record vào {sys.argv[2]}")
+    else:
+        print("Cách dùng: python report_store.py export-metrics <file.jsonl>")
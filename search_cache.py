@@ -0,0 +1,139 @@
+"""
+Cache kết quả tìm kiếm (SerperDev) lưu trên đĩa với TTL và LRU eviction
+"""
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+
+from config import Config
+from storage import connect_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_cache_last_access ON search_cache(last_access);
+CREATE TABLE IF NOT EXISTS search_cache_stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def normalize_query(query):
+    """Chuẩn hóa câu truy vấn: Unicode NFC, chữ thường, gộp khoảng trắng"""
+    query = unicodedata.normalize('NFC', str(query or ''))
+    return ' '.join(query.lower().split())
+
+
+def make_cache_key(query, **params):
+    """Tạo key ổn định từ query đã chuẩn hóa và các tham số tìm kiếm"""
+    payload = json.dumps(
+        {'query': normalize_query(query), 'params': params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """Cache SQLite dùng chung giữa các session và process"""
+
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key):
+        """Lấy kết quả còn hạn theo key, trả về None nếu miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None or now - row['created_at'] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._increment('misses')
+                return None
+            
+            self._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._increment('hits')
+        return json.loads(row['value'])
+
+    def set(self, key, query, value):
+        """Lưu kết quả và loại bỏ các entry ít dùng nhất khi vượt giới hạn"""
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, normalize_query(query), data, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN ("
+                "SELECT key FROM search_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        """Thống kê hit/miss và số entry hiện có"""
+        with self._lock:
+            counters = {
+                row['name']: row['value']
+                for row in self._conn.execute("SELECT name, value FROM search_cache_stats")
+            }
+            entries = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'entries': entries,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """Xóa toàn bộ cache và bộ đếm"""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.execute("DELETE FROM search_cache_stats")
+
+    def _increment(self, name):
+        self._conn.execute(
+            "INSERT INTO search_cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Instance cache dùng chung trong process (file SQLite dùng chung giữa các process)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SearchCache(
+                Config.SEARCH_CACHE_PATH,
+                ttl_seconds=Config.SEARCH_CACHE_TTL_SECONDS,
+                max_entries=Config.SEARCH_CACHE_MAX_ENTRIES
+            )
+        return _shared_cache
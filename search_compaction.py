@@ -0,0 +1,277 @@
+"""
+Thu gọn kết quả tìm kiếm trước khi đưa vào prompt: bỏ trùng (URL, nội dung gần giống),
+bỏ phần thừa và giới hạn số token
+"""
+import json
+import re
+import threading
+import weakref
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import Config
+from instrumentation import estimate_tokens
+from search_cache import normalize_query
+
+# Tham số theo dõi không làm đổi nội dung trang
+_TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'ref_src')
+_BOILERPLATE = re.compile(
+    r'(?i)\b(?:read more|click here|learn more|continue reading|sign up|subscribe now|'
+    r'accept (?:all )?cookies|all rights reserved|xem thêm|đọc thêm|chi tiết tại|bản quyền thuộc về)\b[^.!?]*[.!?]?'
+)
+_ELLIPSIS = re.compile(r'\s*(?:\.{3,}|…)\s*')
+_WORD = re.compile(r'\w+')
+
+NO_NEW_RESULTS = "Không có kết quả mới (các kết quả đều trùng với kết quả đã có)."
+
+
+def canonical_url(url):
+    """URL chuẩn hóa để so trùng: bỏ www, fragment, tham số theo dõi và dấu "/" cuối"""
+    if not url:
+        return None
+    parts = urlsplit(str(url).strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(_TRACKING_PARAMS)
+    ))
+    return urlunsplit(('', host, parts.path.rstrip('/'), query, ''))
+
+
+def clean_snippet(text):
+    """Bỏ câu mời chào (read more, xem thêm, cookie, ...), dấu ba chấm và khoảng trắng thừa"""
+    text = _BOILERPLATE.sub(' ', str(text or ''))
+    text = _ELLIPSIS.sub(' ', text)
+    return ' '.join(text.split())
+
+
+def approx_tokens(text):
+    """Ước tính nhanh ~4 ký tự/token (dùng khi cắt theo ngân sách)"""
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, max_tokens):
+    """Cắt text về khoảng max_tokens token, tại ranh giới từ"""
+    if approx_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4].rsplit(' ', 1)[0]
+    return f"{cut} …"
+
+
+def shingles(text, size=None):
+    """Tập hash của các cụm size từ liên tiếp (chuẩn hóa chữ thường)"""
+    size = size or Config.SEARCH_SHINGLE_SIZE
+    words = _WORD.findall(normalize_query(text))
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _items(result):
+    """
+    Các kết quả (title, link, snippet) từ JSON của Serper, theo thứ tự ưu tiên
+
+    Returns:
+        list | None: None nếu kết quả không có cấu trúc (chỉ cắt theo ngân sách)
+    """
+    if isinstance(result, str):
+        try:
+            result = json.loads(result)
+        except ValueError:
+            return None
+    if isinstance(result, list):
+        result = {'organic': result}
+    if not isinstance(result, dict):
+        return None
+
+    items = []
+    answer = result.get('answerBox')
+    if isinstance(answer, dict):
+        items.append({
+            'title': answer.get('title', ''),
+            'link': answer.get('link'),
+            'snippet': answer.get('answer') or answer.get('snippet', ''),
+        })
+    graph = result.get('knowledgeGraph')
+    if isinstance(graph, dict):
+        attributes = "; ".join(f"{key}: {value}" for key, value in (graph.get('attributes') or {}).items())
+        items.append({
+            'title': " - ".join(filter(None, [graph.get('title'), graph.get('type')])),
+            'link': graph.get('website') or graph.get('descriptionLink'),
+            'snippet': " ".join(filter(None, [graph.get('description'), attributes])),
+        })
+    for section in ('organic', 'news'):
+        for entry in result.get(section) or []:
+            if isinstance(entry, dict):
+                snippet = entry.get('snippet', '')
+                if entry.get('date'):
+                    snippet = f"{entry['date']} · {snippet}"
+                items.append({'title': entry.get('title', ''), 'link': entry.get('link'), 'snippet': snippet})
+    for entry in result.get('peopleAlsoAsk') or []:
+        if isinstance(entry, dict):
+            items.append({'title': entry.get('question', ''), 'link': entry.get('link'), 'snippet': entry.get('snippet', '')})
+
+    has_sections = any(key in result for key in ('answerBox', 'knowledgeGraph', 'organic', 'news', 'peopleAlsoAsk'))
+    return items if has_sections else None
+
+
+class SearchCompactor:
+    """
+    Bỏ trùng kết quả tìm kiếm trong một brief, dùng chung cho mọi truy vấn và agent
+
+    Kết quả trùng (cùng URL hoặc nội dung gần giống) mà agent đã được thấy thì bị bỏ;
+    nếu chỉ agent khác đã nhận thì giữ một dòng tiêu đề và link để agent biết nguồn mà
+    không tốn token cho nội dung lặp lại.
+    """
+
+    def __init__(self, similarity=None, snippet_tokens=None, result_tokens=None):
+        self.similarity = Config.SEARCH_DEDUP_SIMILARITY if similarity is None else similarity
+        self.snippet_tokens = snippet_tokens or Config.SEARCH_SNIPPET_TOKEN_BUDGET
+        self.result_tokens = result_tokens or Config.SEARCH_RESULT_TOKEN_BUDGET
+        self._lock = threading.Lock()
+        self._urls = {}
+        self._signatures = []
+        # (agent, id kết quả gốc) đã có trong prompt của agent
+        self._seen_by = set()
+        self.stats = {'results_in': 0, 'results_kept': 0, 'duplicates': 0, 'over_budget': 0}
+
+    def compact(self, result, agent_key=None):
+        """
+        Kết quả tìm kiếm thu gọn dạng text cho prompt của agent
+
+        Args:
+            result: Kết quả của search tool (dict/JSON của Serper hoặc text)
+            agent_key: Agent sẽ nhận kết quả
+        """
+        items = _items(result)
+        if items is None:
+            return truncate_tokens(clean_snippet(result), self.result_tokens)
+
+        entries = []
+        budget = self.result_tokens
+        with self._lock:
+            for item in items:
+                self.stats['results_in'] += 1
+                title = clean_snippet(item['title'])
+                snippet = truncate_tokens(clean_snippet(item['snippet']), self.snippet_tokens)
+                url = canonical_url(item['link'])
+                signature = shingles(f"{title} {snippet}")
+
+                original = self._urls.get(url) if url else None
+                if original is None:
+                    original = self._near_duplicate(signature)
+                if original is not None:
+                    self.stats['duplicates'] += 1
+                    if (agent_key, original) in self._seen_by:
+                        continue
+                    entry = f"- {title} ({item['link']}) [trùng kết quả đã có]"
+                else:
+                    entry = "\n".join(filter(None, [f"- {title}", f"  {item['link']}" if item['link'] else None,
+                                                    f"  {snippet}" if snippet else None]))
+
+                cost = approx_tokens(entry)
+                if cost > budget:
+                    self.stats['over_budget'] += 1
+                    continue
+                budget -= cost
+                entries.append(entry)
+                self.stats['results_kept'] += 1
+                if original is None:
+                    original = len(self._signatures)
+                    self._signatures.append(signature)
+                    if url:
+                        self._urls[url] = original
+                self._seen_by.add((agent_key, original))
+
+        return "\n".join(entries) if entries else NO_NEW_RESULTS
+
+    def _near_duplicate(self, signature):
+        for original, seen in enumerate(self._signatures):
+            if jaccard(signature, seen) >= self.similarity:
+                return original
+        return None
+
+
+_run_compactors = weakref.WeakKeyDictionary()
+_run_compactors_lock = threading.Lock()
+
+
+def compactor_for(metrics):
+    """
+    SearchCompactor của một lần chạy (theo đối tượng RunMetrics của lần chạy đó);
+    không có lần chạy thì dùng riêng mỗi lần
+    """
+    if metrics is None:
+        return SearchCompactor()
+    with _run_compactors_lock:
+        if metrics not in _run_compactors:
+            _run_compactors[metrics] = SearchCompactor()
+        return _run_compactors[metrics]
+
+
+def compact_search_result(result, agent_key=None, metrics=None, compactor=None):
+    """
+    Thu gọn kết quả tìm kiếm và ghi số token tiết kiệm được vào metrics
+
+    compactor là SearchCompactor gắn với tool của lần chạy (xem MeteredSerperDevTool.bind_metrics);
+    không có thì dùng compactor của metrics.
+    """
+    compactor = compactor or compactor_for(metrics)
+    compacted = compactor.compact(result, agent_key)
+    if metrics is not None:
+        # Không thu gọn thì agent nhận str(result)
+        metrics.record_search_compaction(
+            agent_key,
+            estimate_tokens(metrics.model, text=str(result)),
+            estimate_tokens(metrics.model, text=compacted)
+        )
+    return compacted
+
+
+def test_search_compaction():
+    """Test function để kiểm tra bỏ trùng và giới hạn token (không gọi API)"""
+    print("🧪 Testing search compaction...")
+    article = (
+        "Công ty Alpha công bố doanh thu quý ba tăng mạnh nhờ mảng thanh toán số và mở rộng "
+        "sang thị trường Đông Nam Á, theo báo cáo tài chính mới nhất."
+    )
+    first = {'organic': [
+        {'title': "Alpha tăng trưởng", 'link': "https://www.news.vn/alpha?utm_source=x", 'snippet': article + " Read more"},
+        {'title': "Alpha và đối thủ", 'link': "https://example.com/b", 'snippet': "So sánh Alpha với Beta trong ngành fintech..."},
+    ], 'searchParameters': {'q': 'alpha'}, 'credits': 1}
+    second = {'organic': [
+        {'title': "Alpha tăng trưởng", 'link': "https://news.vn/alpha/", 'snippet': article},
+        {'title': "Bản tin khác", 'link': "https://other.vn/alpha-q3", 'snippet': "Tin nhanh: " + article},
+        {'title': "Chủ đề mới", 'link': "https://example.com/c", 'snippet': "Kế hoạch IPO của Alpha năm tới. " * 40},
+    ]}
+
+    compactor = SearchCompactor(snippet_tokens=40, result_tokens=400)
+    own = compactor.compact(first, 'context_analyzer')
+    repeat = compactor.compact(second, 'context_analyzer')
+    other = SearchCompactor(snippet_tokens=40, result_tokens=400)
+    other.compact(first, 'context_analyzer')
+    shared = other.compact(second, 'industry_insights_generator')
+
+    print(f"📉 {len(str(first)) + len(str(second))} → {len(own) + len(repeat)} ký tự · {compactor.stats}")
+    passed = (
+        "Read more" not in own and "searchParameters" not in own
+        and "Alpha tăng trưởng" not in repeat and "Bản tin khác" not in repeat
+        and "Chủ đề mới" in repeat and approx_tokens(repeat) <= 400 and repeat.endswith("…")
+        and compactor.stats['duplicates'] == 2
+        and shared.count("[trùng kết quả đã có]") == 1 and "Chủ đề mới" in shared
+    )
+    print("✅ Test thành công" if passed else "❌ Test thất bại!")
+
+
+if __name__ == "__main__":
+    test_search_compaction()
@@ -0,0 +1,110 @@
+"""
+Search tool cho các research agents, có cache kết quả dùng chung
+"""
+import time
+from typing import Any, Optional
+
+from pydantic import Field
+
+from crewai_tools import SerperDevTool
+
+from config import Config
+from instrumentation import current_metrics
+from rate_limit import get_rate_limiter
+from search_cache import get_search_cache, make_cache_key
+from search_compaction import compact_search_result, compactor_for
+
+
+class MeteredSerperDevTool(SerperDevTool):
+    """
+    SerperDevTool ghi lại số lần gọi và thời gian tìm kiếm theo agent
+
+    Kết quả (kể cả từ cache) được thu gọn trước khi trả cho agent: bỏ trùng giữa các
+    truy vấn và agent của cùng một brief, bỏ phần thừa và giới hạn token.
+    """
+
+    agent_key: Optional[str] = None
+    rate_limit_provider: str = "serper"
+    # RunMetrics và SearchCompactor của lần chạy đang dùng tool (xem instrumentation.activate);
+    # các bản sao theo agent của cùng lần chạy dùng chung một compactor để bỏ trùng giữa agent
+    metrics: Optional[Any] = Field(default=None, exclude=True)
+    compactor: Optional[Any] = Field(default=None, exclude=True)
+
+    def for_agent(self, agent_key):
+        """Bản sao của tool gắn với một agent (để gom số liệu theo agent)"""
+        return self.model_copy(update={'agent_key': agent_key})
+
+    def bind_metrics(self, metrics):
+        self.metrics = metrics
+        self.compactor = compactor_for(metrics) if metrics is not None else None
+
+    def _run(self, **kwargs):
+        started_at = time.perf_counter()
+        result, cached = self._search(**kwargs)
+        
+        metrics = current_metrics(self)
+        if metrics is not None:
+            metrics.record_tool_call(self.agent_key, self.name, started_at, time.perf_counter(), cached=cached)
+        if Config.SEARCH_COMPACTION_ENABLED:
+            result = compact_search_result(result, self.agent_key, metrics, compactor=self.compactor)
+        return result
+
+    def _search(self, **kwargs):
+        """Tìm kiếm thực tế, trả về (kết quả, có lấy từ cache hay không)"""
+        return self._request(lambda: super(MeteredSerperDevTool, self)._run(**kwargs)), False
+
+    def _request(self, func):
+        """Gọi API tìm kiếm qua limiter dùng chung (kết quả từ cache không tính vào giới hạn)"""
+        result, waited = get_rate_limiter(self.rate_limit_provider).call(func)
+        metrics = current_metrics(self)
+        if metrics is not None and waited:
+            metrics.record_rate_limit_wait(self.agent_key, waited)
+        return result
+
+
+class CachedSerperDevTool(MeteredSerperDevTool):
+    """SerperDevTool đọc/ghi kết quả qua SearchCache dùng chung"""
+
+    bypass_cache: bool = False
+
+    def _search(self, **kwargs):
+        query = kwargs.get('search_query') or kwargs.get('query') or ''
+        if not Config.SEARCH_CACHE_ENABLED:
+            return super()._search(**kwargs)
+        
+        cache = get_search_cache()
+        key = make_cache_key(
+            query,
+            search_type=getattr(self, 'search_type', None),
+            n_results=getattr(self, 'n_results', None),
+            country=getattr(self, 'country', None),
+            location=getattr(self, 'location', None),
+            locale=getattr(self, 'locale', None),
+        )
+        # bypass_cache: bỏ qua kết quả cũ nhưng vẫn ghi kết quả mới vào cache
+        cached = None if self.bypass_cache else cache.get(key)
+        if cached is not None:
+            return cached, True
+        
+        result, _ = super()._search(**kwargs)
+        if result:
+            cache.set(key, query, result)
+        return result, False
+
+
+def create_search_tool(fresh=False):
+    """
+    Tạo search tool cho agents
+    
+    Args:
+        fresh (bool): Bỏ qua cache để lấy kết quả mới nhất
+    
+    Returns:
+        CachedSerperDevTool: Tool tìm kiếm có cache
+    """
+    return CachedSerperDevTool(bypass_cache=fresh)
+
+
+def bind_tool(tool, agent_key):
+    """Tool riêng cho agent nếu tool hỗ trợ, ngược lại dùng chung"""
+    return tool.for_agent(agent_key) if hasattr(tool, 'for_agent') else tool
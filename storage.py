@@ -0,0 +1,29 @@
+"""
+SQLite helpers dùng chung cho các kho dữ liệu cục bộ (cache, báo cáo, ...)
+"""
+import os
+import sqlite3
+
+# Thời gian chờ khi nhiều process cùng ghi một file SQLite (giây)
+SQLITE_BUSY_TIMEOUT = 30
+
+
+def connect_sqlite(path):
+    """
+    Mở kết nối SQLite dùng được giữa nhiều thread và nhiều process
+    
+    Args:
+        path (str): Đường dẫn file database (thư mục cha sẽ được tạo nếu chưa có)
+    
+    Returns:
+        sqlite3.Connection: Kết nối ở chế độ WAL, row trả về dạng sqlite3.Row
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,113 @@
+"""
+LLM và search tool giả lập (offline, deterministic) để đo overhead của pipeline
+"""
+import hashlib
+import json
+import random
+import re
+import time
+
+from llm import MeteredLLM
+from search_tools import MeteredSerperDevTool
+
+_TOOL_NAME = re.compile(r'Tool Name: (.+)')
+_FILLER = (
+    "Phân tích chi tiết về bối cảnh, xu hướng ngành, đối thủ cạnh tranh và các cơ hội chiến lược "
+    "cho cuộc họp sắp tới, kèm số liệu minh họa và khuyến nghị hành động. "
+)
+
+
+def _messages_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get('content', '')) for message in messages)
+
+
+def _last_message_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return str(messages[-1].get('content', '')) if messages else ''
+
+
+def _filler(seed, size):
+    """Văn bản markdown có độ dài xấp xỉ size, phụ thuộc seed"""
+    header = f"## Kết quả {seed[:8]}\n\n"
+    body = (_FILLER * (size // len(_FILLER) + 1))[:max(size - len(header), 0)]
+    return header + body
+
+
+class StubLLM(MeteredLLM):
+    """
+    LLM giả lập: trả lời theo định dạng ReAct của CrewAI sau một độ trễ cố định
+
+    slow_rate là tỉ lệ lời gọi rơi vào đuôi chậm (độ trễ nhân slow_factor), độc lập giữa
+    các lần gọi (kể cả bản sao do hedging gửi) để mô phỏng phần đuôi của provider thật.
+    """
+
+    def __init__(self, latency=0.0, completion_chars=1500, model="stub/offline-llm", slow_rate=0.0,
+                 slow_factor=20.0, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.latency = latency
+        self.completion_chars = completion_chars
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+
+    def _call_provider(self, messages, **kwargs):
+        if self.latency:
+            slow = self.slow_rate and random.random() < self.slow_rate
+            time.sleep(self.latency * (self.slow_factor if slow else 1.0))
+
+        text = _messages_text(messages)
+        seed = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        tool_names = _TOOL_NAME.findall(text)
+
+        # Agent có tool: lần gọi đầu yêu cầu dùng tool, sau khi có Observation thì trả lời
+        if tool_names and 'Observation:' not in _last_message_text(messages):
+            return (
+                "Thought: Tôi cần tìm thêm thông tin\n"
+                f"Action: {tool_names[0].strip()}\n"
+                f"Action Input: {json.dumps({'search_query': f'stub query {seed[:8]}'})}"
+            )
+        # max_tokens của agent giới hạn độ dài câu trả lời (~4 ký tự/token)
+        size = self.completion_chars
+        if getattr(self, 'max_tokens', None):
+            size = min(size, self.max_tokens * 4)
+        return f"Thought: Tôi đã có câu trả lời cuối cùng\nFinal Answer: {_filler(seed, size)}"
+
+    def _stream_provider(self, messages):
+        # Độ trễ trước token đầu tiên, sau đó trả text theo từng đoạn nhỏ
+        text = self._call_provider(messages)
+        for start in range(0, len(text), 20):
+            yield text[start:start + 20]
+
+    def supports_function_calling(self):
+        return False
+
+    def supports_stop_words(self):
+        return True
+
+
+class StubSerperDevTool(MeteredSerperDevTool):
+    """SerperDevTool giả lập: trả về kết quả tổng hợp với độ trễ và kích thước cấu hình được"""
+
+    latency: float = 0.0
+    payload_chars: int = 2000
+    rate_limit_provider: str = "stub"
+
+    def _search(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+
+        query = kwargs.get('search_query') or kwargs.get('query') or ''
+        seed = hashlib.sha256(query.encode('utf-8')).hexdigest()
+        snippet_size = 200
+        organic = [
+            {
+                'title': f"Kết quả {i + 1} cho {query}",
+                'link': f"https://example.com/{seed[:8]}/{i}",
+                'snippet': _filler(f"{seed}{i}", snippet_size),
+                'position': i + 1,
+            }
+            for i in range(max(self.payload_chars // snippet_size, 1))
+        ]
+        return {'searchParameters': {'q': query}, 'organic': organic}, False
@@ -0,0 +1,141 @@
+"""
+Ghi nhớ kết quả từng task để chỉ chạy lại các task có đầu vào thay đổi
+"""
+import hashlib
+import json
+import threading
+import time
+
+from config import Config
+from storage import connect_sqlite
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_memo (
+    fingerprint TEXT PRIMARY KEY,
+    task_key TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_memo_created_at ON task_memo(created_at);
+"""
+
+
+def task_output_text(task):
+    """Nội dung đầu ra dạng text của một task đã chạy (None nếu chưa có)"""
+    output = getattr(task, 'output', None)
+    if output is None:
+        return None
+    raw = getattr(output, 'raw', None)
+    return raw if raw is not None else str(output)
+
+
+def task_fingerprint(task, upstream_outputs):
+    """
+    Hash của đúng những gì task sử dụng: prompt đã điền meeting_data,
+    expected_output, agent/model thực hiện và đầu ra của các task phía trên
+    """
+    agent = task.agent
+    payload = json.dumps({
+        'description': task.description,
+        'expected_output': task.expected_output,
+        'agent': getattr(agent, 'role', None),
+        'model': getattr(getattr(agent, 'llm', None), 'model', None),
+        'upstream': list(upstream_outputs),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def context_tasks(task):
+    """Các task phía trên mà task dùng đầu ra làm context"""
+    context = getattr(task, 'context', None)
+    return context if isinstance(context, list) else []
+
+
+def prefill_output(task, output):
+    """Gán sẵn đầu ra (text) cho task để Crew không chạy lại task này"""
+    from crewai.tasks.task_output import TaskOutput
+
+    task.output = TaskOutput(
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=output,
+        agent=task.agent.role
+    )
+
+
+class TaskMemo:
+    """Kho SQLite lưu đầu ra theo fingerprint của task"""
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, fingerprint):
+        """Đầu ra đã ghi nhớ còn hạn, None nếu không có"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM task_memo WHERE fingerprint = ? AND created_at >= ?",
+                (fingerprint, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return row['output'] if row else None
+
+    def put(self, fingerprint, task_key, output):
+        """Ghi nhớ đầu ra của một task"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO task_memo (fingerprint, task_key, output, created_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, task_key, output, time.time())
+            )
+
+    def apply(self, tasks, task_keys):
+        """
+        Điền sẵn đầu ra cho các task có fingerprint khớp
+
+        Task chỉ được dùng lại khi mọi task trong context của nó cũng được dùng lại,
+        vì đầu ra của task phía trên là một phần của fingerprint.
+
+        Returns:
+            list: Key của các task được dùng lại
+        """
+        reused = []
+        for key, task in zip(task_keys, tasks):
+            if task_output_text(task) is not None:
+                # Đã được điền sẵn (ví dụ từ checkpoint của lần chạy dở)
+                continue
+            upstream = context_tasks(task)
+            upstream_outputs = [task_output_text(t) for t in upstream]
+            if any(output is None for output in upstream_outputs):
+                continue
+
+            output = self.get(task_fingerprint(task, upstream_outputs))
+            if output is None:
+                continue
+
+            prefill_output(task, output)
+            reused.append(key)
+        return reused
+
+    def record(self, tasks, task_keys):
+        """Ghi nhớ đầu ra của các task đã chạy xong (kể cả khi crew lỗi giữa chừng)"""
+        for key, task in zip(task_keys, tasks):
+            output = task_output_text(task)
+            upstream_outputs = [task_output_text(t) for t in context_tasks(task)]
+            if output is None or any(up is None for up in upstream_outputs):
+                continue
+            self.put(task_fingerprint(task, upstream_outputs), key, output)
+
+
+_shared_memo = None
+_shared_memo_lock = threading.Lock()
+
+
+def get_task_memo():
+    """Instance TaskMemo dùng chung trong process"""
+    global _shared_memo
+    with _shared_memo_lock:
+        if _shared_memo is None:
+            _shared_memo = TaskMemo(Config.TASK_MEMO_PATH, ttl_seconds=Config.TASK_MEMO_TTL_SECONDS)
+        return _shared_memo
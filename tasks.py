@@ -3,13 +3,15 @@ Tasks configuration for Meeting Preparation System
 """
 from crewai import Task
 
-def create_tasks(agents, meeting_data):
+def create_tasks(agents, meeting_data, parallel=False):
     """
     Tạo và cấu hình tất cả tasks cho hệ thống chuẩn bị cuộc họp
     
     Args:
         agents (dict): Dictionary chứa tất cả agents
         meeting_data (dict): Thông tin cuộc họp từ user input
+        parallel (bool): Chạy song song 2 task nghiên cứu độc lập
+            (phân tích bối cảnh và phân tích ngành)
     
     Returns:
         list: Danh sách các tasks
@@ -41,15 +43,26 @@ def create_tasks(agents, meeting_data):
         Định dạng đầu ra của bạn bằng markdown với các tiêu đề và tiêu đề phụ phù hợp.
         """,
         agent=agents['context_analyzer'],
+        async_execution=parallel,
         expected_output="Một phân tích chi tiết về bối cảnh cuộc họp và thông tin công ty, bao gồm các phát triển gần đây, hiệu suất tài chính và sự liên quan đến mục tiêu cuộc họp, được định dạng bằng markdown với các tiêu đề và tiêu đề phụ."
     )
 
     # Task 2: Phân tích ngành
+    if parallel:
+        # Chạy cùng lúc với phân tích bối cảnh nên không có kết quả đó: tự xác định ngành từ meeting_data
+        industry_intro = f"""Tự nghiên cứu để xác định ngành và thị trường chính của {company_name} (phân tích bối cảnh đang được thực hiện song song, không có sẵn).
+        Mục tiêu cuộc họp: {meeting_objective}
+        Người tham dự: {attendees}
+        Các lĩnh vực trọng tâm: {focus_areas}
+
+        Cung cấp phân tích ngành chuyên sâu:"""
+    else:
+        industry_intro = f"Dựa trên phân tích bối cảnh cho {company_name} và mục tiêu cuộc họp: {meeting_objective}, cung cấp phân tích ngành chuyên sâu:"
     industry_analysis_task = Task(
         description=f"""
         QUAN TRỌNG: TẤT CẢ TRẢ LỜI HOÀN TOÀN BẰNG TIẾNG VIỆT
         
-        Dựa trên phân tích bối cảnh cho {company_name} và mục tiêu cuộc họp: {meeting_objective}, cung cấp phân tích ngành chuyên sâu:
+        {industry_intro}
         1. Xác định các xu hướng và phát triển chính trong ngành
         2. Phân tích bối cảnh cạnh tranh
         3. Nêu bật các cơ hội và mối đe dọa tiềm năng
@@ -59,6 +72,9 @@ def create_tasks(agents, meeting_data):
         Định dạng đầu ra của bạn bằng markdown với các tiêu đề và tiêu đề phụ phù hợp.
         """,
         agent=agents['industry_insights_generator'],
+        # Chế độ song song: chỉ dựa vào meeting_data, không chờ phân tích bối cảnh
+        context=[] if parallel else [context_analysis_task],
+        async_execution=parallel,
         expected_output="Một báo cáo phân tích ngành toàn diện, bao gồm các xu hướng, bối cảnh cạnh tranh, cơ hội, mối đe dọa và thông tin chi tiết liên quan đến mục tiêu cuộc họp, được định dạng bằng markdown với các tiêu đề và tiêu đề phụ."
     )
 
@@ -78,6 +94,7 @@ def create_tasks(agents, meeting_data):
         Định dạng đầu ra của bạn bằng markdown với các tiêu đề và tiêu đề phụ phù hợp.
         """,
         agent=agents['strategy_formulator'],
+        context=[context_analysis_task, industry_analysis_task],
         expected_output="Một chiến lược cuộc họp chi tiết và chương trình giới hạn thời gian, bao gồm các mục tiêu, các điểm nói chuyện chính và các chiến lược để giải quyết các lĩnh vực trọng tâm cụ thể, được định dạng bằng markdown với các tiêu đề và tiêu đề phụ."
     )
 
@@ -115,6 +132,7 @@ def create_tasks(agents, meeting_data):
         Định dạng đầu ra của bạn bằng markdown với các tiêu đề phụ phù hợp và tiêu đề chính (Dòng đầu tiên) không định dạng kiểu.
         """,
         agent=agents['executive_briefing_creator'],
+        context=[context_analysis_task, industry_analysis_task, strategy_development_task],
         expected_output="Một bản tóm tắt điều hành toàn diện bao gồm tóm tắt, các điểm nói chuyện chính, chuẩn bị Q&A và các khuyến nghị chiến lược, được định dạng bằng markdown với các tiêu đề chính (H1), tiêu đề phần (H2) và tiêu đề phụ phần (H3) khi thích hợp. Sử dụng dấu đầu dòng, danh sách được đánh số và nhấn mạnh (in đậm/in nghiêng) cho thông tin chính."
     )
 
@@ -2,83 +2,160 @@
 Utility functions for Meeting Preparation System - Simplified Version
 """
 import datetime
-import glob
 import streamlit as st
 import os
+import re
 import time
 import random
 
+from config import Config
+from contacts_index import format_attendee, get_contacts_index, normalize_text
+from instrumentation import histogram_percentile, latency_histograms, records_to_jsonl
+from job_queue import COALESCE_JOINED, COALESCE_REUSED, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+from mail_queue import MAIL_DEAD, MAIL_PENDING, MAIL_SENDING, MAIL_SENT, get_mail_queue
+from rate_limit import all_limiter_stats
+from rendering import FORMAT_EMAIL, FORMAT_MARKDOWN, FORMAT_PRINT
+from report_store import get_report_store
+from search_cache import get_search_cache
 
-def save_meeting_result(result, company_name):
-    """Lưu kết quả cuộc họp vào file"""
+# Cột hiển thị tiến trình, theo thứ tự task trong create_tasks
+AGENT_COLUMNS = [
+    ('context', '🔍 Context Analyzer'),
+    ('industry', '📊 Industry Insights'),
+    ('strategy', '📋 Strategy Formulator'),
+    ('executive', '📝 Executive Brief'),
+]
+JOB_STATUS_ICONS = {
+    JOB_QUEUED: '⏳',
+    JOB_RUNNING: '⚡',
+    JOB_DONE: '✅',
+    JOB_FAILED: '❌',
+}
+RERUN_TIMING_HISTORY = 20
+STREAM_FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+def save_meeting_result(result, company_name, metrics=None):
+    """Lưu kết quả cuộc họp (kèm số liệu đo lường nếu có) vào file và index của kho báo cáo"""
     try:
-        # Tạo thư mục reports nếu chưa có
-        os.makedirs("reports", exist_ok=True)
-        
-        # Tạo tên file an toàn
-        safe_company_name = "".join(c for c in company_name if c.isalnum() or c in (' ', '-', '_')).strip()
-        timestamp = datetime.datetime.now().strftime('%d%m%Y_%H%M%S')
-        filename = f"reports/meeting_prep_{safe_company_name}_{timestamp}.md"
-        
-        # Ghi file
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"# Chuẩn bị cuộc họp - {company_name}\n")
-            f.write(f"**Ngày tạo:** {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
-            f.write(str(result))
-        
-        return filename
+        return get_report_store().save(result, company_name, metrics=metrics)
     except Exception as e:
         st.error(f"❌ Lỗi khi lưu file: {e}")
         return None
 
 
 def create_download_button(filename, company_name):
-    """Tạo button download file"""
+    """Tạo button download báo cáo (markdown và bản in HTML đã render sẵn khi lưu)"""
     try:
         if filename and os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                content = f.read()
+            report_store = get_report_store()
+            base_name = f"meeting_prep_{company_name}_{datetime.datetime.now().strftime('%d%m%Y')}"
             
-            st.download_button(
+            col1, col2 = st.columns(2)
+            col1.download_button(
                 label="📥 Tải xuống báo cáo",
-                data=content,
-                file_name=f"meeting_prep_{company_name}_{datetime.datetime.now().strftime('%d%m%Y')}.md",
-                mime="text/markdown"
+                data=report_store.rendered(filename, FORMAT_MARKDOWN),
+                file_name=f"{base_name}.md",
+                mime="text/markdown",
+                key=f"download_md_{filename}"
+            )
+            col2.download_button(
+                label="🖨️ Tải bản in (HTML)",
+                data=report_store.rendered(filename, FORMAT_PRINT),
+                file_name=f"{base_name}.html",
+                mime="text/html",
+                key=f"download_print_{filename}"
             )
     except Exception as e:
         st.error(f"❌ Lỗi download: {e}")
 
 
+_EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+MAIL_STATUS_ICONS = {MAIL_PENDING: '⏳', MAIL_SENDING: '📤', MAIL_SENT: '✅', MAIL_DEAD: '❌'}
+
+
+def attendee_emails(attendees):
+    """Email của người tham gia: email ghi trong dòng, hoặc tra tên trong danh bạ đã đồng bộ"""
+    emails = []
+    try:
+        index = get_contacts_index()
+    except Exception:
+        index = None
+    for line in attendees.splitlines():
+        found = _EMAIL_PATTERN.findall(line)
+        name = line.split(' - ', 1)[0].strip()
+        if not found and name and index is not None:
+            found = [
+                contact['email'] for contact in index.search(name, limit=3)
+                if normalize_text(contact['name']) == normalize_text(name)
+            ][:1]
+        emails.extend(email for email in found if email not in emails)
+    return emails
+
+
+def display_send_brief(filename, company_name, attendees, key="current"):
+    """
+    Gửi brief cho người tham gia qua hàng đợi email nền (nút bấm trả về ngay)
+
+    Returns:
+        bool: True nếu còn thư đang gửi lần đầu (trang cần tiếp tục poll)
+    """
+    st.markdown("### 📧 Gửi brief cho người tham gia")
+    batches = st.session_state.setdefault('mail_batches', {})
+    try:
+        recipients = st.text_input(
+            "Email người nhận (phân cách bằng dấu phẩy):",
+            value=", ".join(attendee_emails(attendees)),
+            key=f"brief_recipients_{key}"
+        )
+        emails = _EMAIL_PATTERN.findall(recipients)
+        if st.button("📧 Gửi brief cho người tham gia", key=f"send_brief_{key}", disabled=not emails):
+            subject = f"Brief cuộc họp với {company_name}"
+            body = get_report_store().rendered(filename, FORMAT_EMAIL).decode(Config.FILE_ENCODING)
+            batches[key] = get_mail_queue().enqueue([(email, subject, body) for email in emails])
+        
+        batch_id = batches.get(key)
+        if not batch_id:
+            return False
+        
+        mail_queue = get_mail_queue()
+        messages = mail_queue.list_batch(batch_id)
+        for message in messages:
+            line = f"{MAIL_STATUS_ICONS.get(message['status'], '❔')} {message['recipient']}"
+            if message['status'] == MAIL_PENDING and message['attempts']:
+                retry_in = max(message['next_attempt_at'] - time.time(), 0)
+                line += f" · thử lại sau {retry_in:.0f}s (lần {message['attempts'] + 1})"
+            elif message['status'] == MAIL_DEAD:
+                line += f" · {message['last_error']}"
+            st.text(line)
+        
+        if any(message['status'] == MAIL_DEAD for message in messages):
+            st.button("🔁 Gửi lại thư lỗi", key=f"retry_mail_{key}", on_click=mail_queue.retry_dead, args=(batch_id,))
+        # Chỉ poll khi đang gửi lần đầu; thư chờ backoff có thể mất nhiều phút
+        return any(
+            message['status'] == MAIL_SENDING or (message['status'] == MAIL_PENDING and not message['attempts'])
+            for message in messages
+        )
+    except Exception as e:
+        st.error(f"❌ Lỗi gửi email: {e}")
+        return False
+
+
 def display_meeting_history():
     """Hiển thị lịch sử cuộc họp trong sidebar"""
     st.sidebar.markdown("---")
     st.sidebar.subheader("📋 Lịch sử cuộc họp")
     
     try:
-        meeting_files = glob.glob("reports/meeting_prep_*.md")
-        if meeting_files:
-            meeting_files.sort(key=os.path.getmtime, reverse=True)  # Mới nhất trước
-            
-            for file in meeting_files[:5]:  # Hiển thị 5 file gần nhất
+        reports = get_report_store().list_recent(Config.MAX_HISTORY_FILES)  # Mới nhất trước
+        if reports:
+            for report in reports:
                 try:
-                    filename = os.path.basename(file)
-                    parts = filename.split('_')
+                    formatted_date = datetime.datetime.fromtimestamp(report['created_at']).strftime('%d/%m/%Y %H:%M')
                     
-                    if len(parts) >= 4:
-                        company = parts[2]
-                        date_part = parts[3].split('.')[0]
-                        
-                        # Format ngày
-                        if len(date_part) >= 13:
-                            date = date_part[:8]
-                            time_part = date_part[9:13]
-                            formatted_date = f"{date[0:2]}/{date[2:4]}/{date[4:8]} {time_part[0:2]}:{time_part[2:4]}"
-                        else:
-                            formatted_date = date_part
-                        
-                        if st.sidebar.button(f"📊 {company}\n{formatted_date}", key=file):
-                            with open(file, 'r', encoding='utf-8') as f:
-                                st.markdown(f.read())
+                    if st.sidebar.button(f"📊 {report['company_name']}\n{formatted_date}", key=report['filename']):
+                        st.markdown(get_report_store().read(report['filename']))
+                        display_run_metrics(get_report_store().get_metrics(report['filename']), key=report['filename'])
                                 
                 except Exception:
                     continue
@@ -89,6 +166,120 @@ def display_meeting_history():
         st.sidebar.error(f"❌ Lỗi: {e}")
 
 
+def display_report_search():
+    """Tìm kiếm toàn văn trong các báo cáo đã lưu (sidebar)"""
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🔎 Tìm kiếm báo cáo")
+    
+    try:
+        report_store = get_report_store()
+        query = st.sidebar.text_input("Từ khóa:", key="report_search_query")
+        
+        with st.sidebar.expander("Bộ lọc", expanded=False):
+            company = st.selectbox("Công ty:", ["Tất cả"] + report_store.list_companies(), key="report_search_company")
+            date_range = st.date_input("Khoảng thời gian:", value=(), key="report_search_dates")
+        
+        if not query or not query.strip():
+            return
+        
+        # date_input trả về 0, 1 hoặc 2 ngày; ngày kết thúc được tính trọn ngày
+        dates = list(date_range) if isinstance(date_range, (list, tuple)) else [date_range]
+        date_from = datetime.datetime.combine(dates[0], datetime.time.min).timestamp() if dates else None
+        date_to = (
+            datetime.datetime.combine(dates[-1], datetime.time.min) + datetime.timedelta(days=1)
+        ).timestamp() if dates else None
+        
+        results = report_store.search(
+            query,
+            company_name=None if company == "Tất cả" else company,
+            date_from=date_from,
+            date_to=date_to,
+            limit=Config.SEARCH_RESULTS_LIMIT
+        )
+        
+        if not results:
+            st.sidebar.info("🤷 Không tìm thấy báo cáo phù hợp")
+            return
+        
+        for report in results:
+            formatted_date = datetime.datetime.fromtimestamp(report['created_at']).strftime('%d/%m/%Y %H:%M')
+            st.sidebar.markdown(f"**{report['company_name']}** · {formatted_date}\n\n{report['snippet']}")
+            if st.sidebar.button("📖 Xem báo cáo", key=f"search_{report['id']}"):
+                st.markdown(report_store.read(report['filename']))
+                
+    except Exception as e:
+        st.sidebar.error(f"❌ Lỗi tìm kiếm: {e}")
+
+
+def display_run_metrics(records, key="current"):
+    """Hiển thị số liệu đo lường theo agent (thời gian, token, tool, chi phí)"""
+    if not records:
+        return
+    
+    with st.expander("⏱️ Số liệu hiệu năng theo agent", expanded=False):
+        total_cost = sum(record.get('cost_usd', 0) for record in records)
+        total_tokens = sum(record.get('prompt_tokens', 0) + record.get('completion_tokens', 0) for record in records)
+        search_tokens_saved = sum(record.get('search_tokens_saved', 0) for record in records)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("🤖 Lượt gọi LLM", sum(record.get('llm_calls', 0) for record in records))
+        col2.metric("🔤 Tokens (ước tính)", f"{total_tokens:,}")
+        col3.metric("✂️ Token tìm kiếm tiết kiệm", f"{search_tokens_saved:,}")
+        col4.metric("💵 Chi phí ước tính", f"${total_cost:.4f}")
+        
+        st.dataframe([
+            {
+                'Agent': record.get('agent'),
+                'Thời gian (s)': record.get('wall_time_s'),
+                'LLM calls': record.get('llm_calls'),
+                'LLM (s)': round(record.get('llm_time_s', 0), 2),
+                'Prompt tokens': record.get('prompt_tokens'),
+                'Completion tokens': record.get('completion_tokens'),
+                'TTFT (s)': record.get('time_to_first_token_s'),
+                'Tool calls': record.get('tool_calls'),
+                'Tool (s)': round(record.get('tool_time_s', 0), 2),
+                'Chờ rate limit (s)': round(record.get('rate_limit_wait_s', 0), 2),
+                'LLM chậm nhất (s)': round(record.get('llm_latency_max_s', 0), 2),
+                'Hedge (thắng/gửi)': f"{record.get('llm_hedge_wins', 0)}/{record.get('llm_hedged', 0)}",
+                'Timeout · thử lại': f"{record.get('llm_timeouts', 0)} · {record.get('llm_retries', 0)}",
+                'Token bị bỏ (hedge/timeout)': record.get('llm_discarded_tokens', 0),
+                'Token tìm kiếm (gốc → gửi)': f"{record.get('search_tokens_raw', 0)} → {record.get('search_tokens_sent', 0)}",
+                'Chi phí ($)': round(record.get('cost_usd', 0), 5),
+            }
+            for record in records
+        ], use_container_width=True)
+        display_latency_histogram(records)
+        
+        st.download_button(
+            label="📥 Xuất JSON lines",
+            data=records_to_jsonl(records),
+            file_name="meeting_metrics.jsonl",
+            mime="application/jsonl",
+            key=f"metrics_download_{key}"
+        )
+
+
+def display_latency_histogram(records, container=st):
+    """
+    Histogram độ trễ lời gọi LLM theo task (số lời gọi mỗi khoảng) kèm p50/p95/p99
+
+    records có thể của một lần chạy hoặc nhiều lần (cộng dồn) để so sánh phần đuôi.
+    """
+    histograms = latency_histograms(records)
+    if not histograms:
+        return
+    
+    rows = []
+    for task, histogram in histograms.items():
+        row = {'Task': task}
+        row.update({
+            f"p{pct}": histogram_percentile(histogram, pct) for pct in (50, 95, 99)
+        })
+        row.update(histogram)
+        rows.append(row)
+    container.caption("📊 Độ trễ mỗi lời gọi LLM theo task (số lời gọi trong từng khoảng)")
+    container.dataframe(rows, use_container_width=True)
+
+
 def display_metrics(meeting_duration, attendees, company_name):
     """Hiển thị metrics dashboard"""
     try:
@@ -113,17 +304,52 @@ def display_metrics(meeting_duration, attendees, company_name):
         st.error(f"❌ Lỗi metrics: {e}")
 
 
-def validate_inputs(company_name, meeting_objective, attendees, focus_areas):
-    """Kiểm tra tính hợp lệ của inputs"""
-    if not company_name or not company_name.strip():
-        return False
-    if not meeting_objective or not meeting_objective.strip():
-        return False
-    if not attendees or not attendees.strip():
-        return False
-    if not focus_areas or not focus_areas.strip():
-        return False
-    return True
+def display_attendee_picker():
+    """Chọn người tham gia từ danh bạ Google đã đồng bộ (thêm dòng "Tên - chức danh")"""
+    try:
+        index = get_contacts_index()
+    except Exception as e:
+        st.caption(f"⚠️ Không đọc được danh bạ: {e}")
+        return
+    
+    with st.expander(f"👥 Chọn người tham gia từ danh bạ ({len(index)} liên hệ)", expanded=False):
+        col1, col2 = st.columns([2, 1])
+        query = col1.text_input("Tìm theo tên, email, chức danh:", key="attendee_query")
+        labels = col2.multiselect("Nhãn:", index.labels(), key="attendee_labels")
+        
+        if query or labels:
+            matches = index.search(query, labels=labels, limit=Config.ATTENDEE_SUGGESTIONS)
+            if not matches:
+                st.caption("Không tìm thấy liên hệ phù hợp")
+            for contact in matches:
+                st.button(
+                    f"➕ {format_attendee(contact)} · {contact['email']}",
+                    # Email có thể trùng giữa các liên hệ, resource name thì không
+                    key=f"attendee_add_{contact['resource_name']}",
+                    on_click=_add_attendee,
+                    args=(format_attendee(contact),)
+                )
+        
+        st.button("🔄 Đồng bộ danh bạ Google", key="contacts_sync", on_click=_sync_contacts)
+        if st.session_state.get('contacts_sync_message'):
+            st.caption(st.session_state['contacts_sync_message'])
+
+
+def _add_attendee(line):
+    lines = [existing for existing in st.session_state.get('attendees', '').splitlines() if existing.strip()]
+    if line not in lines:
+        lines.append(line)
+    st.session_state['attendees'] = "\n".join(lines)
+
+
+def _sync_contacts():
+    try:
+        from authentication import get_contacts
+        
+        contacts = get_contacts()
+        st.session_state['contacts_sync_message'] = f"✅ Đã đồng bộ {len(contacts)} liên hệ"
+    except Exception as e:
+        st.session_state['contacts_sync_message'] = f"❌ Lỗi đồng bộ danh bạ: {e}"
 
 
 def display_sidebar_instructions():
@@ -163,177 +389,185 @@ def display_sidebar_instructions():
     st.sidebar.subheader("📈 Thống kê nhanh")
     
     try:
-        import glob
-        meeting_files = glob.glob("reports/meeting_prep_*.md")
-        total_meetings = len(meeting_files)
+        report_store = get_report_store()
+        total_meetings = report_store.count()
         
         if total_meetings > 0:
             st.sidebar.metric("📊 Tổng cuộc họp đã chuẩn bị", total_meetings)
             
             # Thống kê tuần này
-            from datetime import datetime, timedelta
-            week_ago = datetime.now() - timedelta(days=7)
-            recent_files = [f for f in meeting_files 
-                          if os.path.getmtime(f) > week_ago.timestamp()]
-            
-            st.sidebar.metric("📅 Cuộc họp tuần này", len(recent_files))
+            week_ago = datetime.datetime.now() - datetime.timedelta(days=7)
+            st.sidebar.metric("📅 Cuộc họp tuần này", report_store.count_since(week_ago.timestamp()))
         else:
             st.sidebar.info("🎯 Hãy chuẩn bị cuộc họp đầu tiên!")
+        
+        # Hiệu quả cache tìm kiếm
+        cache_stats = get_search_cache().stats()
+        if cache_stats['hits'] + cache_stats['misses'] > 0:
+            st.sidebar.metric(
+                "🗄️ Cache tìm kiếm (hit rate)",
+                f"{cache_stats['hit_rate']:.0%}",
+                help=f"Hits: {cache_stats['hits']} · Misses: {cache_stats['misses']} · Entries: {cache_stats['entries']}"
+            )
+        
+        # Phần đuôi độ trễ LLM qua các brief gần đây (timeout/hedging có hiệu quả không)
+        recent_metrics = report_store.recent_metrics(Config.LATENCY_HISTORY_REPORTS)
+        if latency_histograms(recent_metrics):
+            with st.sidebar.expander(f"⏱️ Độ trễ LLM ({Config.LATENCY_HISTORY_REPORTS} brief gần nhất)"):
+                display_latency_histogram(recent_metrics, container=st)
+        
+        # Hàng đợi rate limit dùng chung (OpenAI, Serper)
+        for limiter_stats in all_limiter_stats():
+            st.sidebar.metric(
+                f"🚦 {limiter_stats['name']} (đang chờ)",
+                limiter_stats['queue_depth'],
+                help=(
+                    f"Requests: {limiter_stats['requests']} · Bị giới hạn: {limiter_stats['throttled']} · "
+                    f"429: {limiter_stats['rate_limited']} · Tổng chờ: {limiter_stats['wait_time_s']:.1f}s · "
+                    f"Hàng đợi tối đa: {limiter_stats['max_queue_depth']}"
+                )
+            )
             
     except Exception:
         pass
 
 
-def display_crew_progress(crew, meeting_data):
-    """Hiển thị tiến trình crew với animation thực tế hơn"""
-    company_name = meeting_data.get('company_name', 'Unknown')
+def display_job_progress(job, snapshot=None, queue_position=0, coalesced=None, job_queue=None):
+    """
+    Hiển thị trạng thái job chuẩn bị cuộc họp chạy nền
+
+    Mỗi lần rerun vẽ lại từ trạng thái job trong hàng đợi và snapshot của
+    CrewProgressTracker (nếu job đang chạy trong process này). Job lỗi có nút
+    chạy tiếp từ giai đoạn chưa hoàn thành khi có job_queue.
+
+    Returns:
+        bool: True nếu job còn đang chờ/chạy (trang cần tiếp tục poll)
+    """
+    company_name = job['meeting_data'].get('company_name', 'Unknown')
+    status = job['status']
     
-    # Container cho progress
-    progress_container = st.container()
+    if coalesced == COALESCE_JOINED:
+        st.info(f"🔗 Cuộc họp này đang được chuẩn bị cho {job['subscribers']} yêu cầu giống hệt, dùng chung một lần chạy")
+    elif coalesced == COALESCE_REUSED:
+        minutes_ago = (time.time() - (job['finished_at'] or time.time())) / 60
+        st.info(f"♻️ Dùng lại brief giống hệt vừa hoàn tất {minutes_ago:.0f} phút trước")
     
-    with progress_container:
-        # Progress bar tổng
-        main_progress = st.progress(0)
-        main_status = st.empty()
-        
-        # Progress cho từng agent
-        col1, col2, col3, col4 = st.columns(4)
-        
-        agents_progress = {}
-        agents_status = {}
-        
-        with col1:
-            st.markdown("**🔍 Context Analyzer**")
-            agents_status['context'] = st.empty()
-            agents_progress['context'] = st.progress(0)
-        
-        with col2:
-            st.markdown("**📊 Industry Insights**")
-            agents_status['industry'] = st.empty()
-            agents_progress['industry'] = st.progress(0)
-        
-        with col3:
-            st.markdown("**📋 Strategy Formulator**")
-            agents_status['strategy'] = st.empty()
-            agents_progress['strategy'] = st.progress(0)
-        
-        with col4:
-            st.markdown("**📝 Executive Brief**")
-            agents_status['executive'] = st.empty()
-            agents_progress['executive'] = st.progress(0)
+    if status == JOB_QUEUED:
+        st.info(f"⏳ Đang chờ trong hàng đợi cho {company_name} ({queue_position} job phía trước)")
+        return True
+    
+    if status == JOB_FAILED:
+        st.error(f"❌ Có lỗi xảy ra trong quá trình chuẩn bị: {job['error']}")
+        return _display_resume(job, job_queue) if job_queue is not None else False
+    
+    if status == JOB_DONE:
+        elapsed = (job['finished_at'] or 0) - (job['started_at'] or 0)
+        st.progress(100)
+        resumed = f", tiếp tục {job['resumes']} lần" if job.get('resumes') else ""
+        st.text(f"✅ Chuẩn bị cuộc họp hoàn tất! ({elapsed:.1f}s{resumed})")
+        reused = [title for key, title in AGENT_COLUMNS if key in job['reused_stages']]
+        if reused:
+            st.info(f"♻️ Dùng lại kết quả trước (đầu vào không đổi): {', '.join(reused)}")
+        return False
+    
+    # Job đang chạy: tracker chỉ có trong process đã nhận job
+    if snapshot is None:
+        elapsed = time.time() - (job['started_at'] or time.time())
+        st.text(f"⚡ Đang chạy AI Crew cho {company_name}... ({elapsed:.0f}s)")
+        return True
+    
+    st.progress(snapshot['overall'])
+    st.text(f"⚡ Đang chạy AI Crew cho {company_name}... ({snapshot['elapsed']:.0f}s)")
+    columns = st.columns(len(AGENT_COLUMNS))
+    for column, (key, title) in zip(columns, AGENT_COLUMNS):
+        stage = snapshot['stages'].get(key)
+        with column:
+            st.markdown(f"**{title}**")
+            if stage:
+                st.text(stage['message'])
+                st.progress(stage['progress'])
+    _render_stream(snapshot, st.empty())
+    return True
+
+
+def _display_resume(job, job_queue):
+    """
+    Nút chạy tiếp job lỗi: các giai đoạn đã có checkpoint được giữ nguyên
+
+    Returns:
+        bool: True nếu job vừa được đưa lại hàng đợi
+    """
+    completed = job_queue.checkpointed_stages(job['id'])
+    if completed:
+        titles = dict(AGENT_COLUMNS)
+        st.info(
+            f"💾 Đã lưu kết quả {len(completed)}/{len(AGENT_COLUMNS)} giai đoạn: "
+            f"{', '.join(titles.get(key, key) for key in completed)}. Chạy tiếp sẽ bắt đầu từ giai đoạn chưa hoàn thành."
+        )
+    label = "▶️ Chạy tiếp từ chỗ lỗi" if completed else "🔁 Chạy lại"
+    if st.button(label, key=f"resume_{job['id']}", type="primary"):
+        return job_queue.resume(job['id'])
+    return False
+
+
+def display_recent_jobs(job_queue):
+    """Các job chuẩn bị cuộc họp gần đây trong sidebar (bấm để xem lại)"""
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("🗂️ Job gần đây")
     
     try:
-        # Các message động cho từng phase
-        context_messages = [
-            "🔍 Bắt đầu tìm kiếm thông tin...",
-            "🏢 Đang phân tích thông tin công ty...",
-            "📰 Thu thập tin tức và báo cáo gần đây...",
-            "👥 Xác định các stakeholder chính...",
-            "� Đánh giá tình hình tài chính...",
-            "🎯 Phân tích mục tiêu kinh doanh...",
-            "✅ Hoàn thành phân tích bối cảnh"
-        ]
-        
-        industry_messages = [
-            "📊 Khởi động phân tích ngành...",
-            "📈 Nghiên cứu xu hướng thị trường...",
-            "🏆 Phân tích đối thủ cạnh tranh...",
-            "💡 Tìm kiếm cơ hội phát triển...",
-            "⚠️ Đánh giá rủi ro tiềm ẩn...",
-            "🔍 Thu thập market insights...",
-            "✅ Hoàn thành phân tích ngành"
-        ]
-        
-        strategy_messages = [
-            "📋 Bắt đầu thiết kế chiến lược...",
-            "⏰ Xây dựng cấu trúc thời gian...",
-            "🎯 Tạo agenda chi tiết...",
-            "💬 Chuẩn bị talking points...",
-            "❓ Thiết kế câu hỏi thảo luận...",
-            "🚀 Tối ưu hóa flow cuộc họp...",
-            "✅ Hoàn thành chiến lược"
-        ]
-        
-        executive_messages = [
-            "📝 Khởi tạo báo cáo tổng hợp...",
-            "📋 Tổng hợp thông tin từ các agent...",
-            "💼 Tạo executive summary...",
-            "� Thêm charts và visualizations...",
-            "🎨 Format báo cáo chuyên nghiệp...",
-            "✅ Finalize deliverables...",
-            "✅ Hoàn thành báo cáo"
-        ]
-        
-        # Phase 1: Context Analysis (0-25%) - Chậm hơn, thực tế hơn
-        main_status.text(f"🔍 Đang phân tích bối cảnh cuộc họp cho {company_name}...")
-        
-        for i, message in enumerate(context_messages):
-            agents_status['context'].text(message)
-            progress_val = int((i + 1) / len(context_messages) * 100)
-            agents_progress['context'].progress(progress_val)
-            main_progress.progress(int(progress_val * 0.25))
-            time.sleep(0.8)  # Chậm hơn để realistic
-        
-        # Phase 2: Industry Insights (25-50%)
-        main_status.text("📊 Đang thu thập insights ngành...")
-        
-        for i, message in enumerate(industry_messages):
-            agents_status['industry'].text(message)
-            progress_val = int((i + 1) / len(industry_messages) * 100)
-            agents_progress['industry'].progress(progress_val)
-            main_progress.progress(25 + int(progress_val * 0.25))
-            time.sleep(0.8)
-        
-        # Phase 3: Strategy (50-75%)
-        main_status.text("📋 Đang xây dựng chiến lược cuộc họp...")
-        
-        for i, message in enumerate(strategy_messages):
-            agents_status['strategy'].text(message)
-            progress_val = int((i + 1) / len(strategy_messages) * 100)
-            agents_progress['strategy'].progress(progress_val)
-            main_progress.progress(50 + int(progress_val * 0.25))
-            time.sleep(0.8)
-        
-        # Phase 4: Executive Brief (75-100%)
-        main_status.text("📝 Đang tạo báo cáo tổng hợp...")
-        
-        for i, message in enumerate(executive_messages):
-            agents_status['executive'].text(message)
-            progress_val = int((i + 1) / len(executive_messages) * 100)
-            agents_progress['executive'].progress(progress_val)
-            main_progress.progress(75 + int(progress_val * 0.25))
-            time.sleep(0.8)
-        
-        # Final phase với loading animation
-        main_status.text("🎉 Hoàn thành! Đang tạo báo cáo cuối cùng...")
-        
-        # Thêm animation loading cho phần cuối
-        loading_messages = [
-            "🔄 Đang compile kết quả...",
-            "📄 Đang format báo cáo...",
-            "🎨 Đang tối ưu hóa layout...",
-            "✅ Sắp hoàn thành..."
-        ]
-        
-        for i, message in enumerate(loading_messages):
-            main_status.text(message)
-            time.sleep(0.5)
-        
-        # Execute actual crew (chạy thật)
-        main_status.text("⚡ Đang chạy AI Crew...")
-        result = crew.kickoff()
-        
-        main_status.text("✅ Chuẩn bị cuộc họp hoàn tất!")
-        return result
-        
+        jobs = job_queue.list_recent(Config.MAX_RECENT_JOBS)
+        if not jobs:
+            st.sidebar.info("📝 Chưa có job nào")
+            return
+        
+        for job in jobs:
+            formatted_date = datetime.datetime.fromtimestamp(job['created_at']).strftime('%d/%m/%Y %H:%M')
+            st.sidebar.button(
+                f"{JOB_STATUS_ICONS.get(job['status'], '❔')} {job['meeting_data'].get('company_name')}\n{formatted_date}",
+                key=f"job_{job['id']}",
+                on_click=_select_job,
+                args=(job['id'],)
+            )
     except Exception as e:
-        main_status.text("❌ Có lỗi xảy ra trong quá trình chuẩn bị")
-        st.error(f"Lỗi: {e}")
-        return None
+        st.sidebar.error(f"❌ Lỗi: {e}")
+
+
+def _select_job(job_id):
+    st.session_state['active_job_id'] = job_id
+    st.session_state['active_job_coalesced'] = None
+
+
+def _render_stream(snapshot, placeholder):
+    """Hiển thị dần nội dung đang được LLM sinh ra (chỉ phần Final Answer)"""
+    key = snapshot.get('streaming_stage')
+    text = snapshot['streams'].get(key, '') if key else ''
+    if not text:
+        return
+    
+    title = dict(AGENT_COLUMNS).get(key, key)
+    if STREAM_FINAL_ANSWER_MARKER in text:
+        answer = text.rsplit(STREAM_FINAL_ANSWER_MARKER, 1)[1].strip()
+        placeholder.markdown(f"#### ✍️ {title} đang viết...\n\n{answer}▌")
+    else:
+        placeholder.caption(f"💭 {title} đang suy luận...")
+
+
+def display_rerun_timing(started_at):
+    """Hiển thị thời gian chạy script của lần rerun hiện tại trong sidebar"""
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    history = st.session_state.setdefault('rerun_timings', [])
+    history.append(elapsed_ms)
+    del history[:-RERUN_TIMING_HISTORY]
+    
+    median_ms = sorted(history)[len(history) // 2]
+    st.sidebar.caption(
+        f"⏱️ Rerun: {elapsed_ms:.0f} ms (trung vị {len(history)} lần gần nhất: {median_ms:.0f} ms)"
+    )
 
 
-def display_fun_facts():
-    """Hiển thị fun facts thú vị về cuộc họp"""
+def display_fun_facts(seed=None):
+    """Hiển thị fun facts thú vị về cuộc họp (cùng seed thì cùng fact giữa các lần rerun)"""
     facts = [
         "💡 Cuộc họp hiệu quả nhất thường kéo dài 30-45 phút",
         "🎯 60% thời gian cuộc họp nên dành cho thảo luận",
@@ -349,7 +583,7 @@ def display_fun_facts():
         "☕ Uống cà phê trước cuộc họp tăng sự tỉnh táo lên 25%"
     ]
     
-    selected_fact = random.choice(facts)
+    selected_fact = random.Random(seed).choice(facts)
     st.info(selected_fact)
 
 
@@ -0,0 +1,66 @@
+"""
+Nạp trước các thư viện nặng (crewai, Google API) trên thread nền sau lần hiển thị đầu tiên
+"""
+import importlib
+import threading
+import time
+
+from config import Config
+
+_started = False
+_started_lock = threading.Lock()
+_timings = {}
+
+
+def start_warmup(modules=None):
+    """
+    Bắt đầu nạp trước các module (một lần mỗi process), trả về ngay
+
+    Returns:
+        bool: True nếu lần gọi này khởi động thread nạp trước
+    """
+    global _started
+    if not Config.WARMUP_IMPORTS:
+        return False
+    with _started_lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(
+        target=_preload,
+        args=(tuple(modules or Config.WARMUP_MODULES),),
+        name="import-warmup",
+        daemon=True
+    ).start()
+    return True
+
+
+def _preload(modules):
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            _timings[name] = time.perf_counter() - started
+        except Exception:
+            # Thư viện tùy chọn (ví dụ Google API) có thể chưa được cài
+            _timings[name] = None
+
+
+def warmup_status():
+    """Thời gian nạp (giây) của từng module đã nạp trước, None nếu không nạp được"""
+    return dict(_timings)
+
+
+def test_startup(module='main', runs=3):
+    """Test function để kiểm tra thời gian import main.py và các gói phải nạp trễ (không gọi API)"""
+    from benchmark import bench_startup
+
+    print("🧪 Testing startup...")
+    # bench_startup import module trong process mới (-X importtime), không nạp trước
+    passed = bench_startup(module, runs=runs, budget_ms=Config.STARTUP_BUDGET_MS)
+    print("✅ Test thành công" if passed else "❌ Test thất bại!")
+    return passed
+
+
+if __name__ == "__main__":
+    test_startup()